@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+
+# Entry point for `python <repo dir> <command>`. Each command imports only what it needs,
+# so `--help` and argument errors return without loading pandas, matplotlib or fpdf.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+# One student end to end: analysis, feedback and PDF
+def report(args):
+    import main
+    main.configure_paths(args.base_path, output_dir=args.output_dir)
+    student_id = os.path.basename(args.file).split('_')[-1].split('.')[0]
+    result = main.analyze_single_student(args.file)
+    if not result.get("overall"):
+        print(f"❌ Failed to analyze {args.file}")
+        return 1
+    feedback = main.generate_feedback(student_id, result["overall"], result["subject_df"], result["weak_df"],
+                                      progress_df=result.get("progress_df"), missed_df=result.get("missed_df"))
+    if not feedback:
+        return 1
+    pdf_path = main.text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"],
+                                progress_df=result.get("progress_df"))
+    if not pdf_path:
+        return 1
+    print(f"✅ Report for student {student_id}: {pdf_path}")
+    return 0
+
+
+def pipeline(args):
+    import main
+    main.configure_paths(args.base_path, output_dir=args.output_dir)
+    main.run_pipeline()
+    return 0
+
+
+def batch(args):
+    import batch_runner
+    return batch_runner.cli(args.extra)
+
+
+def bench(args):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    import run_benchmarks
+    return run_benchmarks.cli(args.extra)
+
+
+def export(args):
+    import bulk_export
+    import main
+    main.configure_paths(args.base_path, output_dir=args.output_dir)
+    bulk_export.export(main.OUTPUT_DIR, args.students.split(",") if args.students else None, args.pdf, args.zip,
+                       args.by_test)
+    return 0
+
+
+def serve(args):
+    from app import app
+    print("Starting Flask server...")
+    app.run(debug=args.debug, host=args.host, port=args.port)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="mathongo", description="MathonGo student feedback reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("report", help="build the report for one submission file")
+    p.add_argument("file", help="sample_submission_analysis_<id>.json")
+    p.add_argument("--base-path", default=".", help="directory holding output/ and the logo")
+    p.add_argument("--output-dir", help="output directory (default: <base-path>/output)")
+    p.set_defaults(func=report)
+
+    p = commands.add_parser("pipeline", help="run main.py's pipeline over <base-path>/data")
+    p.add_argument("--base-path", default=".", help="directory holding data/, output/ and the logo")
+    p.add_argument("--output-dir", help="output directory (default: <base-path>/output)")
+    p.set_defaults(func=pipeline)
+
+    # Everything after `batch` (including --help) goes to batch_runner's own parser
+    p = commands.add_parser("batch", help="batch_runner.py; remaining arguments are passed through",
+                            add_help=False)
+    p.set_defaults(func=batch)
+
+    # Everything after `bench` goes to benchmarks/run_benchmarks.py, e.g. `python . bench --suite`
+    p = commands.add_parser("bench", help="benchmarks/run_benchmarks.py; remaining arguments are passed through",
+                            add_help=False)
+    p.set_defaults(func=bench)
+
+    p = exporter = commands.add_parser("export", help="a finished batch as one merged PDF and/or a ZIP of PDFs")
+    p.add_argument("--base-path", default=".", help="directory holding output/ and the logo")
+    p.add_argument("--output-dir", help="batch output directory (default: <base-path>/output)")
+    p.add_argument("--students", help="comma-separated student ids (default: all with feedback)")
+    p.add_argument("--pdf", help="merged PDF path")
+    p.add_argument("--zip", help="ZIP path")
+    p.add_argument("--by-test", action="store_true", help="one PDF/ZIP per test, e.g. class_<test>.pdf")
+    p.set_defaults(func=export)
+
+    p = commands.add_parser("serve", help="start the Flask upload app")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=5000)
+    p.add_argument("--debug", action="store_true")
+    p.set_defaults(func=serve)
+
+    args, args.extra = parser.parse_known_args(argv)
+    if args.extra and args.func not in (batch, bench):
+        parser.error(f"unrecognized arguments: {' '.join(args.extra)}")
+    if args.func is export and not args.pdf and not args.zip:
+        exporter.error("pass --pdf and/or --zip")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    raise SystemExit(args.func(args))
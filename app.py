@@ -1,17 +1,25 @@
-from flask import Flask, request, send_file, render_template_string
+from flask import Flask, request, send_file, render_template_string, jsonify, Response
 import os
 import json
-import pandas as pd
+import threading
 from werkzeug.utils import secure_filename
-from fpdf import FPDF
-import glob
-import time
+
+import main
+import metrics
+from main import analyze_single_student, cohort_ranks, generate_feedback, stream_report, text_to_pdf
+from job_queue import FINISHED, JobQueue, WorkerPool
 
 app = Flask(__name__)
 base_path = "/content/drive/MyDrive/mathango_jsonfiles"
 upload_folder = f"{base_path}/uploads"
-os.makedirs(upload_folder, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = upload_folder
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+# Set STREAM_FEEDBACK=0 to wait for the whole completion before showing feedback or laying out the PDF
+STREAM_FEEDBACK = os.getenv("STREAM_FEEDBACK", "1") != "0"
+LIVE_JOBS = 256
+job_queue = None
+worker_pool = None
+_setup_lock = threading.Lock()
 
 html_template = """
 <!DOCTYPE html>
@@ -29,6 +37,10 @@ html_template = """
         .result-item { margin: 10px 0; }
         a { color: #007bff; text-decoration: none; }
         a:hover { text-decoration: underline; }
+        .feedback { margin: 5px 0 15px 20px; color: #333; font-size: 14px; }
+        .feedback h3 { font-size: 15px; margin: 10px 0 4px; }
+        .feedback p, .feedback li { margin: 3px 0; }
+        .feedback ol { list-style: none; }
     </style>
 </head>
 <body>
@@ -44,32 +56,157 @@ html_template = """
     </div>
     {% if results %}
     <div class="results">
-        <h2>Generated Reports</h2>
+        <h2>Queued Reports</h2>
         {% for result in results %}
-        <div class="result-item">
-            <p>Student {{ result.student_id }}: <a href="/download/{{ result.student_id }}">Download PDF</a></p>
+        <div class="result-item" data-job="{{ result.job_id }}">
+            <p>Student {{ result.student_id }}: <span class="status">queued</span>
+               <a class="download" href="/download/{{ result.student_id }}" style="display:none">Download PDF</a></p>
+            <div class="feedback"></div>
         </div>
         {% endfor %}
     </div>
+    <script>
+        document.querySelectorAll('[data-job]').forEach(function (item) {
+            var source = new EventSource('/events/' + item.dataset.job);
+            source.onmessage = function (event) {
+                var job = JSON.parse(event.data);
+                item.querySelector('.status').textContent = job.status === 'failed' ? 'failed: ' + job.message : job.stage;
+                if (job.status === 'done') item.querySelector('.download').style.display = 'inline';
+                if (job.status === 'done' || job.status === 'failed') source.close();
+            };
+            // Feedback blocks arrive while the LLM is still writing
+            var feedback = item.querySelector('.feedback'), list = null;
+            source.addEventListener('block', function (event) {
+                var block = JSON.parse(event.data);
+                // A retried or replaced completion starts over
+                if (block.kind === 'reset') { feedback.textContent = ''; list = null; return; }
+                if (block.kind === 'blank') return;
+                var tag = block.kind === 'heading' ? 'h3' : block.kind === 'paragraph' ? 'p' : 'li';
+                if (tag !== 'li') list = null;
+                else if (!list || list.tagName !== (block.kind === 'numbered' ? 'OL' : 'UL')) {
+                    list = feedback.appendChild(document.createElement(block.kind === 'numbered' ? 'ol' : 'ul'));
+                }
+                var node = document.createElement(tag);
+                node.textContent = block.text;
+                (tag === 'li' ? list : feedback).appendChild(node);
+            });
+        });
+    </script>
     {% endif %}
 </body>
 </html>
 """
 
-# Include load_student_data, build_prompt, generate_feedback, and text_to_pdf functions
-# ... [Copy from main.py above] ...
-
 @app.route('/')
 def index():
     print("Accessing root endpoint")
     return render_template_string(html_template)
 
+# Feedback blocks of recent jobs as they are generated, for /events. Kept in memory only; a job's blocks
+# can be read again until LIVE_JOBS newer jobs have started.
+class LiveFeedback:
+    def __init__(self, max_jobs=LIVE_JOBS):
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.changed = threading.Condition()
+
+    def start(self, job_id):
+        with self.changed:
+            self.jobs.pop(job_id, None)
+            self.jobs[job_id] = []
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.pop(next(iter(self.jobs)))
+
+    def add(self, job_id, kind, text):
+        with self.changed:
+            if job_id in self.jobs:
+                self.jobs[job_id].append({"kind": kind, "text": text})
+            self.changed.notify_all()
+
+    # Blocks after the first `seen`
+    def since(self, job_id, seen):
+        with self.changed:
+            return self.jobs.get(job_id, [])[seen:]
+
+    # Sleep until the job has more than `seen` blocks, or at most `timeout` seconds
+    def wait(self, job_id, seen, timeout):
+        with self.changed:
+            if len(self.jobs.get(job_id, [])) <= seen:
+                self.changed.wait(timeout)
+
+
+live_feedback = LiveFeedback()
+
+# Background job: the three pipeline stages for one uploaded file
+def process_upload_job(job, progress):
+    with metrics.student_span(job["student_id"]):
+        return _process_upload_job(job, progress)
+
+def _process_upload_job(job, progress):
+    student_id = job["student_id"]
+    progress("analyze")
+    result = analyze_single_student(job["file_path"])
+    if not result.get("overall"):
+        raise RuntimeError(f"Failed to load data for student {student_id}")
+    # Ranked against the student's test in the cohort index of the output directory, if a batch saved one
+    cohort_df = cohort_ranks(result)
+
+    if STREAM_FEEDBACK:
+        # Feedback and PDF together: blocks reach /events and the PDF as the completion streams in
+        progress("feedback")
+        live_feedback.start(job["id"])
+        feedback, pdf_path = stream_report(student_id, result["overall"], result["subject_df"], result["weak_df"],
+                                           result["chart_path"], cohort_df, result.get("progress_df"),
+                                           on_block=lambda kind, text: live_feedback.add(job["id"], kind, text),
+                                           missed_df=result.get("missed_df"))
+        if not feedback or not pdf_path:
+            raise RuntimeError(f"Failed to generate the report for student {student_id}")
+        print(f"Generated PDF for student {student_id}")
+        return {"student_id": student_id, "pdf_path": pdf_path}
+
+    # Groq calls are throttled by the shared rate limiter inside generate_feedback
+    progress("feedback")
+    feedback = generate_feedback(student_id, result["overall"], result["subject_df"], result["weak_df"], cohort_df,
+                                 result.get("progress_df"), result.get("missed_df"))
+    if not feedback:
+        raise RuntimeError(f"Failed to generate feedback for student {student_id}")
+
+    progress("pdf")
+    pdf_path = text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"],
+                           cohort_df, result.get("progress_df"))
+    if not pdf_path:
+        raise RuntimeError(f"Failed to generate PDF for student {student_id}")
+    print(f"Generated PDF for student {student_id}")
+    return {"student_id": student_id, "pdf_path": pdf_path}
+
+
+# Folders, the job table and the worker threads are set up on the first request rather than at import,
+# so importing app (tests, WSGI servers, `python . serve --help`) has no side effects
+@app.before_request
+def setup():
+    global job_queue, worker_pool
+    if worker_pool is not None:
+        return
+    with _setup_lock:
+        if worker_pool is None:
+            os.makedirs(upload_folder, exist_ok=True)
+            main.configure_paths(base_path)
+            job_queue = JobQueue(f"{base_path}/jobs.sqlite")
+            worker_pool = WorkerPool(job_queue, process_upload_job, workers=UPLOAD_WORKERS)
+            worker_pool.start()
+
+
+def job_status(job):
+    return {key: job[key] for key in ("id", "student_id", "status", "stage", "message", "result")}
+
+
 @app.route('/upload', methods=['POST'])
 def upload_files():
     print("Received upload request")
     uploaded_files = request.files.getlist("files[]")
     results = []
     
+    # Only save and enqueue here; the worker pool does the slow analysis, LLM and PDF work
     for file in uploaded_files:
         if file and file.filename.endswith('.json'):
             filename = secure_filename(file.filename)
@@ -77,35 +214,81 @@ def upload_files():
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(file_path)
             print(f"Saved file: {file_path}")
-            
-            overall, subject_df, weak_df = load_student_data(student_id, base_path)
-            if overall is None:
-                print(f"Failed to load data for student {student_id}")
-                continue
-            
-            prompt = build_prompt(overall, subject_df, weak_df)
-            feedback = generate_feedback(prompt)
-            if not feedback:
-                print(f"Failed to generate feedback for student {student_id}")
-                continue
-            
-            txt_path = f"{base_path}/feedback/feedback_{student_id}.txt"
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(feedback)
-            
-            chart_path = f"{base_path}/output/chart_{student_id}.png"
-            pdf_path = f"{base_path}/feedback/feedback_{student_id}.pdf"
-            text_to_pdf(feedback, pdf_path, student_id, chart_path, subject_df, weak_df)
-            print(f"Generated PDF for student {student_id}")
-            
-            results.append({"student_id": student_id})
-            time.sleep(5)
+
+            job_id = job_queue.enqueue(student_id, file_path)
+            results.append({"student_id": student_id, "job_id": job_id})
     
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"jobs": results}), 202
     return render_template_string(html_template, results=results)
 
+@app.route('/status/<job_id>')
+def job_status_route(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job_status(job))
+
+# Server-sent events: one message per status/stage change until the job finishes, plus a `block` event
+# for each feedback heading, bullet or paragraph as it is generated
+@app.route('/events/<job_id>')
+def job_events(job_id):
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "unknown job"}), 404
+
+    def stream():
+        last = None
+        seen = 0
+        while True:
+            job = job_queue.get(job_id)
+            blocks = live_feedback.since(job_id, seen)
+            seen += len(blocks)
+            for block in blocks:
+                yield f"event: block\ndata: {json.dumps(block)}\n\n"
+            state = (job["status"], job["stage"])
+            if state != last:
+                last = state
+                yield f"data: {json.dumps(job_status(job))}\n\n"
+            if job["status"] in FINISHED:
+                return
+            live_feedback.wait(job_id, seen, 0.5)
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Prometheus scrape endpoint: stage timings, bytes, LLM tokens and cache hits for this process
+@app.route('/metrics')
+def metrics_route():
+    return Response(metrics.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+# Students picked by ?students=1,2,3 and/or ?test=<test id>
+def _export_students():
+    from bulk_export import iter_output_students, students_by_test
+    ids = request.args.get("students")
+    ids = [secure_filename(s) for s in ids.split(",")] if ids else None
+    test = request.args.get("test")
+    if test:
+        ids = students_by_test(main.OUTPUT_DIR, ids).get(test, [])
+    return iter_output_students(main.OUTPUT_DIR, ids)
+
+# Whole batch as a ZIP of per-student PDFs, rendered and streamed entry by entry (nothing staged on disk)
+@app.route('/export.zip')
+def export_zip():
+    from bulk_export import zip_stream
+    return Response(zip_stream(_export_students()), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=feedback_reports.zip"})
+
+# Whole batch as one merged PDF sharing fonts and the logo
+@app.route('/export.pdf')
+def export_pdf():
+    import io
+    from bulk_export import merged_pdf
+    data = merged_pdf(_export_students())
+    return send_file(io.BytesIO(data), mimetype="application/pdf", as_attachment=True,
+                     download_name="feedback_reports.pdf")
+
 @app.route('/download/<student_id>')
 def download_file(student_id):
-    pdf_path = f"{base_path}/feedback/feedback_{student_id}.pdf"
+    pdf_path = os.path.join(main.OUTPUT_DIR, f"feedback_{secure_filename(student_id)}.pdf")
     print(f"Sending PDF: {pdf_path}")
     return send_file(pdf_path, as_attachment=True)
 
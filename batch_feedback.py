@@ -0,0 +1,157 @@
+import json
+import re
+
+import main
+import metrics
+from feedback_cache import feedback_key, get_feedback_cache
+from llm_client import get_llm_client
+
+DEFAULT_BATCH_SIZE = 5
+TOKENS_PER_STUDENT = 500
+MAX_BATCH_TOKENS = 6000
+MAX_WEAK_CHAPTERS = 5
+SECTIONS = ("Personalized Introduction", "Performance Breakdown", "Time Management Insights",
+            "Actionable Recommendations")
+BATCH_SYSTEM_MESSAGE = main.SYSTEM_MESSAGE + " You answer with a single JSON object and nothing else."
+
+# Shared instructions sent once per request instead of once per student
+BATCH_INSTRUCTIONS = f"""Write performance feedback for each student below.
+
+For every student, write markdown with these four bold headings in order: {", ".join(f"**{s}**" for s in SECTIONS)}.
+- Personalized Introduction: start with "Great work on your recent test!", name the strongest subject and its accuracy, and the overall accuracy (correct/attempted).
+- Performance Breakdown: one bullet per subject, then the weakest chapters with their accuracy.
+- Time Management Insights: average minutes per question, fastest and slowest chapter.
+- Actionable Recommendations: three numbered tips: practice the weakest chapter, a time strategy for the slowest chapter, and Khan Academy tutorials for the strongest subject.
+If percentile ranks are given, mention how the student compares with the cohort.
+If progress is given (area: [this test, last test] accuracy), say what went up or down since the last test, e.g. "up from 42% last test".
+If commonly missed questions are given (chapter: [questions missed, cohort accuracy]), say most students also get these wrong.
+Tone: encouraging, specific and growth-focused. Keep each student's feedback under 250 words.
+
+Respond with JSON of the form {{"feedback": [{{"student_id": "<id>", "feedback": "<markdown>"}}]}} with exactly one entry per student.
+
+Students (accuracy in %, time in minutes, chapter time in seconds per question):
+"""
+
+
+def _num(value):
+    value = value.item() if hasattr(value, "item") else value
+    return round(value, 2) if isinstance(value, float) else value
+
+
+def _values(column):
+    return [_num(value) for value in column.tolist()]
+
+
+# {key: [value, ...]} built from whole columns rather than row by row
+def _by_key(df, key, *columns):
+    return dict(zip(df[key].tolist(), map(list, zip(*(_values(df[column]) for column in columns)))))
+
+
+# The facts build_prompt uses, as a small JSON-able dict
+def student_summary(overall, subject_df, weak_df, cohort_df=None, progress_df=None, missed_df=None):
+    top = subject_df.loc[subject_df["Accuracy (%)"].idxmax()]
+    by_time = weak_df["Avg Time per Question (s)"]
+    summary = {
+        "overall_accuracy": _num(overall["Accuracy (%)"]),
+        "correct": _num(overall["Total Correct"]),
+        "attempted": _num(overall["Total Questions Attempted"]),
+        "avg_min_per_question": round(overall["Total Time (min)"] / overall["Total Questions Attempted"], 1),
+        "strongest_subject": top["Subject"],
+        "subjects": _by_key(subject_df, "Subject", "Accuracy (%)", "Time Taken (min)"),
+        "weak_chapters": _by_key(weak_df.head(MAX_WEAK_CHAPTERS), "Chapter", "Accuracy (%)",
+                                 "Avg Time per Question (s)"),
+        "fastest_chapter": weak_df.loc[by_time.idxmin(), "Chapter"],
+        "slowest_chapter": weak_df.loc[by_time.idxmax(), "Chapter"],
+    }
+    if cohort_df is not None and not cohort_df.empty:
+        summary["percentiles"] = dict(zip(cohort_df["Area"].tolist(), _values(cohort_df["Percentile"])))
+    if progress_df is not None and not progress_df.empty:
+        summary["progress"] = _by_key(progress_df, "Area", "This Test (%)", "Last Test (%)")
+    if missed_df is not None and not missed_df.empty:
+        summary["commonly_missed"] = _by_key(missed_df, "Chapter", "Questions Missed", "Cohort Accuracy (%)")
+    return summary
+
+
+def _summary_json(summary):
+    return json.dumps(summary, separators=(",", ":"), sort_keys=True)
+
+
+def build_batch_prompt(summaries):
+    lines = [json.dumps({"student_id": student_id, **summary}, separators=(",", ":"))
+             for student_id, summary in summaries.items()]
+    return BATCH_INSTRUCTIONS + "\n".join(lines)
+
+
+# Map student_id -> feedback for every well-formed entry; anything else is left out
+def parse_batch_reply(text, student_ids):
+    try:
+        reply = json.loads(text)
+    except (TypeError, ValueError):
+        match = re.search(r"\{.*\}", text or "", re.S)
+        try:
+            reply = json.loads(match.group(0)) if match else {}
+        except ValueError:
+            reply = {}
+    entries = reply.get("feedback", []) if isinstance(reply, dict) else []
+    parsed = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        student_id, feedback = str(entry.get("student_id")), entry.get("feedback")
+        if student_id in student_ids and isinstance(feedback, str) and \
+                all(section.lower() in feedback.lower() for section in SECTIONS):
+            parsed[student_id] = feedback.strip()
+    return parsed
+
+
+# Feedback for several students in one request.
+# `students` holds (student_id, overall, subject_df, weak_df, cohort_df, progress_df, missed_df) tuples;
+# returns {student_id: feedback or None}.
+# Students missing from, or malformed in, the reply are re-issued one at a time via main.generate_feedback.
+def generate_feedback_batch(students):
+    if main.FEEDBACK_MODE == "local":
+        return {student_id: main.generate_feedback(student_id, overall, subject_df, weak_df, cohort_df, progress_df,
+                                                   missed_df)
+                for student_id, overall, subject_df, weak_df, cohort_df, progress_df, missed_df in students}
+    cache = get_feedback_cache(main.OUTPUT_DIR)
+    results, summaries, keys = {}, {}, {}
+    for student_id, overall, subject_df, weak_df, cohort_df, progress_df, missed_df in students:
+        try:
+            summary_json = _summary_json(student_summary(overall, subject_df, weak_df, cohort_df, progress_df,
+                                                         missed_df))
+        except Exception as e:
+            print(f"Error summarizing student {student_id}: {e}")
+            continue
+        keys[student_id] = feedback_key(main.LLM_MODEL, main.LLM_TEMPERATURE, BATCH_SYSTEM_MESSAGE,
+                                        BATCH_INSTRUCTIONS + summary_json)
+        feedback = cache.get(keys[student_id])
+        if feedback is not None:
+            print(f"Feedback cache hit for student {student_id}")
+            main.save_feedback(student_id, feedback)
+            results[student_id] = feedback
+        else:
+            summaries[student_id] = json.loads(summary_json)
+
+    if summaries:
+        prompt = build_batch_prompt(summaries)
+        print(f"Batch prompt for {len(summaries)} students ready - length: {len(prompt)} chars")
+        try:
+            with metrics.stage("llm"):
+                text = get_llm_client().complete(prompt, BATCH_SYSTEM_MESSAGE,
+                                                 min(TOKENS_PER_STUDENT * len(summaries), MAX_BATCH_TOKENS),
+                                                 json_mode=True)
+            parsed = parse_batch_reply(text, set(summaries))
+        except Exception as e:
+            print(f"Error generating batch feedback: {e}")
+            parsed = {}
+        for student_id, feedback in parsed.items():
+            cache.put(keys[student_id], feedback)
+            main.save_feedback(student_id, feedback)
+            results[student_id] = feedback
+
+    for student_id, overall, subject_df, weak_df, cohort_df, progress_df, missed_df in students:
+        if student_id not in results:
+            print(f"Re-issuing feedback for student {student_id} on its own")
+            results[student_id] = main.generate_feedback(student_id, overall, subject_df, weak_df, cohort_df,
+                                                          progress_df, missed_df)
+    return results
@@ -0,0 +1,337 @@
+import argparse
+import glob
+import hashlib
+import inspect
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import main
+import batch_feedback
+import metrics
+from chart_renderer import get_chart_renderer
+from cohort import build_cohort_index, save_cohort_index
+from feedback_cache import get_feedback_cache
+from item_index import build_item_index
+from label_stats import extract_label_columns, hierarchical_breakdown
+from manifest import Manifest, hash_file, hash_submission, load_analysis, load_feedback, stage_outputs
+from rate_limiter import get_rate_limiter
+from report_engine import get_report_template
+from submission_schema import SubmissionError, iter_valid_submissions, load_submission, report_invalid
+from submission_stream import submission_id
+
+
+# How pool workers are started. "forkserver" forks each worker from a server process that has already
+# imported WORKER_PRELOAD, so workers start warm without inheriting the parent's threads and sockets;
+# "fork" and "spawn" are the stdlib alternatives.
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "forkserver")
+WORKER_PRELOAD = ["main", "manifest", "report_engine", "chart_renderer", "local_feedback", "pandas", "fpdf",
+                  "matplotlib.figure", "matplotlib.backends.backend_agg"]
+
+
+# Per-stage counters used for throughput reporting
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.ok = 0
+        self.failed = 0
+        self.started = None
+        self.busy_until = None
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def record(self, success):
+        if success:
+            self.ok += 1
+        else:
+            self.failed += 1
+        self.busy_until = time.perf_counter()
+
+    def throughput(self):
+        done = self.ok + self.failed
+        if not done or self.started is None:
+            return 0.0
+        elapsed = max(self.busy_until - self.started, 1e-9)
+        return done / elapsed
+
+    def summary(self):
+        return f"{self.name}: {self.ok} ok, {self.failed} failed, {self.throughput():.2f} students/s"
+
+
+def _worker_context(start_method=None):
+    start_method = start_method or WORKER_START_METHOD
+    if start_method not in multiprocessing.get_all_start_methods():
+        return None  # e.g. forkserver on Windows: use the platform default
+    ctx = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        ctx.set_forkserver_preload(WORKER_PRELOAD)
+    return ctx
+
+
+# Runs once in every pool worker so module-level paths match the parent; the report template (logo
+# parsing) and the chart figure are built here rather than on the worker's first student
+def _init_worker(base_path, data_dir, output_dir, item_index_dir):
+    main.configure_paths(base_path, data_dir, output_dir)
+    main.ITEM_INDEX_DIR = item_index_dir
+    get_report_template(base_path)
+    if main.CHART_MODE == "png":
+        get_chart_renderer()
+
+
+def _student_id(file_path):
+    return os.path.basename(file_path).split('_')[-1].split('.')[0]
+
+
+# (student_id, task, args, input_hash) for every submission; exports are streamed one submission at a time
+def _iter_jobs(files, stream):
+    for json_file in files:
+        if not stream:
+            yield _student_id(json_file), main.analyze_single_student, (json_file,), hash_file(json_file)
+            continue
+        stem = os.path.basename(json_file).split('.')[0]
+        for i, data in enumerate(iter_valid_submissions(json_file, skip_invalid=True,
+                                                        fingerprint=bool(main.ITEM_INDEX_DIR))):
+            student_id = submission_id(data, f"{stem}-{i}")
+            yield student_id, main.analyze_submission, (data, student_id), hash_submission(data)
+
+
+# (student_id, submission) pairs for a cohort pass in the parent process; `fingerprint` keeps question
+# fingerprints for building an item index
+def _iter_submission_data(files, stream, fingerprint=False):
+    for json_file in files:
+        if not stream:
+            try:
+                yield _student_id(json_file), load_submission(json_file, fingerprint=fingerprint)
+            except SubmissionError as e:
+                report_invalid(os.path.basename(json_file), e)
+            continue
+        stem = os.path.basename(json_file).split('.')[0]
+        for i, data in enumerate(iter_valid_submissions(json_file, skip_invalid=True, fingerprint=fingerprint)):
+            yield submission_id(data, f"{stem}-{i}"), data
+
+
+def _report(stats):
+    print("📊 " + " | ".join(s.summary() for s in stats.values()))
+
+
+# Task 1 and Task 3 run in a process pool, Task 2 (LLM calls) in a thread pool.
+# Stages whose inputs and code are unchanged since the last run (per the manifest) are skipped.
+# With feedback_batch_size > 1, students waiting for feedback are packed into shared LLM requests.
+def run_batch(files, base_path, data_dir=None, output_dir=None, workers=None, llm_workers=4,
+              max_in_flight=None, report_interval=10.0, stream=False, cohort=None, force=False,
+              feedback_batch_size=1):
+    main.configure_paths(base_path, data_dir, output_dir)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4 + llm_workers * feedback_batch_size
+    stats = {
+        "analyze": StageStats("Task 1"),
+        "feedback": StageStats("Task 2"),
+        "pdf": StageStats("Task 3"),
+    }
+    manifest = Manifest(main.OUTPUT_DIR)
+    cohort_hash = cohort.fingerprint() if cohort is not None else ""
+    if feedback_batch_size > 1:
+        # Batched feedback comes from a different prompt, so it gets its own manifest fingerprints
+        cohort_hash += hashlib.sha256(inspect.getsource(batch_feedback).encode("utf-8")).hexdigest()
+    feedback_queue = []
+    jobs = _iter_jobs(files, stream)
+    pending = {}
+    in_flight = 0
+    pdf_paths = {}
+    skipped = 0
+    last_report = time.perf_counter()
+
+    worker_args = (main.BASE_PATH, main.DATA_DIR, main.OUTPUT_DIR, main.ITEM_INDEX_DIR)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context(), initializer=_init_worker,
+                             initargs=worker_args) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers) as llm_pool:
+
+        def submit_feedback(student_id, ctx):
+            if cohort is not None:
+                ctx["cohort_df"] = cohort.student_ranks(ctx["overall"], ctx["subject_df"], ctx["weak_df"])
+            stats["feedback"].start()
+            if feedback_batch_size > 1:
+                feedback_queue.append((student_id, ctx))
+                if len(feedback_queue) >= feedback_batch_size:
+                    flush_feedback()
+                return
+            fut = llm_pool.submit(main.generate_feedback, student_id, ctx["overall"], ctx["subject_df"],
+                                  ctx["weak_df"], ctx.get("cohort_df"), ctx.get("progress_df"), ctx.get("missed_df"))
+            pending[fut] = ("feedback", student_id, ctx)
+
+        def flush_feedback():
+            batch = feedback_queue[:]
+            feedback_queue.clear()
+            fut = llm_pool.submit(batch_feedback.generate_feedback_batch,
+                                  [(student_id, ctx["overall"], ctx["subject_df"], ctx["weak_df"], ctx.get("cohort_df"),
+                                    ctx.get("progress_df"), ctx.get("missed_df")) for student_id, ctx in batch])
+            pending[fut] = ("feedback_batch", None, batch)
+
+        def finish_feedback(student_id, ctx, feedback):
+            nonlocal in_flight
+            stats["feedback"].record(bool(feedback))
+            if not feedback:
+                print(f"❌ Skipping student {student_id} due to feedback generation failure")
+                in_flight -= 1
+                return
+            manifest.record(student_id, "feedback", ctx["fingerprints"]["feedback"])
+            submit_pdf(student_id, ctx, feedback)
+
+        def submit_pdf(student_id, ctx, feedback):
+            stats["pdf"].start()
+            fut = cpu_pool.submit(metrics.collect, main.text_to_pdf, student_id, feedback, ctx["subject_df"], ctx["weak_df"],
+                                  ctx["chart_path"], ctx.get("cohort_df"), ctx.get("progress_df"))
+            pending[fut] = ("pdf", student_id, ctx)
+
+        def refill():
+            nonlocal in_flight, skipped
+            while in_flight < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    return
+                student_id, task, args, input_hash = job
+                ctx = {"fingerprints": manifest.fingerprints(input_hash, cohort_hash)}
+                stage = "analyze" if force else manifest.first_stale_stage(student_id, ctx["fingerprints"])
+                if stage is None:
+                    skipped += 1
+                    pdf_paths[student_id] = stage_outputs(student_id, main.OUTPUT_DIR)["pdf"][0]
+                    continue
+                in_flight += 1
+                if stage != "analyze":
+                    try:
+                        ctx.update(load_analysis(student_id, main.OUTPUT_DIR))
+                        feedback = load_feedback(student_id, main.OUTPUT_DIR) if stage == "pdf" else None
+                    except (OSError, ValueError) as e:
+                        print(f"Previous outputs for student {student_id} unreadable ({e}), re-running all stages")
+                        stage = "analyze"
+                if stage == "analyze":
+                    stats["analyze"].start()
+                    fut = cpu_pool.submit(metrics.collect, task, *args)
+                    pending[fut] = ("analyze", student_id, ctx)
+                elif stage == "feedback":
+                    submit_feedback(student_id, ctx)
+                else:
+                    if cohort is not None:
+                        ctx["cohort_df"] = cohort.student_ranks(ctx["overall"], ctx["subject_df"], ctx["weak_df"])
+                    submit_pdf(student_id, ctx, feedback)
+
+        refill()
+        while True:
+            # Send a partial batch once no analysis is left that could top it up
+            if feedback_queue and not any(p[0] == "analyze" for p in pending.values()):
+                flush_feedback()
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, student_id, ctx = pending.pop(fut)
+                try:
+                    value = fut.result()
+                    if stage in ("analyze", "pdf"):
+                        # Worker processes send back the counters they recorded for this call
+                        value, recorded = value
+                        metrics.registry.merge(recorded)
+                except Exception as e:
+                    print(f"❌ {stage} failed for student {student_id}: {e}")
+                    value = None
+
+                if stage == "analyze":
+                    stats["analyze"].record(bool(value and value.get("overall")))
+                    if not (value and value.get("overall")):
+                        print(f"❌ Skipping student {student_id} due to data processing failure")
+                        in_flight -= 1
+                        continue
+                    manifest.record(student_id, "analyze", ctx["fingerprints"]["analyze"])
+                    ctx.update(value)
+                    submit_feedback(student_id, ctx)
+
+                elif stage == "feedback":
+                    finish_feedback(student_id, ctx, value)
+
+                elif stage == "feedback_batch":
+                    for batch_student, batch_ctx in ctx:
+                        finish_feedback(batch_student, batch_ctx, (value or {}).get(batch_student))
+
+                else:
+                    stats["pdf"].record(bool(value))
+                    in_flight -= 1
+                    if value:
+                        manifest.record(student_id, "pdf", ctx["fingerprints"]["pdf"])
+                        pdf_paths[student_id] = value
+                    else:
+                        print(f"❌ PDF generation failed for student {student_id}")
+
+            refill()
+            if time.perf_counter() - last_report >= report_interval:
+                _report(stats)
+                last_report = time.perf_counter()
+
+    manifest.close()
+    _report(stats)
+    if skipped:
+        print(f"⏭️ Skipped {skipped} unchanged students")
+    return pdf_paths, stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate MathonGo feedback reports for a batch of submissions")
+    parser.add_argument("--base-path", default=main.BASE_PATH, help="directory holding data/, output/ and the logo")
+    parser.add_argument("--data-dir", help="input directory (default: <base-path>/data)")
+    parser.add_argument("--output-dir", help="output directory (default: <base-path>/output)")
+    parser.add_argument("--pattern", default="sample_submission_analysis_*.json", help="glob for submission files")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for Task 1 and Task 3")
+    parser.add_argument("--llm-workers", type=int, default=4, help="concurrent LLM requests for Task 2")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="students held in memory at once")
+    parser.add_argument("--stream", action="store_true",
+                        help="treat inputs as exports (JSON array, JSON Lines, .gz) holding many submissions")
+    parser.add_argument("--cohort", action="store_true",
+                        help="rank every student against the whole batch before generating feedback")
+    parser.add_argument("--item-index", metavar="DIR",
+                        help="build the question-level item index over the batch into DIR and list each "
+                             "student's commonly missed questions in the feedback prompt")
+    parser.add_argument("--feedback-batch-size", type=int, default=1,
+                        help="students per LLM request for Task 2 (1 = one request per student)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild every stage")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds between throughput reports")
+    return parser.parse_args(argv)
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    data_dir = args.data_dir or os.path.join(args.base_path, "data")
+    files = sorted(glob.glob(os.path.join(data_dir, args.pattern)))
+    print(f"Found {len(files)} submission files in {data_dir}")
+    start = time.perf_counter()
+    cohort = None
+    if args.cohort:
+        cohort = build_cohort_index(_iter_submission_data(files, args.stream))
+        output_dir = args.output_dir or os.path.join(args.base_path, "output")
+        save_cohort_index(cohort, output_dir)
+        labels = extract_label_columns(_iter_submission_data(files, args.stream))
+        hierarchical_breakdown(labels, by_student=False).to_csv(os.path.join(output_dir, "label_breakdown.csv"),
+                                                                index=False)
+        print(f"Built cohort index for {len(cohort.tests)} test(s) in {time.perf_counter() - start:.1f}s")
+    if args.item_index:
+        index = build_item_index((data for _, data in _iter_submission_data(files, args.stream, fingerprint=True)),
+                                 args.item_index)
+        print(f"Built item index of {len(index)} questions from {index.students} submissions in {args.item_index}")
+        main.ITEM_INDEX_DIR = args.item_index
+    pdf_paths, stats = run_batch(files, args.base_path, data_dir, args.output_dir, args.workers,
+                                 args.llm_workers, args.max_in_flight, args.report_interval, args.stream, cohort,
+                                 args.force, args.feedback_batch_size)
+    print(f"✅ Generated {len(pdf_paths)} reports from {len(files)} input files in {time.perf_counter() - start:.1f}s")
+    print(f"Feedback cache: {get_feedback_cache(main.OUTPUT_DIR).stats()}")
+    print(f"LLM usage: {get_rate_limiter().usage_snapshot()}")
+    summary_path = metrics.write_summary(os.path.join(main.OUTPUT_DIR, "metrics_summary.json"))
+    print(f"📊 Stage metrics saved to {summary_path}")
+    for name, stage in sorted(metrics.summary()["stages"].items()):
+        print(f"   {name:<15} {stage['calls']:>6} calls  {stage['wall_seconds']:>9.2f}s wall  "
+              f"{stage['cpu_seconds']:>9.2f}s CPU  {stage['mean_wall_ms']:>9.1f} ms/call")
+    return 1 if any(s.failed for s in stats.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import batch_feedback  # noqa: E402
+from rate_limiter import get_rate_limiter  # noqa: E402
+
+
+# `count` distinct students built from the sample submissions (accuracies nudged so prompts never repeat)
+def make_students(count):
+    samples = [main.analyze_single_student(os.path.join(ROOT, "data", f"sample_submission_analysis_{i}.json"))
+               for i in (1, 2, 3)]
+    students = []
+    for i in range(count):
+        result = samples[i % len(samples)]
+        subject_df = result["subject_df"].copy()
+        subject_df["Accuracy (%)"] = (subject_df["Accuracy (%)"] + i * 0.01).round(2)
+        students.append((f"bench{i}", result["overall"], subject_df, result["weak_df"], None, None, None))
+    return students
+
+
+def run_single(students, llm_workers):
+    with ThreadPoolExecutor(max_workers=llm_workers) as pool:
+        return list(pool.map(lambda s: main.generate_feedback(*s), students))
+
+
+def run_batched(students, llm_workers, batch_size):
+    chunks = [students[i:i + batch_size] for i in range(0, len(students), batch_size)]
+    with ThreadPoolExecutor(max_workers=llm_workers) as pool:
+        return [f for reply in pool.map(batch_feedback.generate_feedback_batch, chunks) for f in reply.values()]
+
+
+# Tokens per student and students per minute for one mode, from the limiter's usage counters
+def measure(name, fn, students):
+    before = get_rate_limiter().usage_snapshot()
+    start = time.perf_counter()
+    feedback = fn(students)
+    elapsed = time.perf_counter() - start
+    after = get_rate_limiter().usage_snapshot()
+    used = {k: after[k] - before[k] for k in after}
+    ok = sum(1 for f in feedback if f)
+    tokens = (used["prompt_tokens"] + used["completion_tokens"]) / max(ok, 1)
+    print(f"{name:>8}: {ok}/{len(students)} students, {used['requests']} requests, "
+          f"{tokens:,.0f} tokens/student ({used['prompt_tokens'] / max(ok, 1):,.0f} prompt), "
+          f"{ok / elapsed * 60:,.1f} students/min")
+
+
+# Without an API key, compare prompt sizes only (~4 characters per token)
+def dry_run(students, batch_size):
+    single = sum(len(main.SYSTEM_MESSAGE) + len(main.build_prompt(*s[1:])) for s in students) / 4 / len(students)
+    summaries = {s[0]: batch_feedback.student_summary(*s[1:]) for s in students[:batch_size]}
+    batched = (len(batch_feedback.BATCH_SYSTEM_MESSAGE) + len(batch_feedback.build_batch_prompt(summaries))) / 4
+    print(f"  single: ~{single:,.0f} prompt tokens/student, 1 request/student")
+    print(f" batched: ~{batched / len(summaries):,.0f} prompt tokens/student, "
+          f"1 request per {len(summaries)} students")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batched and one-at-a-time LLM feedback generation")
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=batch_feedback.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--llm-workers", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="estimate prompt tokens without calling the API")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Fresh output dir, so the feedback cache starts empty
+        main.configure_paths(ROOT, output_dir=tmp)
+        students = make_students(args.students)
+        if args.dry_run or not os.getenv("GROQ_API_KEY"):
+            dry_run(students, args.batch_size)
+        else:
+            measure("single", lambda s: run_single(s, args.llm_workers), students)
+            measure("batched", lambda s: run_batched(s, args.llm_workers, args.batch_size), students)
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from bulk_export import iter_output_students, merged_pdf, zip_stream  # noqa: E402
+from local_feedback import local_feedback  # noqa: E402
+from synthetic import add_options, options_from, write_submissions  # noqa: E402
+
+
+# Task 1 outputs and local feedback for every synthetic student, as a finished batch would leave them
+def prepare(files):
+    for path in files:
+        result = main.analyze_single_student(path)
+        student_id = os.path.basename(path).split('_')[-1].split('.')[0]
+        feedback = local_feedback(result["overall"], result["subject_df"], result["weak_df"])
+        with open(main.output_path(f"feedback_{student_id}.txt"), "w", encoding="utf-8") as f:
+            f.write(feedback)
+
+
+# Current path: one text_to_pdf call and one file per student, zipped from disk for a bulk download
+def per_file(students, zip_path):
+    paths = [main.text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"])
+             for student_id, feedback, result in students]
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for path in paths:
+            archive.write(path, os.path.basename(path))
+    return os.path.getsize(zip_path)
+
+
+def streamed_zip(students):
+    return sum(len(chunk) for chunk in zip_stream(students))
+
+
+def merged(students, path):
+    merged_pdf(students, path)
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-file PDFs vs a merged PDF vs a streamed ZIP")
+    parser.add_argument("--students", type=int, default=200)
+    add_options(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_submissions(os.path.join(tmp, "data"), args.students, args.seed, **options_from(args))
+        main.configure_paths(ROOT, output_dir=os.path.join(tmp, "output"))
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            prepare(files)
+            cases = (
+                ("per-file PDFs + zip from disk", lambda s: per_file(s, os.path.join(tmp, "per_file.zip"))),
+                ("streamed ZIP (no staging)", streamed_zip),
+                ("one merged PDF", lambda s: merged(s, os.path.join(tmp, "merged.pdf"))),
+            )
+            results = []
+            for label, fn in cases:
+                students = list(iter_output_students(main.OUTPUT_DIR))  # loading is the same for every mode
+                start = time.perf_counter()
+                size = fn(students)
+                results.append((label, time.perf_counter() - start, size))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"{args.students} students ({main.CHART_MODE} charts):")
+    for label, seconds, size in results:
+        print(f"  {label:<32} {args.students / seconds:>8.1f} students/s  {size / 1024 / 1024:>8.2f} MB")
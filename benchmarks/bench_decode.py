@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import add_options, options_from, write_submissions  # noqa: E402
+from submission_schema import HAS_MSGSPEC, HAS_ORJSON, load_submission  # noqa: E402
+from submission_stream import iter_submissions  # noqa: E402
+
+
+def _json_load(path):
+    with open(path) as f:
+        return json.load(f)[0]
+
+
+def _orjson_load(path):
+    import orjson
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())[0]
+
+
+# "json.load" is what load_json did before validation, "orjson" the same with orjson: whole files, no checks.
+# "stream" is the export reader (incremental json decoding, then pruning). The load_submission entries
+# validate against the models: "msgspec" decodes straight into them, "orjson"/"python" parse then copy.
+DECODERS = {"json.load": _json_load}
+if HAS_ORJSON:
+    DECODERS["orjson"] = _orjson_load
+DECODERS["stream"] = lambda path: next(iter_submissions(path))
+if HAS_MSGSPEC:
+    DECODERS["load/msgspec"] = lambda path: load_submission(path, "msgspec")
+if HAS_ORJSON:
+    DECODERS["load/orjson"] = lambda path: load_submission(path, "orjson")
+DECODERS["load/python"] = lambda path: load_submission(path, "python")
+
+
+# Peak and retained bytes, and allocations, while decoding one file
+def allocations(decode, path):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    data = decode(path)
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(max(stat.count_diff, 0) for stat in stats)
+    retained = sum(stat.size_diff for stat in stats)
+    del data
+    return peak, retained, blocks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-submission decode time and allocations: json.load and "
+                                                 "orjson baselines vs the validating decoders")
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    add_options(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_submissions(tmp, args.students, args.seed, **options_from(args))
+        size = sum(os.path.getsize(p) for p in paths) / len(paths)
+        for decode in DECODERS.values():
+            decode(paths[0])  # warm up imports and the msgspec decoder
+        results = {}
+        for name, decode in DECODERS.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for path in paths:
+                    decode(path)
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best / len(paths), allocations(decode, paths[0]))
+
+    print(f"{args.students} submissions of {size / 1024:.0f} KB, best of {args.repeat}:")
+    baseline = results["json.load"][0]
+    for name, (seconds, (peak, retained, blocks)) in results.items():
+        print(f"  {name:<13} {seconds * 1e6:8.0f} us/submission ({seconds / baseline:4.2f}x json.load)  "
+              f"peak {peak / 1024:7.0f} KB  kept {retained / 1024:6.0f} KB in {blocks:6d} blocks")
+    for name, module in (("msgspec", HAS_MSGSPEC), ("orjson", HAS_ORJSON)):
+        if not module:
+            print(f"{name} is not installed (pip install {name}); its decoders were not measured")
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import add_options, iter_synthetic, options_from  # noqa: E402
+
+MODES = ("standard", "compact")
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Keep every student's Task 1 frames in memory, as a cohort-wide run does, and report peak RSS
+def hold_cohort(args):
+    import main
+    from submission_stream import prune_submission
+
+    main.MEMORY_MODE = args.mode
+    submissions = iter_synthetic(args.students, args.seed, **options_from(args))
+
+    def analyze(data):
+        data = prune_submission(data)
+        chapter_df = main.extract_chapter_stats(data)
+        return main.extract_subject_metrics(data), chapter_df, main.identify_weak_chapters(chapter_df)
+
+    held = [analyze(next(submissions))]  # first student pays for the lazy imports
+    baseline = peak_rss_mb()
+    for data in submissions:
+        held.append(analyze(data))
+    print(json.dumps({"baseline": baseline, "peak": peak_rss_mb()}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS of a cohort's Task 1 frames, standard vs compact dtypes")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    add_options(parser)
+    args = parser.parse_args()
+
+    if args.mode:
+        hold_cohort(args)
+        sys.exit()
+
+    # Each mode runs in a fresh process, since peak RSS only ever grows
+    results = {}
+    for mode in MODES:
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, *sys.argv[1:]], check=True,
+                             capture_output=True, text=True).stdout
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{args.students} students held in memory (chapter, subject and weak frames):")
+    for mode, r in results.items():
+        held = r["peak"] - r["baseline"]
+        print(f"  {mode:<9} peak {r['peak']:>8.1f} MB  frames {held:>8.1f} MB  "
+              f"{held * 10000 / args.students:>8.1f} MB per 10k students")
+    standard, compact = (results[m]["peak"] - results[m]["baseline"] for m in MODES)
+    print(f"Compact frames use {standard / compact:.1f}x less memory")
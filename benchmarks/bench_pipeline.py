@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import add_options, options_from, write_submissions  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential main.py loop vs the pipelined scheduler, "
+                                                 "against the mock LLM server")
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock LLM seconds per response")
+    parser.add_argument("--llm-workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    add_options(parser)
+    args = parser.parse_args()
+
+    # The LLM settings are read at import, so point them at the mock server first
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GROQ_RPM", "100000")
+    os.environ.setdefault("GROQ_TPM", "0")
+    os.environ.setdefault("GROQ_MAX_IN_FLIGHT", str(args.llm_workers))
+
+    import main  # noqa: E402
+    import metrics  # noqa: E402
+    import pipeline  # noqa: E402
+    from manifest import Manifest  # noqa: E402
+    from mock_llm_server import make_server  # noqa: E402
+
+    server = make_server(port=args.port, latency=args.latency, jitter=args.latency / 10)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    main.FEEDBACK_MODE = "llm"
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_submissions(os.path.join(tmp, "data"), args.students, args.seed, **options_from(args))
+        for mode in ("sequential", "pipelined"):
+            # A fresh output directory per mode, so neither run is skipped by the manifest or feedback cache
+            main.configure_paths(tmp, output_dir=os.path.join(tmp, f"output_{mode}"))
+            main.PIPELINE_MODE = mode
+            metrics.registry.reset()
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, "w")
+            start = time.perf_counter()
+            try:
+                if mode == "pipelined":
+                    manifest = Manifest(main.OUTPUT_DIR)
+                    scheduler = pipeline.Pipeline(manifest, args.llm_workers)
+                    json_files = sorted(os.path.join(tmp, "data", f) for f in os.listdir(os.path.join(tmp, "data")))
+                    scheduler.run((os.path.basename(f).split('_')[-1].split('.')[0], f) for f in json_files)
+                    manifest.close()
+                else:
+                    main.run_pipeline()
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            elapsed = time.perf_counter() - start
+            done = sum(1 for f in os.listdir(main.OUTPUT_DIR) if f.endswith(".pdf"))
+            results[mode] = (done, elapsed)
+            if mode == "pipelined":
+                print("Pipelined stage utilization and mean queue depth:")
+                scheduler.report()
+    server.shutdown()
+
+    print(f"{args.students} students, {args.latency:.2f}s mock LLM latency, {args.llm_workers} LLM workers:")
+    for mode, (done, elapsed) in results.items():
+        print(f"  {mode:<10} {done} reports in {elapsed:6.1f}s  {done / elapsed:6.2f} students/s")
+    print(f"Speed-up: {results['sequential'][1] / results['pipelined'][1]:.1f}x")
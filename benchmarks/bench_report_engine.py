@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from report_engine import get_report_template  # noqa: E402
+
+SAMPLE_FEEDBACK = """**Personalized Introduction**
+Great work on your recent test! Your strongest subject was Chemistry with 80.0% accuracy.
+
+**Performance Breakdown**
+* Physics: 75.0% accuracy in 49.7 minutes
+* Chemistry: 80.0% accuracy in 23.3 minutes
+* Maths: 72.7% accuracy in 10.3 minutes
+
+**Actionable Recommendations**
+1. Focus practice on Electrochemistry, where accuracy is 7.69%.
+2. Spend less time per question on Sets and Relations.
+3. Review Khan Academy Chemistry tutorials.
+"""
+
+
+# Render `count` reports on one core and return reports per minute
+def bench(template, result, count, vector_chart):
+    start = time.perf_counter()
+    for i in range(count):
+        pdf = template.render(str(i), SAMPLE_FEEDBACK, result["subject_df"], result["weak_df"],
+                              result["chart_path"], vector_chart=vector_chart)
+        pdf.output()
+    return count / (time.perf_counter() - start) * 60
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled PDF report template")
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main.configure_paths(ROOT, output_dir=tmp)
+        result = main.analyze_single_student(os.path.join(ROOT, "data", "sample_submission_analysis_1.json"))
+        template = get_report_template(ROOT)
+        for vector_chart in (False, True):
+            rate = bench(template, result, args.count, vector_chart)
+            print(f"{'vector' if vector_chart else 'png':>6} chart: {rate:,.0f} reports/min on one core")
@@ -0,0 +1,85 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import batch_runner  # noqa: E402
+import main  # noqa: E402
+from synthetic import write_submissions  # noqa: E402
+
+HEAVY_MODULES = ("pandas", "matplotlib", "fpdf", "groq", "flask")
+
+
+# Best wall time of a fresh interpreter running `args`, in milliseconds
+def time_process(args, repeat, env=None):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def heavy_modules_after(statement):
+    code = f"import sys; {statement}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return out.strip() or "none"
+
+
+# Time from creating a pool to every worker finishing its first student (analysis + PDF).
+# The second pool shows the steady cost once a forkserver is already running.
+def time_pool(start_method, files, workers, base_path):
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=batch_runner._worker_context(start_method),
+                                 initializer=batch_runner._init_worker,
+                                 initargs=(base_path, None, os.path.join(base_path, "output"))) as pool:
+            list(pool.map(main.analyze_single_student, files[:workers]))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold start of the CLI, imports and pool workers")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per subprocess timing (best is kept)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--methods", default="fork,spawn,forkserver", help="pool start methods to compare")
+    args = parser.parse_args()
+
+    env = dict(os.environ, FEEDBACK_MODE="local")
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_submissions(os.path.join(tmp, "data"), args.workers)
+        print("Fresh interpreter (best of %d):" % args.repeat)
+        for label, cmd in (
+            ("python -c pass", ["-c", "pass"]),
+            ("import main", ["-c", "import main"]),
+            ("import app", ["-c", "import app"]),
+            ("python . --help", [".", "--help"]),
+            ("python . report (one student)", [".", "report", files[0], "--base-path", tmp]),
+        ):
+            print(f"  {label:<32} {time_process(cmd, args.repeat, env):>9.1f} ms")
+        print(f"Heavy modules loaded by `import main`: {heavy_modules_after('import main')}")
+        print(f"Heavy modules loaded by `import app`:  {heavy_modules_after('import app')}")
+
+        print(f"Pool of {args.workers} workers, time until each has finished one student:")
+        sys.stdout.flush()
+        for method in args.methods.split(","):
+            # Silence worker progress lines at the file-descriptor level, which spawned children inherit
+            saved, devnull = os.dup(1), os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            try:
+                first, second = time_pool(method, files, args.workers, tmp)
+            finally:
+                sys.stdout.flush()
+                os.dup2(saved, 1)
+                os.close(saved)
+                os.close(devnull)
+            print(f"  {method:<12} first pool {first:>9.1f} ms   next pool {second:>9.1f} ms")
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import add_options, iter_synthetic, options_from  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first feedback and to the finished PDF, waiting for the "
+                                                 "whole completion vs streaming it, against the mock LLM server")
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="mock LLM seconds between tokens")
+    parser.add_argument("--port", type=int, default=8766)
+    add_options(parser)
+    args = parser.parse_args()
+
+    # The LLM settings are read at import, so point them at the mock server first
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("GROQ_RPM", "100000")
+    os.environ.setdefault("GROQ_TPM", "0")
+
+    import main  # noqa: E402
+    from mock_llm_server import make_server  # noqa: E402
+    from submission_stream import prune_submission  # noqa: E402
+
+    server = make_server(port=args.port, latency=args.latency, jitter=0.0, token_delay=args.token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    main.FEEDBACK_MODE = "llm"
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        submissions = [prune_submission(data) for data in iter_synthetic(args.students, args.seed,
+                                                                         **options_from(args))]
+        for mode in ("blocking", "streaming"):
+            # A fresh output directory per mode, so the feedback cache never answers for the LLM
+            main.configure_paths(tmp, output_dir=os.path.join(tmp, f"output_{mode}"))
+            first, total = [], []
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, "w")
+            try:
+                for i, data in enumerate(submissions):
+                    student_id = f"s{i:05d}"
+                    result = main.analyze_submission(data, student_id)
+                    args_ = (student_id, result["overall"], result["subject_df"], result["weak_df"])
+                    start = time.perf_counter()
+                    if mode == "blocking":
+                        feedback = main.generate_feedback(*args_, progress_df=result["progress_df"])
+                        first.append(time.perf_counter() - start)
+                        main.text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"],
+                                         result["chart_path"], progress_df=result["progress_df"])
+                    else:
+                        seen = []
+
+                        def on_block(kind, text):
+                            if not seen and kind != "blank":
+                                seen.append(time.perf_counter() - start)
+
+                        main.stream_report(*args_, result["chart_path"], progress_df=result["progress_df"],
+                                           on_block=on_block)
+                        first.append(seen[0])
+                    total.append(time.perf_counter() - start)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            results[mode] = (sum(first) / len(first), sum(total) / len(total))
+    server.shutdown()
+
+    print(f"{args.students} students, {args.latency:.2f}s to first token, {args.token_delay * 1000:.0f}ms per token:")
+    for mode, (first, total) in results.items():
+        print(f"  {mode:<9} first feedback after {first:6.2f}s  PDF ready after {total:6.2f}s")
+    print(f"First feedback {results['blocking'][0] / results['streaming'][0]:.1f}x sooner, "
+          f"PDF ready {results['blocking'][1] / results['streaming'][1]:.2f}x sooner")
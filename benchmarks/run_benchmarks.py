@@ -0,0 +1,176 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from local_feedback import local_feedback  # noqa: E402
+from synthetic import add_options, options_from, write_submissions  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# `--suite`: the fixed sizes, seed and default generator options, so runs on any machine or commit compare
+SUITE_SIZES = "1,1000,100000"
+SUITE_SEED = 0
+STAGES = ("load_json", "extract_overall_metrics", "extract_subject_metrics", "extract_chapter_stats",
+          "identify_weak_chapters", "build_prompt", "local_feedback", "plot_time_vs_accuracy", "text_to_pdf")
+
+
+# Run every stage for each file in turn, timing each call; outputs are deleted as we go so disk use stays flat
+def run_pipeline(files):
+    totals = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+
+    def timed(stage, fn, *args):
+        start = clock()
+        value = fn(*args)
+        totals[stage] += clock() - start
+        return value
+
+    start = clock()
+    for i, path in enumerate(files):
+        student_id = str(i)
+        data = timed("load_json", main.load_json, path)
+        overall = timed("extract_overall_metrics", main.extract_overall_metrics, data)
+        subject_df = timed("extract_subject_metrics", main.extract_subject_metrics, data)
+        chapter_df = timed("extract_chapter_stats", main.extract_chapter_stats, data)
+        weak_df = timed("identify_weak_chapters", main.identify_weak_chapters, chapter_df)
+        timed("build_prompt", main.build_prompt, overall, subject_df, weak_df)
+        feedback = timed("local_feedback", local_feedback, overall, subject_df, weak_df)
+        chart_path = None
+        if main.CHART_MODE == "png":
+            chart_path = timed("plot_time_vs_accuracy", main.plot_time_vs_accuracy, subject_df, student_id)
+        pdf_path = timed("text_to_pdf", main.text_to_pdf, student_id, feedback, subject_df, weak_df, chart_path)
+        for output in (chart_path, pdf_path):
+            if output and os.path.exists(output):
+                os.remove(output)
+    return totals, clock() - start
+
+
+# Per-student microseconds for each stage and end to end; small sizes are repeated and the best run kept
+def bench_size(students, options, seed, quiet=True):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_submissions(os.path.join(tmp, "data"), students, seed, **options)
+        main.configure_paths(ROOT, output_dir=os.path.join(tmp, "output"))
+        repeat = max(1, 50 // students)
+        best_totals, best_wall = None, None
+        for _ in range(repeat):
+            stdout = sys.stdout
+            if quiet:
+                sys.stdout = open(os.devnull, "w")
+            try:
+                totals, wall = run_pipeline(files)
+            finally:
+                if quiet:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+            if best_wall is None or wall < best_wall:
+                best_totals, best_wall = totals, wall
+    result = {stage: round(seconds / students * 1e6, 1) for stage, seconds in best_totals.items() if seconds}
+    result["end_to_end"] = round(best_wall / students * 1e6, 1)
+    return {"per_student_us": result, "students_per_s": round(students / best_wall, 2), "repeat": repeat}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# Newest results file from a run of the same kind (suite or ad hoc)
+def latest_result(exclude=None, suite=False):
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), reverse=True):
+        if path == exclude:
+            continue
+        with open(path) as f:
+            if bool(json.load(f).get("suite")) == suite:
+                return path
+    return None
+
+
+# Stage@size pairs whose per-student time grew by more than `threshold` (0.15 = 15%)
+def find_regressions(current, baseline, threshold):
+    regressions = []
+    for size, result in current["sizes"].items():
+        before = baseline.get("sizes", {}).get(size, {}).get("per_student_us", {})
+        for stage, us in result["per_student_us"].items():
+            if stage in before and before[stage] and us > before[stage] * (1 + threshold):
+                regressions.append((stage, size, before[stage], us))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="run_benchmarks",
+                                     description="Time each pipeline stage and the whole pipeline on synthetic data")
+    parser.add_argument("--sizes", default="1,1000", help="comma-separated student counts, e.g. 1,1000,100000")
+    parser.add_argument("--suite", action="store_true",
+                        help=f"the repeatable suite: sizes {SUITE_SIZES}, seed {SUITE_SEED} and default data options")
+    parser.add_argument("--baseline", help="results file to compare with (default: the latest of the same kind)")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging a regression")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    add_options(parser)
+    args = parser.parse_args(argv)
+    if args.suite:
+        defaults = parser.parse_args([])
+        args.sizes, args.seed = SUITE_SIZES, SUITE_SEED
+        args.options = options_from(defaults)
+    else:
+        args.options = options_from(args)
+    return args
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "chart_mode": main.CHART_MODE,
+        "suite": args.suite,
+        "seed": args.seed,
+        "options": args.options,
+        "sizes": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"Benchmarking {size} students...")
+        run["sizes"][str(size)] = result = bench_size(size, args.options, args.seed)
+        for stage, us in result["per_student_us"].items():
+            print(f"  {stage:<26} {us:>12,.1f} us/student")
+        print(f"  {result['students_per_s']:,.1f} students/s end to end")
+
+    baseline_path = args.baseline or latest_result(suite=args.suite)
+    saved = None
+    if not args.no_save:
+        saved = args.out or os.path.join(RESULTS_DIR, f"{run['timestamp'].replace(':', '')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(saved)), exist_ok=True)
+        with open(saved, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved results to {saved}")
+
+    if not baseline_path or os.path.abspath(baseline_path) == os.path.abspath(saved or ""):
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("options") != run["options"] or baseline.get("seed", run["seed"]) != run["seed"]:
+        print(f"⚠️ {baseline_path} used different data options; not comparing")
+        return 0
+    regressions = find_regressions(run, baseline, args.threshold)
+    print(f"Compared with {baseline_path}: {len(regressions)} regression(s)")
+    for stage, size, before, after in regressions:
+        print(f"  ❌ {stage} @ {size} students: {before:,.1f} -> {after:,.1f} us/student")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,152 @@
+import argparse
+import gzip
+import json
+import os
+import random
+
+# Subject ids the pipeline maps to names (main.SUBJECT_MAP), with real chapters first
+SUBJECTS = {
+    "Physics": ("607018ee404ae53194e73d92", ["Capacitance", "Electrostatics", "Current Electricity",
+                                             "Kinematics", "Laws of Motion", "Rotational Motion"]),
+    "Chemistry": ("607018ee404ae53194e73d90", ["Electrochemistry", "Solutions", "Chemical Kinetics",
+                                               "Thermodynamics", "Chemical Bonding", "Equilibrium"]),
+    "Mathematics": ("607018ee404ae53194e73d91", ["Functions", "Sets and Relations", "Limits",
+                                                 "Matrices", "Probability", "Sequences and Series"]),
+}
+LEVELS = ("easy", "medium", "tough")
+STATUS_WEIGHTS = (("answered", 0.63), ("markedReview", 0.32), ("notAnswered", 0.05))
+CORRECT_RATE = {"easy": 0.85, "medium": 0.7, "tough": 0.5}
+
+
+def _oid(rng):
+    return {"$oid": "%024x" % rng.getrandbits(96)}
+
+
+def _chapters(subject, count):
+    names = SUBJECTS[subject][1]
+    return [names[i] if i < len(names) else f"{subject} Chapter {i + 1}" for i in range(count)]
+
+
+def _question(rng, subject, chapter, numerical, skill, with_text):
+    level = rng.choice(LEVELS)
+    status = rng.choices([s for s, _ in STATUS_WEIGHTS], [w for _, w in STATUS_WEIGHTS])[0]
+    attempted = status == "answered"
+    correct = attempted and rng.random() < CORRECT_RATE[level] * skill
+    topic = f"{chapter} Topic {rng.randint(1, 4)}"
+    question = {
+        "questionId": {
+            "chapters": [{"title": chapter}],
+            "topics": [{"title": topic}],
+            "concepts": [{"title": f"{topic} Concept {rng.randint(1, 3)}"}],
+            "level": level,
+        },
+        "markedOptions": [] if numerical or not attempted else
+        [{"_id": _oid(rng), "optionId": "%06x" % rng.getrandbits(24), "isCorrect": correct}],
+        "inputValue": {"value": str(rng.randint(1, 99)) if numerical and attempted else None,
+                       "isCorrect": bool(numerical and correct)},
+        "timeTaken": rng.randint(5, 240) if attempted else rng.randint(0, 20),
+        "timeLeftWhenAttempted": rng.randint(0, 180),
+        "status": status,
+    }
+    if with_text:
+        question["questionId"]["question"] = {
+            "text": f"A {level} {subject.lower()} question on {topic}. " + "Lorem ipsum dolor sit amet. " * 6}
+    return question, attempted, correct
+
+
+# One submission in the sample_submission_analysis_*.json schema
+def make_submission(rng, questions_per_section=20, numerical_per_section=5, chapters_per_subject=2,
+                    with_text=True):
+    skill = rng.uniform(0.6, 1.15)
+    sections, subjects = [], []
+    totals = {"time": 0, "marks": 0, "attempted": 0, "correct": 0}
+    for subject, (subject_id, _) in SUBJECTS.items():
+        chapters = _chapters(subject, chapters_per_subject)
+        sub = {"time": 0, "marks": 0, "attempted": 0, "correct": 0}
+        for kind, count in (("Single Correct", questions_per_section), ("Numerical", numerical_per_section)):
+            questions = []
+            for _ in range(count):
+                q, attempted, correct = _question(rng, subject, rng.choice(chapters), kind == "Numerical", skill,
+                                                  with_text)
+                questions.append(q)
+                sub["time"] += q["timeTaken"]
+                sub["attempted"] += attempted
+                sub["correct"] += correct
+                sub["marks"] += 4 if correct else (-1 if attempted else 0)
+            sections.append({"sectionId": {"sectionType": "normal", "title": f"{subject} {kind}",
+                                           "maximumAttemptLimit": count},
+                             "questions": questions})
+        subjects.append({"_id": _oid(rng), "subjectId": {"$oid": subject_id}, "totalTimeTaken": sub["time"],
+                         "totalMarkScored": sub["marks"], "totalAttempted": sub["attempted"],
+                         "totalCorrect": sub["correct"],
+                         "accuracy": sub["correct"] / sub["attempted"] * 100 if sub["attempted"] else 0})
+        for key in totals:
+            totals[key] += sub[key]
+    total_questions = len(SUBJECTS) * (questions_per_section + numerical_per_section)
+    return {
+        "_id": _oid(rng),
+        "test": {"syllabus": "<h1>Synthetic Test Syllabus</h1>", "totalTime": 180,
+                 "totalQuestions": total_questions, "totalMarks": total_questions * 4},
+        "subjects": subjects,
+        "totalTimeTaken": totals["time"],
+        "totalMarkScored": totals["marks"],
+        "totalAttempted": totals["attempted"],
+        "totalCorrect": totals["correct"],
+        "accuracy": totals["correct"] / totals["attempted"] * 100 if totals["attempted"] else 0,
+        "sections": sections,
+    }
+
+
+def iter_synthetic(students, seed=0, **options):
+    rng = random.Random(seed)
+    for _ in range(students):
+        yield make_submission(rng, **options)
+
+
+# Write sample_submission_analysis_<n>.json files (a one-element list each, like the real exports)
+def write_submissions(out_dir, students, seed=0, start=1, **options):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, data in enumerate(iter_synthetic(students, seed, **options), start):
+        path = os.path.join(out_dir, f"sample_submission_analysis_{i}.json")
+        with open(path, "w") as f:
+            json.dump([data], f, separators=(",", ":"))
+        paths.append(path)
+    return paths
+
+
+# Write one gzipped JSON Lines export for batch_runner.py --stream
+def write_export(path, students, seed=0, **options):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for data in iter_synthetic(students, seed, **options):
+            f.write(json.dumps(data, separators=(",", ":")) + "\n")
+    return path
+
+
+def add_options(parser):
+    parser.add_argument("--questions", type=int, default=20, help="single-correct questions per subject")
+    parser.add_argument("--numerical", type=int, default=5, help="numerical questions per subject")
+    parser.add_argument("--chapters", type=int, default=2, help="chapters per subject")
+    parser.add_argument("--no-text", action="store_true", help="leave out question bodies")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def options_from(args):
+    return {"questions_per_section": args.questions, "numerical_per_section": args.numerical,
+            "chapters_per_subject": args.chapters, "with_text": not args.no_text}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic submissions in the sample data schema")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--out", default="synthetic_data", help="directory for per-student JSON files")
+    parser.add_argument("--export", help="write one .jsonl.gz export here instead of per-student files")
+    add_options(parser)
+    args = parser.parse_args()
+
+    if args.export:
+        write_export(args.export, args.students, args.seed, **options_from(args))
+        print(f"Wrote {args.students} submissions to {args.export}")
+    else:
+        write_submissions(args.out, args.students, args.seed, **options_from(args))
+        print(f"Wrote {args.students} submission files to {args.out}")
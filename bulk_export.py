@@ -0,0 +1,166 @@
+import glob
+import json
+import os
+import re
+import time
+import zipfile
+from collections import defaultdict
+
+import main
+import metrics
+from manifest import load_analysis, load_feedback, stage_outputs
+from report_engine import get_report_template
+
+# PDFs are already compressed, so archive entries are stored as-is by default
+ZIP_COMPRESSION = zipfile.ZIP_STORED
+
+
+# Student ids with generated feedback in an output directory, in a stable order
+def finished_students(output_dir):
+    ids = [os.path.basename(p)[len("feedback_"):-len(".txt")]
+           for p in glob.glob(os.path.join(output_dir, "feedback_*.txt"))]
+    return sorted(ids, key=lambda s: (len(s), s))
+
+
+# Student ids grouped by the test they sat, from the "Test ID" in overall_<id>.json (None for outputs
+# written before tests were recorded); unreadable students are left to iter_output_students to report
+def students_by_test(output_dir, student_ids=None):
+    groups = defaultdict(list)
+    for student_id in student_ids or finished_students(output_dir):
+        try:
+            with open(stage_outputs(student_id, output_dir)["analyze"][0]) as f:
+                test = json.load(f).get("Test ID")
+        except (OSError, ValueError):
+            test = None
+        groups[test].append(student_id)
+    return dict(groups)
+
+
+# `class.pdf` -> `class_<test>.pdf`, for one export file per test
+def test_path(path, test):
+    root, ext = os.path.splitext(path)
+    return f"{root}_{re.sub(r'[^A-Za-z0-9_.-]', '_', str(test or 'unknown'))}{ext}"
+
+
+# (student_id, feedback, analysis) for every requested student, re-read from a previous run's outputs.
+# Cohort ranks are recomputed from cohort_index.npz when the batch was run with --cohort.
+def iter_output_students(output_dir, student_ids=None):
+    from cohort import get_cohort_index
+    cohort = get_cohort_index(output_dir)
+    for student_id in student_ids or finished_students(output_dir):
+        try:
+            result = load_analysis(student_id, output_dir)
+            feedback = load_feedback(student_id, output_dir)
+        except (OSError, ValueError) as e:
+            print(f"⏭️ Skipping student {student_id}: {e}")
+            continue
+        if cohort is not None:
+            result["cohort_df"] = cohort.student_ranks(result["overall"], result["subject_df"], result["weak_df"])
+        yield student_id, feedback, result
+
+
+def _render(template, student_id, feedback, result, pdf=None):
+    return template.render(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"],
+                           result.get("cohort_df"), vector_chart=main.CHART_MODE == "vector", pdf=pdf,
+                           progress_df=result.get("progress_df"))
+
+
+# Every report in one document: fonts, the logo image and the page tree are written once
+def merged_pdf(students, path=None, title="Cohort Performance Reports"):
+    from fpdf import FPDF
+
+    template = get_report_template(main.BASE_PATH)
+    pdf = FPDF()
+    pdf.set_title(title)
+    pdf.set_author("MathonGo AI System")
+    count = 0
+    for student_id, feedback, result in students:
+        with metrics.stage("pdf_layout", student_id):
+            _render(template, student_id, feedback, result, pdf)
+        count += 1
+    with metrics.stage("pdf_write"):
+        data = pdf.output(path) if path else bytes(pdf.output())
+    if path:
+        metrics.record_bytes("pdf_write", written=os.path.getsize(path))
+        print(f"✅ Merged {count} reports into {path}")
+        return path
+    metrics.record_bytes("pdf_write", written=len(data))
+    return data
+
+
+# File-like sink for ZipFile that hands written bytes back to a generator instead of keeping them
+class _ChunkSink:
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return b"".join(chunks)
+
+
+# Yield a ZIP of per-student PDFs chunk by chunk. Each PDF is rendered in memory and written as one
+# entry, so nothing is staged on disk and memory holds a single report at a time.
+def zip_stream(students, compression=ZIP_COMPRESSION):
+    template = get_report_template(main.BASE_PATH)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+        for student_id, feedback, result in students:
+            with metrics.stage("pdf_layout", student_id):
+                pdf = _render(template, student_id, feedback, result)
+            with metrics.stage("pdf_write", student_id):
+                data = pdf.output()
+            metrics.record_bytes("pdf_write", written=len(data))
+            info = zipfile.ZipInfo(f"feedback_{student_id}.pdf", date_time=time.localtime()[:6])
+            info.compress_type = compression
+            archive.writestr(info, bytes(data))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def write_zip(students, path, compression=ZIP_COMPRESSION):
+    with open(path, "wb") as f:
+        for chunk in zip_stream(students, compression):
+            f.write(chunk)
+    print(f"✅ Wrote {path}")
+    return path
+
+
+# Merged PDF and/or ZIP for a finished batch; with `by_test`, one of each per test, named by test_path()
+def export(output_dir, student_ids=None, pdf=None, zip_path=None, by_test=False):
+    groups = students_by_test(output_dir, student_ids) if by_test else {None: student_ids}
+    for test, ids in groups.items():
+        if pdf:
+            merged_pdf(iter_output_students(output_dir, ids), test_path(pdf, test) if by_test else pdf,
+                       title=f"Test {test} Performance Reports" if by_test else "Cohort Performance Reports")
+        if zip_path:
+            write_zip(iter_output_students(output_dir, ids), test_path(zip_path, test) if by_test else zip_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a finished batch as one merged PDF and/or a ZIP of PDFs")
+    parser.add_argument("--base-path", default=main.BASE_PATH, help="directory holding output/ and the logo")
+    parser.add_argument("--output-dir", help="batch output directory (default: <base-path>/output)")
+    parser.add_argument("--students", help="comma-separated student ids (default: every student with feedback)")
+    parser.add_argument("--pdf", help="write one merged PDF here")
+    parser.add_argument("--zip", help="write a ZIP of per-student PDFs here")
+    parser.add_argument("--by-test", action="store_true", help="one PDF/ZIP per test, e.g. class_<test>.pdf")
+    args = parser.parse_args()
+    if not args.pdf and not args.zip:
+        parser.error("pass --pdf and/or --zip")
+
+    main.configure_paths(args.base_path, output_dir=args.output_dir)
+    export(main.OUTPUT_DIR, args.students.split(",") if args.students else None, args.pdf, args.zip, args.by_test)
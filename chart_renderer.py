@@ -0,0 +1,123 @@
+import threading
+
+import numpy as np
+
+# Same colours seaborn's scatterplot picks for the three subjects (matplotlib tab10)
+SUBJECT_COLORS = {
+    "Physics": "#1f77b4",
+    "Chemistry": "#ff7f0e",
+    "Maths": "#2ca02c",
+}
+EXTRA_COLORS = ["#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f"]
+X_COL = "Time Taken (min)"
+Y_COL = "Accuracy (%)"
+
+
+def _color(subject, index):
+    return SUBJECT_COLORS.get(subject) or EXTRA_COLORS[index % len(EXTRA_COLORS)]
+
+
+def _limits(values):
+    lo, hi = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+    pad = (hi - lo) * 0.05 or max(abs(hi) * 0.05, 1.0)
+    return lo - pad, hi + pad
+
+
+# Keeps one Agg figure and its scatter artists alive; each render only swaps data and title.
+# matplotlib is imported here, so vector-chart runs never load it.
+class ChartRenderer:
+    def __init__(self, subjects=tuple(SUBJECT_COLORS)):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlabel(X_COL)
+        self.ax.set_ylabel(Y_COL)
+        self.ax.grid(True)
+        self.title = self.ax.set_title("")
+        self.artists = {}
+        self.legend_subjects = None
+        for subject in subjects:
+            self._add_artist(subject)
+        self.lock = threading.Lock()
+
+    def _add_artist(self, subject):
+        self.artists[subject] = self.ax.scatter([], [], s=100, color=_color(subject, len(self.artists)),
+                                                label=subject, edgecolors="white")
+
+    def render(self, df_subject, student_id, chart_path):
+        with self.lock:
+            for subject in df_subject["Subject"]:
+                if subject not in self.artists:
+                    self._add_artist(subject)
+            present = set(df_subject["Subject"])
+            for subject, artist in self.artists.items():
+                rows = df_subject[df_subject["Subject"] == subject]
+                artist.set_offsets(np.column_stack([rows[X_COL].to_numpy(float), rows[Y_COL].to_numpy(float)])
+                                   if len(rows) else np.empty((0, 2)))
+                artist.set_visible(subject in present)
+            self.ax.set_xlim(*_limits(df_subject[X_COL].to_numpy(float)))
+            self.ax.set_ylim(*_limits(df_subject[Y_COL].to_numpy(float)))
+            shown = tuple(s for s in self.artists if s in present)
+            if shown != self.legend_subjects:
+                self.ax.legend(handles=[self.artists[s] for s in shown], title="Subject")
+                self.legend_subjects = shown
+            self.title.set_text(f"Time vs Accuracy for Student {student_id}")
+            self.fig.savefig(chart_path)
+        return chart_path
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+# One renderer per process
+def get_chart_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
+
+
+# Draw the same chart straight into an FPDF page as vector graphics (no PNG round-trip)
+def draw_chart_vector(pdf, df_subject, x, y, w, h, ticks=5):
+    xs = df_subject[X_COL].to_numpy(float)
+    ys = df_subject[Y_COL].to_numpy(float)
+    x_lo, x_hi = _limits(xs)
+    y_lo, y_hi = _limits(ys)
+    plot_x, plot_y, plot_w, plot_h = x + 12, y + 2, w - 14, h - 12
+
+    def px(v):
+        return plot_x + (v - x_lo) / (x_hi - x_lo) * plot_w
+
+    def py(v):
+        return plot_y + plot_h - (v - y_lo) / (y_hi - y_lo) * plot_h
+
+    pdf.set_line_width(0.1)
+    pdf.set_font("Helvetica", size=7)
+    pdf.set_text_color(60, 60, 60)
+    for i in range(ticks + 1):
+        gx = x_lo + (x_hi - x_lo) * i / ticks
+        gy = y_lo + (y_hi - y_lo) * i / ticks
+        pdf.set_draw_color(220, 220, 220)
+        pdf.line(px(gx), plot_y, px(gx), plot_y + plot_h)
+        pdf.line(plot_x, py(gy), plot_x + plot_w, py(gy))
+        pdf.text(px(gx) - 3, plot_y + plot_h + 4, f"{gx:.1f}")
+        pdf.text(x, py(gy) + 1, f"{gy:.1f}")
+    pdf.set_draw_color(0, 0, 0)
+    pdf.rect(plot_x, plot_y, plot_w, plot_h)
+    pdf.set_font("Helvetica", size=8)
+    pdf.text(plot_x + plot_w / 2 - 12, y + h - 1, X_COL)
+
+    # Points and legend
+    radius = 1.6
+    for i, (subject, px_v, py_v) in enumerate(zip(df_subject["Subject"], xs, ys)):
+        color = _color(subject, i).lstrip("#")
+        pdf.set_fill_color(*(int(color[j:j + 2], 16) for j in (0, 2, 4)))
+        pdf.ellipse(px(px_v) - radius, py(py_v) - radius, 2 * radius, 2 * radius, style="F")
+        pdf.ellipse(plot_x + plot_w - 28, plot_y + 3 + i * 5 - radius, 2 * radius, 2 * radius, style="F")
+        pdf.text(plot_x + plot_w - 24, plot_y + 4 + i * 5, str(subject))
+    pdf.set_text_color(0, 0, 0)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from columnar import ChapterColumns, Vocabulary
+from main import SUBJECT_MAP, test_key
+
+SUMMARY_PERCENTILES = [25, 50, 75, 90]
+MAX_CHAPTER_RANKS = 5
+INDEX_FILE = "cohort_index.npz"
+SUMMARY_FILE = "cohort_summary.csv"
+RANK_COLUMNS = ["Area", "Your Accuracy (%)", "Cohort Median (%)", "Percentile"]
+
+
+# Sorted per-metric distributions for every test in a batch; percentile lookups are a binary search.
+# Students are only ever compared with students who sat the same test.
+class CohortIndex:
+    def __init__(self, distributions):
+        # (test, dimension, label, metric) -> sorted float32 array of one value per student of that test
+        self.distributions = distributions
+        self.tests = sorted({key[0] for key in distributions}, key=str)
+
+    # The test a student's overall metrics belong to. Outputs or indexes written before tests were
+    # recorded have no test id; they are matched with the index's only test.
+    def test_of(self, overall):
+        test = overall.get("Test ID")
+        if (test is None or self.tests == [None]) and len(self.tests) == 1:
+            return self.tests[0]
+        return test
+
+    def percentile_rank(self, test, dimension, label, metric, value):
+        values = self.distributions.get((test, dimension, label, metric))
+        if values is None or not len(values):
+            return None
+        value = values.dtype.type(value)  # compare at the stored precision
+        lo = np.searchsorted(values, value, side="left")
+        hi = np.searchsorted(values, value, side="right")
+        return round((lo + hi) / 2 / len(values) * 100, 1)
+
+    def median(self, test, dimension, label, metric):
+        values = self.distributions.get((test, dimension, label, metric))
+        return None if values is None or not len(values) else round(float(np.median(values)), 2)
+
+    def summary(self):
+        rows = []
+        for (test, dimension, label, metric), values in sorted(self.distributions.items(),
+                                                               key=lambda item: tuple(map(str, item[0]))):
+            row = {"Test": test, "Dimension": dimension, "Label": label, "Metric": metric, "Students": len(values),
+                   "Mean": round(float(values.mean()), 2)}
+            for p, v in zip(SUMMARY_PERCENTILES, np.percentile(values, SUMMARY_PERCENTILES)):
+                row[f"P{p}"] = round(float(v), 2)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    # Percentile table for one student against their own test, ready for build_prompt and text_to_pdf;
+    # empty when nobody else in the index sat that test
+    def student_ranks(self, overall, subject_df, weak_df):
+        test = self.test_of(overall)
+        if test not in self.tests:
+            return pd.DataFrame(columns=RANK_COLUMNS)
+        rows = [("Overall", "overall", "All", "Accuracy (%)", overall["Accuracy (%)"])]
+        for _, sub in subject_df.iterrows():
+            rows.append((sub["Subject"], "subject", sub["Subject"], "Accuracy (%)", sub["Accuracy (%)"]))
+        for _, chap in weak_df.head(MAX_CHAPTER_RANKS).iterrows():
+            rows.append((chap["Chapter"], "chapter", chap["Chapter"], "Accuracy (%)", chap["Accuracy (%)"]))
+        return pd.DataFrame([
+            {"Area": area, "Your Accuracy (%)": value,
+             "Cohort Median (%)": self.median(test, dimension, label, metric),
+             "Percentile": self.percentile_rank(test, dimension, label, metric, value)}
+            for area, dimension, label, metric, value in rows
+        ], columns=RANK_COLUMNS)
+
+    # Content hash of every distribution, used to invalidate feedback when the cohort changes
+    def fingerprint(self):
+        h = hashlib.sha256()
+        for key in sorted(self.distributions):
+            h.update(json.dumps(key).encode("utf-8"))
+            h.update(self.distributions[key].tobytes())
+        return h.hexdigest()
+
+    def save(self, path):
+        keys = sorted(self.distributions)
+        lengths = [len(self.distributions[k]) for k in keys]
+        np.savez_compressed(
+            path,
+            keys=np.array(json.dumps(keys)),
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            values=np.concatenate([self.distributions[k] for k in keys]) if keys else np.zeros(0, np.float32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            # Indexes saved before distributions were split by test have (dimension, label, metric) keys
+            keys = [tuple(k) if len(k) == 4 else (None, *k) for k in json.loads(str(f["keys"]))]
+            offsets, values = f["offsets"], f["values"]
+        return cls({k: values[offsets[i]:offsets[i + 1]] for i, k in enumerate(keys)})
+
+
+# Sorted values of every (test, label) pair: one lexsort, then split at the pair boundaries
+def _split_sorted(test_codes, label_codes, n_labels, values):
+    keys = test_codes.astype(np.int64) * n_labels + label_codes
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order].astype(np.float32)
+    pairs, starts = np.unique(keys, return_index=True)
+    ends = np.append(starts[1:], len(keys))
+    return [(int(pair // n_labels), int(pair % n_labels), values[start:end])
+            for pair, start, end in zip(pairs, starts, ends)]
+
+
+# One pass over (student_id, submission) pairs collecting every distribution, per test
+def build_cohort_index(submissions):
+    cols = ChapterColumns()
+    tests = Vocabulary()
+    student_test = []
+    collected = defaultdict(list)
+    for student_id, data in submissions:
+        cols.add(student_id, data)
+        test = test_key(data)
+        student_test.append(tests.code(test))
+        collected[(test, "overall", "All", "Accuracy (%)")].append(round(data.get("accuracy", 0), 2))
+        collected[(test, "overall", "All", "Total Score")].append(data.get("totalMarkScored", 0))
+        for sub in data.get("subjects", []):
+            name = SUBJECT_MAP.get(sub["subjectId"]["$oid"], "Unknown")
+            collected[(test, "subject", name, "Accuracy (%)")].append(round(sub.get("accuracy", 0), 2))
+            collected[(test, "subject", name, "Time Taken (min)")].append(
+                round(sub.get("totalTimeTaken", 0) / 60, 2))
+
+    distributions = {k: np.sort(np.asarray(v, dtype=np.float32)) for k, v in collected.items()}
+    student_test = np.asarray(student_test, dtype=np.int32)
+
+    # Per-student chapter accuracy and time, one grouped reduction over the whole batch
+    n_chapters = max(len(cols.chapters), 1)
+    keys = cols.student.astype(np.int64) * n_chapters + cols.chapter
+    groups, inverse = np.unique(keys, return_inverse=True)
+    total = np.bincount(inverse, minlength=len(groups))
+    accuracy = np.round(np.bincount(inverse, weights=cols.correct) / total * 100, 2)
+    avg_time = np.round(np.bincount(inverse, weights=cols.time) / total, 2)
+    group_test, group_chapter = student_test[groups // n_chapters], groups % n_chapters
+    for metric, values in (("Accuracy (%)", accuracy), ("Avg Time per Question (s)", avg_time)):
+        for test, chapter, sorted_values in _split_sorted(group_test, group_chapter, n_chapters, values):
+            distributions[(tests.values[test], "chapter", cols.chapters.values[chapter], metric)] = sorted_values
+
+    # Per-student accuracy by difficulty level, counting each question once however many chapters it has
+    first = cols.first
+    n_levels = max(len(cols.difficulties), 1)
+    keys = cols.student[first].astype(np.int64) * n_levels + cols.difficulty[first]
+    groups, inverse = np.unique(keys, return_inverse=True)
+    accuracy = np.round(np.bincount(inverse, weights=cols.correct[first]) / np.bincount(inverse) * 100, 2)
+    for test, level, sorted_values in _split_sorted(student_test[groups // n_levels], groups % n_levels, n_levels,
+                                                    accuracy):
+        distributions[(tests.values[test], "difficulty", cols.difficulties.values[level], "Accuracy (%)")] = \
+            sorted_values
+    return CohortIndex(distributions)
+
+
+# Save an index and its summary table into a batch's output directory
+def save_cohort_index(index, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    index.save(os.path.join(output_dir, INDEX_FILE))
+    index.summary().to_csv(os.path.join(output_dir, SUMMARY_FILE), index=False)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# The index saved in an output directory, loaded once and again whenever the file changes; None if there is none
+def get_cohort_index(output_dir):
+    path = os.path.join(output_dir, INDEX_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _indexes[path] = (mtime, CohortIndex.load(path))
+        return cached[1]
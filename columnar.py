@@ -0,0 +1,151 @@
+import threading
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from submission_stream import question_correct
+
+# Interns repeated labels (chapters, topics, ...) into small integer codes
+class Vocabulary:
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=self.values)
+
+
+# Question-level columns for a whole batch of students
+class ChapterColumns:
+    def __init__(self):
+        self.student_ids = []
+        self.chapters = Vocabulary()
+        self.topics = Vocabulary()
+        self.concepts = Vocabulary()
+        self.difficulties = Vocabulary()
+        self.statuses = Vocabulary()
+        self._student = array("i")
+        self._chapter = array("i")
+        self._topic = array("i")
+        self._concept = array("i")
+        self._difficulty = array("i")
+        self._status = array("i")
+        self._time = array("q")
+        self._correct = array("b")
+        self._first = array("b")
+
+    def add(self, student_id, data):
+        student = len(self.student_ids)
+        self.student_ids.append(student_id)
+        for section in data.get("sections", []):
+            for q in section.get("questions", []):
+                qid = q.get("questionId", {})
+                topics, concepts = qid.get("topics"), qid.get("concepts")
+                topic = self.topics.code(topics[0]["title"] if topics else "Unknown")
+                concept = self.concepts.code(concepts[0]["title"] if concepts else "Unknown")
+                difficulty = self.difficulties.code(qid.get("level", "unknown"))
+                status = self.statuses.code(q.get("status", "unknown"))
+                time_taken = q.get("timeTaken", 0) or 0
+                correct = question_correct(q)
+                # Same rows as extract_chapter_stats: one per tagged chapter, the first flagged in `first`
+                for i, chapter in enumerate([c["title"] for c in qid.get("chapters", [])] or ["Unknown"]):
+                    self._first.append(i == 0)
+                    self._student.append(student)
+                    self._chapter.append(self.chapters.code(chapter))
+                    self._topic.append(topic)
+                    self._concept.append(concept)
+                    self._difficulty.append(difficulty)
+                    self._status.append(status)
+                    self._time.append(time_taken)
+                    self._correct.append(correct)
+
+    def __len__(self):
+        return len(self._student)
+
+    @property
+    def student(self):
+        return np.frombuffer(self._student, dtype=np.int32)
+
+    @property
+    def chapter(self):
+        return np.frombuffer(self._chapter, dtype=np.int32)
+
+    @property
+    def topic(self):
+        return np.frombuffer(self._topic, dtype=np.int32)
+
+    @property
+    def concept(self):
+        return np.frombuffer(self._concept, dtype=np.int32)
+
+    @property
+    def difficulty(self):
+        return np.frombuffer(self._difficulty, dtype=np.int32)
+
+    @property
+    def status(self):
+        return np.frombuffer(self._status, dtype=np.int32)
+
+    @property
+    def time(self):
+        return np.frombuffer(self._time, dtype=np.int64)
+
+    @property
+    def correct(self):
+        return np.frombuffer(self._correct, dtype=np.bool_)
+
+    # One True per question, for per-question (rather than per-chapter-row) statistics
+    @property
+    def first(self):
+        return np.frombuffer(self._first, dtype=np.bool_)
+
+
+# One vocabulary per label column shared by every per-student frame in a process. Labels are stored once
+# and each frame holds small integer codes against the same CategoricalDtype; the dtype is only rebuilt
+# when a student brings a label the vocabulary has not seen yet.
+class SharedCategories(Vocabulary):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self._dtype = None
+
+    # Re-code a frame-local vocabulary and its codes against the shared one
+    def translate(self, vocab, codes):
+        with self.lock:
+            mapping = np.array([self.code(value) for value in vocab.values], dtype=np.int32)
+            if self._dtype is None or len(self._dtype.categories) < len(self.values):
+                self._dtype = pd.CategoricalDtype(list(self.values))
+            dtype = self._dtype
+        return pd.Categorical.from_codes(mapping[codes], dtype=dtype)
+
+
+SHARED_CATEGORIES = {column: SharedCategories() for column in ("Chapter", "Topic", "Concept", "Difficulty", "Status")}
+
+
+# extract_chapter_stats rows for one student with categorical labels, bool Correct and int32 times
+def compact_chapter_frame(data):
+    cols = ChapterColumns()
+    cols.add(None, data)
+    shared = SHARED_CATEGORIES
+    return pd.DataFrame({
+        "Chapter": shared["Chapter"].translate(cols.chapters, cols.chapter),
+        "Topic": shared["Topic"].translate(cols.topics, cols.topic),
+        "Concept": shared["Concept"].translate(cols.concepts, cols.concept),
+        "Difficulty": shared["Difficulty"].translate(cols.difficulties, cols.difficulty),
+        "Correct": cols.correct,
+        "Time Taken (sec)": cols.time.astype(np.int32),
+        "Status": shared["Status"].translate(cols.statuses, cols.status),
+    })
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+# Content address for a completion: everything that changes the model's output
+def feedback_key(model, temperature, system_message, prompt):
+    payload = json.dumps([model, temperature, system_message, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Persistent SQLite cache of generated feedback with size- and age-based eviction
+class FeedbackCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, max_age_seconds=DEFAULT_MAX_AGE_DAYS * 86400):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            "key TEXT PRIMARY KEY, feedback TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS feedback_last_used ON feedback(last_used)")
+        self.conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT feedback, created FROM feedback WHERE key = ?", (key,)).fetchone()
+            if row and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                self.conn.execute("DELETE FROM feedback WHERE key = ?", (key,))
+                self.conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                metrics.count("feedback_cache_requests", result="miss")
+                return None
+            self.conn.execute("UPDATE feedback SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            metrics.count("feedback_cache_requests", result="hit")
+            return row[0]
+
+    def put(self, key, feedback):
+        now = time.time()
+        size = len(feedback.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO feedback (key, feedback, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, feedback, size, now, now),
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    # Drop expired entries, then least recently used ones until under max_bytes
+    def _evict(self, now):
+        if self.max_age_seconds:
+            cur = self.conn.execute("DELETE FROM feedback WHERE created < ?", (now - self.max_age_seconds,))
+            self.evictions += cur.rowcount
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM feedback").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM feedback ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM feedback WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM feedback").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": size}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# One cache per output directory and process; FEEDBACK_CACHE_MAX_MB / FEEDBACK_CACHE_MAX_AGE_DAYS tune eviction
+def get_feedback_cache(output_dir):
+    path = os.path.join(output_dir, "feedback_cache.sqlite")
+    with _caches_lock:
+        if path not in _caches:
+            os.makedirs(output_dir, exist_ok=True)
+            _caches[path] = FeedbackCache(
+                path,
+                max_bytes=int(float(os.getenv("FEEDBACK_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+                max_age_seconds=float(os.getenv("FEEDBACK_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS)) * 86400,
+            )
+        return _caches[path]
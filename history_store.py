@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Weight of the newest test in the running averages (0.5 = the last test counts as much as all earlier ones)
+HISTORY_ALPHA = float(os.getenv("HISTORY_ALPHA", "0.5"))
+# Set STUDENT_HISTORY=0 to treat every submission as the student's first test
+HISTORY_ENABLED = os.getenv("STUDENT_HISTORY", "1") != "0"
+MAX_CHAPTER_TRENDS = 5
+PROGRESS_COLUMNS = ["Area", "This Test (%)", "Last Test (%)", "Change (pts)", "Average (%)", "Tests"]
+
+
+def _num(value):
+    return None if value is None else round(float(value), 2)
+
+
+# Identifies one test attempt, so re-running a submission does not count it twice
+def submission_key(data):
+    oid = data.get("_id", {}).get("$oid")
+    if oid:
+        return oid
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+# (dimension, label) -> (accuracy %, time) for one analysed submission
+def submission_metrics(overall, subject_df, weak_df):
+    values = {("overall", "Overall"): (_num(overall["Accuracy (%)"]), _num(overall["Total Time (min)"]))}
+    for subject, acc, minutes in zip(subject_df["Subject"].tolist(), subject_df["Accuracy (%)"].tolist(),
+                                     subject_df["Time Taken (min)"].tolist()):
+        values[("subject", subject)] = (_num(acc), _num(minutes))
+    for chapter, acc, seconds in zip(weak_df["Chapter"].tolist(), weak_df["Accuracy (%)"].tolist(),
+                                     weak_df["Avg Time per Question (s)"].tolist()):
+        values[("chapter", chapter)] = (_num(acc), _num(seconds))
+    return values
+
+
+# Append-only log of every submission per student plus running aggregates per (student, dimension, label).
+# Recording a test reads and updates only that student's aggregate rows, never earlier submissions.
+class HistoryStore:
+    def __init__(self, path, alpha=HISTORY_ALPHA):
+        self.path = path
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            "student_id TEXT NOT NULL, submission_key TEXT NOT NULL, seq INTEGER NOT NULL, recorded REAL NOT NULL, "
+            "metrics TEXT NOT NULL, changes TEXT NOT NULL, PRIMARY KEY (student_id, submission_key))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS trends ("
+            "student_id TEXT NOT NULL, dimension TEXT NOT NULL, label TEXT NOT NULL, tests INTEGER NOT NULL, "
+            "last_accuracy REAL, previous_accuracy REAL, ewma_accuracy REAL, best_accuracy REAL, "
+            "last_time REAL, ewma_time REAL, updated REAL NOT NULL, PRIMARY KEY (student_id, dimension, label))"
+        )
+
+    # Fold one submission into the student's aggregates and return, per (dimension, label), what was known
+    # before it: {"previous": last accuracy, "average": EWMA, "time": last time, "tests": count}.
+    # Recording the same submission again changes nothing and returns the same snapshot.
+    def record(self, student_id, submission_key, values):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT changes FROM submissions WHERE student_id = ? AND submission_key = ?",
+                                        (student_id, submission_key)).fetchone()
+                if row is not None:
+                    self.conn.execute("COMMIT")
+                    return _decode(row[0])
+                known = {(dimension, label): rest for dimension, label, *rest in self.conn.execute(
+                    "SELECT dimension, label, tests, last_accuracy, ewma_accuracy, best_accuracy, last_time, ewma_time "
+                    "FROM trends WHERE student_id = ?", (student_id,))}
+                now = time.time()
+                changes, updates = {}, []
+                for (dimension, label), (accuracy, spent) in values.items():
+                    tests, last, ewma, best, last_time, ewma_time = known.get((dimension, label),
+                                                                             (0, None, None, None, None, None))
+                    if tests:
+                        changes[(dimension, label)] = {"previous": last, "average": _num(ewma), "time": last_time,
+                                                       "tests": tests}
+                    if best is None or (accuracy is not None and accuracy > best):
+                        best = accuracy
+                    updates.append((student_id, dimension, label, tests + 1, accuracy, last,
+                                    self._ewma(ewma, accuracy), best, spent, self._ewma(ewma_time, spent), now))
+                self.conn.executemany("INSERT OR REPLACE INTO trends VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", updates)
+                seq = known.get(("overall", "Overall"), (0,))[0] + 1
+                self.conn.execute("INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?)",
+                                  (student_id, submission_key, seq, now, _encode(values), _encode(changes)))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return changes
+
+    def _ewma(self, average, value):
+        if value is None:
+            return average
+        return value if average is None else self.alpha * value + (1 - self.alpha) * average
+
+    # Current aggregates for a student: {(dimension, label): {...}}
+    def trends(self, student_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT dimension, label, tests, last_accuracy, previous_accuracy, ewma_accuracy, best_accuracy, "
+                "last_time, ewma_time FROM trends WHERE student_id = ?", (student_id,)).fetchall()
+        return {(dimension, label): {"tests": tests, "last": last, "previous": previous, "average": _num(ewma),
+                                     "best": best, "time": last_time, "average_time": _num(ewma_time)}
+                for dimension, label, tests, last, previous, ewma, best, last_time, ewma_time in rows}
+
+    def tests(self, student_id):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM submissions WHERE student_id = ?",
+                                     (student_id,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _encode(mapping):
+    return json.dumps([[list(key), value] for key, value in mapping.items()])
+
+
+def _decode(text):
+    return {tuple(key): value for key, value in json.loads(text)}
+
+
+# "Progress since the last test" table for build_prompt and text_to_pdf; empty for a first test
+def progress_frame(changes, values, max_chapters=MAX_CHAPTER_TRENDS):
+    import pandas as pd
+    rows = []
+    chapters = 0
+    for (dimension, label), (accuracy, _) in values.items():
+        before = changes.get((dimension, label))
+        if before is None or before["previous"] is None or accuracy is None:
+            continue
+        if dimension == "chapter":
+            chapters += 1
+            if chapters > max_chapters:
+                continue
+        rows.append({"Area": label, "This Test (%)": accuracy, "Last Test (%)": before["previous"],
+                     "Change (pts)": round(accuracy - before["previous"], 2), "Average (%)": before["average"],
+                     "Tests": before["tests"]})
+    return pd.DataFrame(rows, columns=PROGRESS_COLUMNS)
+
+
+# One line per row, e.g. "Physics: 55% (up from 42% last test, average 47%)"
+def progress_lines(progress_df):
+    lines = []
+    for area, now, last, change, average in zip(progress_df["Area"], progress_df["This Test (%)"],
+                                                progress_df["Last Test (%)"], progress_df["Change (pts)"],
+                                                progress_df["Average (%)"]):
+        if change:
+            since = f"{'up' if change > 0 else 'down'} from {last:g}% last test"
+        else:
+            since = "same as last test"
+        lines.append(f"{area}: {now:g}% ({since}, average {average:g}%)")
+    return lines
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+# One store per output directory and process
+def get_history_store(output_dir):
+    path = os.path.join(output_dir, "history.sqlite")
+    with _stores_lock:
+        if path not in _stores:
+            os.makedirs(output_dir, exist_ok=True)
+            _stores[path] = HistoryStore(path)
+        return _stores[path]
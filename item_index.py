@@ -0,0 +1,280 @@
+import bisect
+import json
+import os
+import threading
+
+import numpy as np
+
+from submission_stream import question_correct, question_fingerprint
+
+# Upper edges (seconds) of the time-taken histogram; the last bin is open-ended
+TIME_BINS = (15, 30, 60, 90, 120, 180, 240)
+OPTION_ID_BYTES = 24
+NUMERIC_PREFIX = "="  # numeric answers are counted as options named "=<value>"
+INDEX_VERSION = 1
+
+
+def _attempt(q):
+    marked = q.get("markedOptions") or []
+    value = (q.get("inputValue") or {}).get("value")
+    attempted = bool(marked) or value is not None
+    correct = question_correct(q)
+    choices = [(opt.get("optionId") or "?", bool(opt.get("isCorrect", False))) for opt in marked]
+    if value is not None:
+        choices.append((f"{NUMERIC_PREFIX}{value}"[:OPTION_ID_BYTES], correct))
+    return attempted, correct, choices
+
+
+# Accumulates per-question counts across submissions; save() writes them as an ItemIndex
+class ItemIndexBuilder:
+    def __init__(self, index=None):
+        self.rows = {}
+        self.chapters = []
+        self._chapter_codes = {}
+        self.chapter = []
+        self.seen = []
+        self.attempted = []
+        self.correct = []
+        self.time_sum = []
+        self.time_left_sum = []
+        self.time_hist = []
+        self.options = []  # per question: {option_id: [count, is_correct]}
+        self.students = 0
+        if index is not None:
+            self._extend(index)
+
+    def _row(self, fingerprint, chapter):
+        row = self.rows.get(fingerprint)
+        if row is None:
+            row = self.rows[fingerprint] = len(self.seen)
+            code = self._chapter_codes.get(chapter)
+            if code is None:
+                code = self._chapter_codes[chapter] = len(self.chapters)
+                self.chapters.append(chapter)
+            self.chapter.append(code)
+            for column in (self.seen, self.attempted, self.correct, self.time_sum, self.time_left_sum):
+                column.append(0)
+            self.time_hist.append([0] * (len(TIME_BINS) + 1))
+            self.options.append({})
+        return row
+
+    def add(self, data):
+        self.students += 1
+        for section in data.get("sections", []):
+            for q in section.get("questions", []):
+                qid = q.get("questionId", {})
+                chapters = qid.get("chapters")
+                row = self._row(question_fingerprint(qid), chapters[0]["title"] if chapters else "Unknown")
+                self.seen[row] += 1
+                attempted, correct, choices = _attempt(q)
+                if not attempted:
+                    continue
+                time_taken = q.get("timeTaken", 0) or 0
+                self.attempted[row] += 1
+                self.correct[row] += correct
+                self.time_sum[row] += time_taken
+                self.time_left_sum[row] += q.get("timeLeftWhenAttempted", 0) or 0
+                self.time_hist[row][bisect.bisect_right(TIME_BINS, time_taken)] += 1
+                options = self.options[row]
+                for option_id, is_correct in choices:
+                    entry = options.setdefault(option_id, [0, is_correct])
+                    entry[0] += 1
+
+    def update(self, submissions):
+        for data in submissions:
+            self.add(data)
+        return self
+
+    # Continue accumulating on top of a saved index
+    def _extend(self, index):
+        self.students = index.students
+        for i, fingerprint in enumerate(index.fingerprints.tolist()):
+            row = self._row(fingerprint, index.chapters[index.chapter[i]])
+            self.seen[row] = int(index.counts[i, 0])
+            self.attempted[row] = int(index.counts[i, 1])
+            self.correct[row] = int(index.counts[i, 2])
+            self.time_sum[row] = int(index.counts[i, 3])
+            self.time_left_sum[row] = int(index.counts[i, 4])
+            self.time_hist[row] = index.time_hist[i].astype(int).tolist()
+            lo, hi = index.option_offsets[i], index.option_offsets[i + 1]
+            self.options[row] = {
+                option_id.decode("utf-8"): [int(count), bool(correct)]
+                for option_id, count, correct in zip(index.option_ids[lo:hi], index.option_counts[lo:hi],
+                                                     index.option_correct[lo:hi])
+            }
+
+    # One .npy file per column (rows sorted by fingerprint, options in CSR layout) plus meta.json
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        fingerprints = np.fromiter(self.rows, dtype=np.uint64, count=len(self.rows))
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+        order = rows[np.argsort(fingerprints, kind="stable")]
+        counts = np.column_stack([np.asarray(c, dtype=np.int64) for c in
+                                  (self.seen, self.attempted, self.correct, self.time_sum, self.time_left_sum)])
+        options = [sorted(self.options[row].items(), key=lambda item: -item[1][0]) for row in order]
+        lengths = [len(o) for o in options]
+        columns = {
+            "fingerprints": np.sort(fingerprints),
+            "chapter": np.asarray(self.chapter, dtype=np.int32)[order],
+            "counts": counts[order] if len(order) else np.zeros((0, 5), np.int64),
+            "time_hist": np.asarray(self.time_hist, dtype=np.uint32).reshape(-1, len(TIME_BINS) + 1)[order],
+            "option_offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            "option_ids": np.array([o for opts in options for o, _ in opts], dtype=f"S{OPTION_ID_BYTES}"),
+            "option_counts": np.array([e[0] for opts in options for _, e in opts], dtype=np.uint32),
+            "option_correct": np.array([e[1] for opts in options for _, e in opts], dtype=np.bool_),
+        }
+        for name, values in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"version": INDEX_VERSION, "students": self.students, "questions": len(order),
+                       "time_bins": TIME_BINS, "chapters": self.chapters}, f)
+        return path
+
+
+# Read-only, memory-mapped item statistics; lookups are a binary search over sorted fingerprints
+class ItemIndex:
+    COLUMNS = ("fingerprints", "chapter", "counts", "time_hist", "option_offsets", "option_ids", "option_counts",
+               "option_correct")
+
+    def __init__(self, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported item index version {meta.get('version')} in {path}")
+        self.path = path
+        self.students = meta["students"]
+        self.chapters = meta["chapters"]
+        self.time_bins = tuple(meta["time_bins"])
+        for name in self.COLUMNS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    # Row of every fingerprint, -1 where the question isn't indexed
+    def rows(self, fingerprints):
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        pos = np.searchsorted(self.fingerprints, fingerprints)
+        pos = np.minimum(pos, max(len(self) - 1, 0))
+        found = (self.fingerprints[pos] == fingerprints) if len(self) else np.zeros(len(fingerprints), bool)
+        return np.where(found, pos, -1)
+
+    # Attempt rate, accuracy and mean times (%, %, s, s) for many rows at once
+    def rates(self, rows):
+        counts = np.asarray(self.counts[rows], dtype=np.float64)
+        seen, attempted = counts[:, 0], np.maximum(counts[:, 1], 1)
+        return {
+            "attempt_rate": np.round(counts[:, 1] / np.maximum(seen, 1) * 100, 2),
+            "accuracy": np.round(counts[:, 2] / attempted * 100, 2),
+            "mean_time": np.round(counts[:, 3] / attempted, 1),
+            "mean_time_left": np.round(counts[:, 4] / attempted, 1),
+        }
+
+    def options(self, row):
+        lo, hi = self.option_offsets[row], self.option_offsets[row + 1]
+        return [(option_id.decode("utf-8"), int(count), bool(correct)) for option_id, count, correct in
+                zip(self.option_ids[lo:hi], self.option_counts[lo:hi], self.option_correct[lo:hi])]
+
+    # Everything known about one question, or None when it isn't indexed
+    def question(self, fingerprint):
+        row = int(self.rows([fingerprint])[0])
+        if row < 0:
+            return None
+        rates = {key: float(values[0]) for key, values in self.rates([row]).items()}
+        seen, attempted = (int(v) for v in self.counts[row, :2])
+        options = self.options(row)
+        labels = [f"<{b}s" for b in self.time_bins] + [f">={self.time_bins[-1]}s"]
+        return {
+            "fingerprint": int(fingerprint),
+            "chapter": self.chapters[self.chapter[row]],
+            "seen": seen,
+            "attempted": attempted,
+            **rates,
+            "time_distribution": dict(zip(labels, self.time_hist[row].tolist())),
+            "options": options,
+            "top_distractor": next(((o, c) for o, c, correct in options if not correct), None),
+        }
+
+    # Per-question table, hardest first
+    def frame(self, min_attempts=1):
+        import pandas as pd
+        rows = np.flatnonzero(np.asarray(self.counts[:, 1]) >= min_attempts)
+        rates = self.rates(rows)
+        df = pd.DataFrame({
+            "Fingerprint": [f"{int(fp):016x}" for fp in self.fingerprints[rows]],
+            "Chapter": np.array(self.chapters, dtype=object)[self.chapter[rows]] if len(rows) else [],
+            "Seen": self.counts[rows, 0],
+            "Attempted": self.counts[rows, 1],
+            "Attempt Rate (%)": rates["attempt_rate"],
+            "Accuracy (%)": rates["accuracy"],
+            "Avg Time (s)": rates["mean_time"],
+        })
+        return df.sort_values(["Accuracy (%)", "Attempted"], ascending=[True, False], ignore_index=True)
+
+    # The student's wrong answers on questions most of the cohort also gets wrong (accuracy below
+    # `max_accuracy`), e.g. for a "students typically get this wrong" line in the feedback
+    def commonly_missed(self, data, max_accuracy=40.0, min_attempts=5):
+        missed = []
+        for section in data.get("sections", []):
+            for q in section.get("questions", []):
+                attempted, correct, _ = _attempt(q)
+                if attempted and not correct:
+                    missed.append(question_fingerprint(q.get("questionId", {})))
+        if not missed or not len(self):
+            return []
+        rows = self.rows(missed)
+        rows = rows[rows >= 0]
+        rows = rows[np.asarray(self.counts[rows, 1]) >= min_attempts]
+        accuracy = self.rates(rows)["accuracy"]
+        keep = accuracy < max_accuracy
+        return [(self.chapters[self.chapter[row]], float(acc)) for row, acc in zip(rows[keep], accuracy[keep])]
+
+
+# Commonly missed questions per chapter, hardest for the cohort first, for the feedback prompt
+def missed_frame(missed):
+    import pandas as pd
+    df = pd.DataFrame(missed, columns=["Chapter", "Cohort Accuracy (%)"])
+    df = df.groupby("Chapter", sort=False).agg(**{"Questions Missed": ("Cohort Accuracy (%)", "size"),
+                                                  "Cohort Accuracy (%)": ("Cohort Accuracy (%)", "mean")})
+    df["Cohort Accuracy (%)"] = df["Cohort Accuracy (%)"].round(2)
+    return df.reset_index().sort_values("Cohort Accuracy (%)", ignore_index=True)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# One memory-mapped index per directory and process
+def get_item_index(path):
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = ItemIndex(path)
+        return _indexes[path]
+
+
+def build_item_index(submissions, path, base=None):
+    # The base is read fully into memory, so `path` may be the same directory
+    builder = ItemIndexBuilder(ItemIndex(base, mmap_mode=None) if base else None)
+    builder.update(submissions)
+    builder.save(path)
+    return ItemIndex(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    from submission_stream import iter_submissions
+
+    parser = argparse.ArgumentParser(description="Build or extend the question-level item index")
+    parser.add_argument("inputs", nargs="+", help="submission files or exports (globs allowed)")
+    parser.add_argument("--out", default="item_index", help="index directory")
+    parser.add_argument("--extend", action="store_true", help="add to the index already in --out")
+    parser.add_argument("--top", type=int, default=10, help="hardest questions to print")
+    args = parser.parse_args()
+
+    files = sorted(p for pattern in args.inputs for p in glob.glob(pattern))
+    submissions = (data for path in files for data in iter_submissions(path, keep_question=True))
+    index = build_item_index(submissions, args.out, args.out if args.extend else None)
+    print(f"✅ Indexed {len(index)} questions from {index.students} submissions into {args.out}")
+    print(index.frame().head(args.top).to_string(index=False))
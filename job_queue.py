@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+FINISHED = ("done", "failed")
+# A running job whose `updated` time is older than this has lost its worker. Workers refresh `updated`
+# for the jobs they hold every third of this, so long LLM calls never look stale.
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+
+
+# Persistent FIFO of report jobs in SQLite; safe to share between threads and processes
+class JobQueue:
+    def __init__(self, path):
+        self.path = path
+        self._execute("PRAGMA journal_mode=WAL")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, student_id TEXT NOT NULL, file_path TEXT NOT NULL, "
+            "status TEXT NOT NULL, stage TEXT, message TEXT, result TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+
+    # Short-lived autocommit connections keep the queue usable from any thread
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def enqueue(self, student_id, file_path):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, student_id, file_path, status, stage, created, updated) "
+            "VALUES (?, ?, ?, 'queued', 'queued', ?, ?)",
+            (job_id, student_id, file_path, now, now),
+        )
+        return job_id
+
+    # Atomically take the oldest queued job, or None
+    def claim(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', stage = 'started', updated = ? WHERE id = ?",
+                         (time.time(), row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row[0])
+
+    def update(self, job_id, status=None, stage=None, message=None, result=None):
+        fields = {"status": status, "stage": stage, "message": message,
+                  "result": json.dumps(result) if result is not None else None}
+        fields = {k: v for k, v in fields.items() if v is not None}
+        fields["updated"] = time.time()
+        self._execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                      (*fields.values(), job_id))
+
+    def get(self, job_id):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # Mark running jobs as still owned, so requeue_stale() leaves them alone
+    def heartbeat(self, job_ids):
+        if job_ids:
+            self._execute(f"UPDATE jobs SET updated = ? WHERE status = 'running' AND id IN "
+                          f"({', '.join('?' * len(job_ids))})", (time.time(), *job_ids))
+
+    # Put jobs left 'running' by a crashed worker back in the queue. Jobs other processes are still
+    # working on keep a fresh `updated` through heartbeat() and are not touched.
+    def requeue_stale(self, stale_after=JOB_STALE_SECONDS):
+        now = time.time()
+        conn = self._connect()
+        try:
+            return conn.execute("UPDATE jobs SET status = 'queued', stage = 'queued', updated = ? "
+                                "WHERE status = 'running' AND updated < ?", (now, now - stale_after)).rowcount
+        finally:
+            conn.close()
+
+
+# Background threads draining a JobQueue; `handler(job, progress)` returns the job result dict
+class WorkerPool:
+    def __init__(self, queue, handler, workers=2, poll_interval=0.5, stale_after=JOB_STALE_SECONDS):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.running = set()
+        self.running_lock = threading.Lock()
+
+    def start(self):
+        if self.threads:
+            return
+        self._requeue_stale()
+        targets = [(self._run, f"report-worker-{i}") for i in range(self.workers)]
+        for target, name in targets + [(self._heartbeat, "report-heartbeat")]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _requeue_stale(self):
+        requeued = self.queue.requeue_stale(self.stale_after)
+        if requeued:
+            print(f"🔁 Requeued {requeued} job(s) whose worker stopped responding")
+
+    # Keep this pool's jobs fresh and pick up jobs abandoned by workers in other processes
+    def _heartbeat(self):
+        while not self.stop_event.wait(self.stale_after / 3):
+            with self.running_lock:
+                job_ids = list(self.running)
+            try:
+                self.queue.heartbeat(job_ids)
+                self._requeue_stale()
+            except sqlite3.Error as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.stop_event.wait(self.poll_interval)
+                continue
+            job_id = job["id"]
+            with self.running_lock:
+                self.running.add(job_id)
+            try:
+                result = self.handler(job, lambda stage: self.queue.update(job_id, stage=stage))
+                self.queue.update(job_id, status="done", stage="done", result=result)
+            except Exception as e:
+                print(f"❌ Job {job_id} for student {job['student_id']} failed: {e}")
+                self.queue.update(job_id, status="failed", stage="failed", message=str(e))
+            finally:
+                with self.running_lock:
+                    self.running.discard(job_id)
@@ -0,0 +1,197 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from columnar import Vocabulary
+from submission_stream import question_correct
+
+LEVELS = ("chapter", "topic", "concept")
+ALL_DIFFICULTIES = "All"
+BREAKDOWN_COLUMNS = ["Student ID", "Level", "Chapter", "Topic", "Concept", "Difficulty", "Questions", "Attempted",
+                     "Correct", "Total Time (sec)", "Accuracy (%)", "Avg Time per Question (s)"]
+
+
+def _titles(qid, key):
+    return list(dict.fromkeys(item["title"] for item in qid.get(key, []))) or ["Unknown"]
+
+
+# Questions of a whole batch plus their chapter -> topic -> concept tags as a sparse incidence matrix.
+# A question is linked to every node it is tagged with: each chapter, each (chapter, topic) and each
+# (chapter, topic, concept) combination of its labels.
+class LabelColumns:
+    def __init__(self):
+        self.student_ids = []
+        self.nodes = Vocabulary()  # (chapter,), (chapter, topic) or (chapter, topic, concept)
+        self.difficulties = Vocabulary()
+        self._student = array("i")
+        self._difficulty = array("i")
+        self._attempted = array("b")
+        self._correct = array("b")
+        self._time = array("q")
+        self._link_question = array("i")
+        self._link_node = array("i")
+
+    def add(self, student_id, data):
+        student = len(self.student_ids)
+        self.student_ids.append(student_id)
+        for section in data.get("sections", []):
+            for q in section.get("questions", []):
+                qid = q.get("questionId", {})
+                row = len(self._student)
+                self._student.append(student)
+                self._difficulty.append(self.difficulties.code(qid.get("level", "unknown")))
+                self._attempted.append(bool(q.get("markedOptions")) or
+                                       (q.get("inputValue") or {}).get("value") is not None)
+                self._correct.append(question_correct(q))
+                self._time.append(q.get("timeTaken", 0) or 0)
+                topics, concepts = _titles(qid, "topics"), _titles(qid, "concepts")
+                for chapter in _titles(qid, "chapters"):
+                    self._link(row, (chapter,))
+                    for topic in topics:
+                        self._link(row, (chapter, topic))
+                        for concept in concepts:
+                            self._link(row, (chapter, topic, concept))
+
+    def _link(self, row, node):
+        self._link_question.append(row)
+        self._link_node.append(self.nodes.code(node))
+
+    def __len__(self):
+        return len(self._student)
+
+    @property
+    def student(self):
+        return np.frombuffer(self._student, dtype=np.int32)
+
+    @property
+    def difficulty(self):
+        return np.frombuffer(self._difficulty, dtype=np.int32)
+
+    @property
+    def attempted(self):
+        return np.frombuffer(self._attempted, dtype=np.int8)
+
+    @property
+    def correct(self):
+        return np.frombuffer(self._correct, dtype=np.int8)
+
+    @property
+    def time(self):
+        return np.frombuffer(self._time, dtype=np.int64)
+
+    # questions x nodes, 1 where the question is tagged with the node
+    def incidence(self):
+        links = np.frombuffer(self._link_question, dtype=np.int32)
+        return sparse.csr_matrix((np.ones(len(links), dtype=np.int64),
+                                  (links, np.frombuffer(self._link_node, dtype=np.int32))),
+                                 shape=(len(self), len(self.nodes)))
+
+    # groups x questions, 1 where the question belongs to the group
+    def grouping(self, by_student=True, by_difficulty=True):
+        student = self.student.astype(np.int64)
+        difficulty = self.difficulty.astype(np.int64)
+        n_levels = max(len(self.difficulties), 1) if by_difficulty else 1
+        groups = (student if by_student else np.zeros(len(self), np.int64)) * n_levels
+        if by_difficulty:
+            groups = groups + difficulty
+        n_groups = (len(self.student_ids) if by_student else 1) * n_levels
+        return sparse.csr_matrix((np.ones(len(self), dtype=np.int64), (groups, np.arange(len(self)))),
+                                 shape=(n_groups, len(self))), n_levels
+
+
+def extract_label_columns(submissions):
+    cols = LabelColumns()
+    for student_id, data in submissions:
+        cols.add(student_id, data)
+    return cols
+
+
+# Values of `matrix` at the stored positions of `pattern` (both canonical CSR, matrix's non-zeros a subset)
+def _values_at(pattern, matrix):
+    n_cols = pattern.shape[1]
+    pattern_keys = np.repeat(np.arange(pattern.shape[0], dtype=np.int64), np.diff(pattern.indptr)) * n_cols \
+        + pattern.indices
+    matrix_keys = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr)) * n_cols \
+        + matrix.indices
+    values = np.zeros(len(pattern_keys), dtype=matrix.dtype)
+    values[np.searchsorted(pattern_keys, matrix_keys)] = matrix.data
+    return values
+
+
+# Chapter -> topic -> concept statistics for every group, as a few sparse products:
+# counts = G @ L and sums = (G * w) @ L, with G the group x question and L the question x node incidence
+def label_breakdown(cols, by_student=True, by_difficulty=True):
+    incidence = cols.incidence()
+    grouping, n_levels = cols.grouping(by_student, by_difficulty)
+    questions = (grouping @ incidence).tocsr()
+    questions.sum_duplicates()
+    questions.sort_indices()
+    sums = {}
+    for name, weights in (("Attempted", cols.attempted), ("Correct", cols.correct), ("Total Time (sec)", cols.time)):
+        product = (grouping.multiply(weights.astype(np.int64)).tocsr() @ incidence).tocsr()
+        product.eliminate_zeros()
+        product.sort_indices()
+        sums[name] = _values_at(questions, product)
+
+    group = np.repeat(np.arange(questions.shape[0]), np.diff(questions.indptr))
+    nodes = [cols.nodes.values[i] for i in questions.indices]
+    total = questions.data
+    difficulties = np.array(cols.difficulties.values, dtype=object)
+    df = pd.DataFrame({
+        "Student ID": np.array(cols.student_ids, dtype=object)[group // n_levels] if by_student else "All",
+        "Level": [LEVELS[len(node) - 1] for node in nodes],
+        "Chapter": [node[0] for node in nodes],
+        "Topic": [node[1] if len(node) > 1 else "" for node in nodes],
+        "Concept": [node[2] if len(node) > 2 else "" for node in nodes],
+        "Difficulty": difficulties[group % n_levels] if by_difficulty else ALL_DIFFICULTIES,
+        "Questions": total,
+        "Attempted": sums["Attempted"],
+        "Correct": sums["Correct"],
+        "Total Time (sec)": sums["Total Time (sec)"],
+        "Accuracy (%)": np.round(sums["Correct"] / total * 100, 2),
+        "Avg Time per Question (s)": np.round(sums["Total Time (sec)"] / total, 2),
+    })
+    return df[BREAKDOWN_COLUMNS]
+
+
+# Full breakdown with each difficulty level and an "All" row per node, weakest nodes first
+def hierarchical_breakdown(cols, by_student=True):
+    df = pd.concat([label_breakdown(cols, by_student, by_difficulty=False),
+                    label_breakdown(cols, by_student, by_difficulty=True)], ignore_index=True)
+    df["Level"] = pd.Categorical(df["Level"], categories=LEVELS, ordered=True)
+    return df.sort_values(["Student ID", "Level", "Difficulty", "Accuracy (%)", "Chapter", "Topic", "Concept"],
+                          ignore_index=True)
+
+
+# One student's breakdown straight from a submission
+def student_breakdown(data, student_id="student"):
+    cols = LabelColumns()
+    cols.add(student_id, data)
+    return hierarchical_breakdown(cols).drop(columns="Student ID")
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import os
+
+    from submission_stream import iter_submissions, submission_id
+
+    parser = argparse.ArgumentParser(description="Chapter/topic/concept x difficulty breakdown for submissions")
+    parser.add_argument("inputs", nargs="+", help="submission files or exports (globs allowed)")
+    parser.add_argument("--out", default="label_breakdown.csv")
+    parser.add_argument("--cohort", action="store_true", help="aggregate over all students instead of per student")
+    args = parser.parse_args()
+
+    def submissions():
+        for path in sorted(p for pattern in args.inputs for p in glob.glob(pattern)):
+            stem = os.path.basename(path).split('.')[0]
+            for i, data in enumerate(iter_submissions(path)):
+                yield submission_id(data, f"{stem}-{i}"), data
+
+    cols = extract_label_columns(submissions())
+    breakdown = hierarchical_breakdown(cols, by_student=not args.cohort)
+    breakdown.to_csv(args.out, index=False)
+    print(f"✅ {len(breakdown)} rows for {len(cols.student_ids)} students ({len(cols)} questions) saved to {args.out}")
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import metrics
+from rate_limiter import get_rate_limiter
+
+# Request settings (also part of the feedback cache key); override with environment variables
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-70b-8192")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))
+# Point at an OpenAI/Groq-compatible server instead of the provider's API, e.g. mock_llm_server.py
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+
+def _groq_client(api_key, base_url, http_limits):
+    import httpx
+    from groq import Groq
+    # retries handled by the rate limiter
+    return Groq(api_key=api_key, base_url=base_url, max_retries=0, http_client=httpx.Client(limits=http_limits))
+
+
+def _openai_client(api_key, base_url, http_limits):
+    import httpx
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=httpx.Client(limits=http_limits))
+
+
+# provider -> (API key variable, client factory); both SDKs expose the same chat.completions API
+PROVIDERS = {
+    "groq": ("GROQ_API_KEY", _groq_client),
+    "openai": ("OPENAI_API_KEY", _openai_client),
+}
+
+
+# Text and usage of a streamed completion, shaped like a regular response for the rate limiter
+class StreamedCompletion:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage = usage
+
+
+# Read a streamed completion; past `deadline` (time.monotonic()) the stream is closed and TimeoutError raised,
+# since the per-request timeout only bounds each read, not the whole response
+def _collect_stream(stream, on_token, deadline=None):
+    parts, usage = [], None
+    for chunk in stream:
+        if deadline is not None and time.monotonic() > deadline:
+            stream.close()
+            raise TimeoutError("streamed completion exceeded the deadline")
+        if chunk.choices and chunk.choices[0].delta.content:
+            token = chunk.choices[0].delta.content
+            parts.append(token)
+            if on_token is not None:
+                on_token(token)
+        usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+    return StreamedCompletion("".join(parts), usage)
+
+
+# One long-lived client per process: HTTP connections are pooled and reused across calls
+class LLMClient:
+    def __init__(self, provider=LLM_PROVIDER, model=LLM_MODEL, base_url=LLM_BASE_URL,
+                 max_connections=LLM_MAX_CONNECTIONS):
+        import httpx
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider {provider!r}; choose from {', '.join(PROVIDERS)}")
+        key_var, factory = PROVIDERS[provider]
+        self.provider = provider
+        self.model = model
+        self.api_key = os.getenv(key_var) or os.getenv("LLM_API_KEY")
+        if not self.api_key and base_url:
+            self.api_key = "local"  # stub servers don't check keys
+        self.key_var = key_var
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = factory(self.api_key or "unset", base_url, limits)
+
+    def _request(self, prompt, system_message, temperature, max_tokens, json_mode):
+        if not self.api_key:
+            raise ValueError(f"{self.key_var} environment variable not set")
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": LLM_TEMPERATURE if temperature is None else temperature,
+            "max_tokens": max_tokens,
+        }
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    # Rate-limited chat completion returning the reply text.
+    # `timeout` bounds each HTTP request, `deadline` (time.monotonic()) the whole call including waits and retries.
+    # With `stream=True` tokens are passed to `on_token` as they arrive, and `on_attempt()` is called before each
+    # attempt, so a caller can discard the tokens of an attempt that is being retried.
+    def complete(self, prompt, system_message, max_tokens=LLM_MAX_TOKENS, temperature=None, json_mode=False,
+                 timeout=None, deadline=None, stream=False, on_token=None, on_attempt=None):
+        request = self._request(prompt, system_message, temperature, max_tokens, json_mode)
+        if timeout is not None:
+            request["timeout"] = timeout
+        create = self.client.chat.completions.create
+        if stream:
+            def create(**kwargs):
+                if on_attempt is not None:
+                    on_attempt()
+                return _collect_stream(self.client.chat.completions.create(stream=True, **kwargs), on_token,
+                                       deadline)
+        limiter = get_rate_limiter()
+        response = limiter.call(create, estimated_tokens=limiter.estimate(prompt, max_tokens), deadline=deadline,
+                                **request)
+        metrics.record_llm_usage(response.usage)
+        return response.text if stream else response.choices[0].message.content
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+# Process-wide client; a forked worker builds its own instead of sharing the parent's sockets
+def get_llm_client():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = LLMClient()
+            _client_pid = os.getpid()
+        return _client
+
+
+def deadline_after(seconds):
+    return time.monotonic() + seconds if seconds else None
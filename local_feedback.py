@@ -0,0 +1,61 @@
+import numpy as np
+
+from history_store import progress_lines
+
+WEAK_CHAPTERS_SHOWN = 3
+
+
+def _fmt(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+# The four sections build_prompt asks the LLM for, filled in from the metrics without any network call
+def local_feedback(overall, subject_df, weak_df, cohort_df=None, progress_df=None):
+    subjects = subject_df["Subject"].tolist()
+    subject_acc = subject_df["Accuracy (%)"].to_numpy(float)
+    top = int(np.argmax(subject_acc))
+    chapters = weak_df["Chapter"].tolist()
+    chapter_acc = weak_df["Accuracy (%)"].tolist()
+    chapter_time = weak_df["Avg Time per Question (s)"].to_numpy(float)
+    fastest, slowest = int(np.argmin(chapter_time)), int(np.argmax(chapter_time))
+    attempted = overall["Total Questions Attempted"]
+    avg_minutes = overall["Total Time (min)"] / attempted if attempted else 0.0
+
+    lines = [
+        "**Personalized Introduction**",
+        f"Great work on your recent test! Your strongest subject was {subjects[top]} with "
+        f"{_fmt(subject_acc[top].item())}% accuracy. Overall accuracy: {_fmt(overall['Accuracy (%)'])}% "
+        f"({overall['Total Correct']}/{attempted} correct).",
+    ]
+    if cohort_df is not None and not cohort_df.empty:
+        ranks = dict(zip(cohort_df["Area"].tolist(), cohort_df["Percentile"].tolist()))
+        if "Overall" in ranks:
+            lines.append(f"Your overall accuracy is at the {ranks['Overall']:.0f}th percentile of this cohort.")
+    if progress_df is not None and not progress_df.empty:
+        lines += ["", "**Progress Since Your Last Test**"]
+        lines += [f"* {line}" for line in progress_lines(progress_df)]
+
+    lines += ["", "**Performance Breakdown**"]
+    for subject, acc, correct, tried, minutes in zip(subjects, subject_acc.tolist(), subject_df["Correct"].tolist(),
+                                                     subject_df["Attempted"].tolist(),
+                                                     subject_df["Time Taken (min)"].tolist()):
+        lines.append(f"* {subject}: {_fmt(acc)}% accuracy ({correct}/{tried} correct) in {_fmt(minutes)} minutes")
+    for chapter, acc in list(zip(chapters, chapter_acc))[:WEAK_CHAPTERS_SHOWN]:
+        lines.append(f"* Needs work: {chapter} at {_fmt(acc)}% accuracy")
+
+    lines += [
+        "",
+        "**Time Management Insights**",
+        f"* Average time per question: {avg_minutes:.1f} mins",
+        f"* Fastest chapter: {chapters[fastest]} ({chapter_time[fastest]:.0f}s per question)",
+        f"* Slowest chapter: {chapters[slowest]} ({chapter_time[slowest]:.0f}s per question)",
+        "",
+        "**Actionable Recommendations**",
+        f"1. Focus practice on {chapters[0]}, where your accuracy is currently {_fmt(chapter_acc[0])}%.",
+        f"2. Set a time target for {chapters[slowest]}: you spend {chapter_time[slowest]:.0f}s per question there, "
+        f"against {chapter_time.mean():.0f}s across all chapters.",
+        f"3. Use Khan Academy {subjects[top]} tutorials to keep building on your strongest subject.",
+        "",
+        "Keep going - steady practice on these areas will lift your next score.",
+    ]
+    return "\n".join(lines)
@@ -1,26 +1,86 @@
 import glob
 import json
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from groq import Groq
-from fpdf import FPDF
-import time
+
+import metrics
+from chart_renderer import get_chart_renderer
+from feedback_cache import feedback_key, get_feedback_cache
+from history_store import HISTORY_ENABLED, get_history_store, progress_frame, progress_lines, submission_key, \
+    submission_metrics
+from item_index import get_item_index, missed_frame
+from llm_client import LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, deadline_after, get_llm_client
+from local_feedback import local_feedback
+from report_engine import ProgressiveReport, feedback_blocks, get_report_template
+from submission_schema import SubmissionError, load_submission, report_invalid
+from submission_stream import question_correct
 
 # Configurable base path (replace with your own directory)
 BASE_PATH = "PATH_TO_YOUR_DATA_DIRECTORY"  # e.g., "/home/user/mathango_data" or "C:\\Users\\user\\Documents\\mathango_data"
 DATA_DIR = os.path.join(BASE_PATH, "data")
 OUTPUT_DIR = os.path.join(BASE_PATH, "output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# LLM provider, model and request settings live in llm_client (LLM_PROVIDER, LLM_MODEL, ...)
+SYSTEM_MESSAGE = "You are an expert math tutor generating student feedback."
+
+# "llm" calls Groq, "local" builds feedback from templates offline, and "llm-fallback" calls Groq
+# but switches to the local templates when the call fails or takes longer than LLM_TIMEOUT seconds
+FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "llm")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+
+# "png" renders chart_*.png and embeds it; "vector" draws the chart straight into the PDF
+CHART_MODE = os.getenv("CHART_MODE", "png")
+
+# "compact" builds Task 1 chapter frames with categorical labels from a process-wide vocabulary and
+# small integer/bool dtypes, for runs that keep many students' frames in memory; outputs are identical
+MEMORY_MODE = os.getenv("MEMORY_MODE", "standard")
+
+# "pipelined" runs parse, analysis, prompt building, LLM calls and rendering of different students at the
+# same time (pipeline.py); "sequential" finishes one student before starting the next
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "pipelined")
+
+# Directory of an item index (item_index.py); when set, the student's wrong answers on questions most of
+# the cohort also misses are listed per chapter in missed_*.csv and in the feedback prompt
+ITEM_INDEX_DIR = os.getenv("ITEM_INDEX")
+
+# Whether run_pipeline first builds a cohort index over DATA_DIR (cohort.py). Whenever the output directory
+# holds one (from this or from `batch_runner.py --cohort`), reports rank each student against the others
+# who sat the same test.
+COHORT_ENABLED = os.getenv("COHORT", "0") == "1"
+
+# Point the pipeline at a different data/output directory (used by batch_runner and app)
+def configure_paths(base_path, data_dir=None, output_dir=None):
+    global BASE_PATH, DATA_DIR, OUTPUT_DIR
+    BASE_PATH = base_path
+    DATA_DIR = data_dir or os.path.join(base_path, "data")
+    OUTPUT_DIR = output_dir or os.path.join(base_path, "output")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# Path of an output file; OUTPUT_DIR is created on first write, not when the module is imported
+def output_path(name):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    return os.path.join(OUTPUT_DIR, name)
+
+# Heavy libraries (pandas, matplotlib, fpdf, groq) are imported inside the stage that needs them,
+# so `import main` stays cheap for app.py, the CLI and pool workers
 
 # Task 1: Data Processing Functions
 def load_json(file_path):
-    with open(file_path, 'r') as f:
-        return json.load(f)[0]  # Each file has a single JSON object inside a list
+    # Each file has a single JSON object inside a list; decode and validate only the fields we use.
+    # Question fingerprints are only needed to look questions up in an item index.
+    return load_submission(file_path, fingerprint=bool(ITEM_INDEX_DIR))
+
+# The test a submission belongs to, so cohorts only compare students who sat the same paper: the export's
+# test id, or the test's size (questions, marks, minutes) when it has none
+def test_key(data):
+    test = data.get("test") or {}
+    oid = (test.get("_id") or {}).get("$oid")
+    if oid:
+        return oid
+    return f"{test.get('totalQuestions', '?')}q-{test.get('totalMarks', '?')}m-{test.get('totalTime', '?')}min"
 
 def extract_overall_metrics(data):
     return {
+        "Test ID": test_key(data),
         "Total Time (min)": round(data["totalTimeTaken"] / 60, 2),
         "Total Score": data["totalMarkScored"],
         "Total Questions Attempted": data["totalAttempted"],
@@ -28,16 +88,18 @@ def extract_overall_metrics(data):
         "Accuracy (%)": round(data["accuracy"], 2)
     }
 
+SUBJECT_MAP = {
+    "607018ee404ae53194e73d92": "Physics",
+    "607018ee404ae53194e73d90": "Chemistry",
+    "607018ee404ae53194e73d91": "Maths"
+}
+
 def extract_subject_metrics(data):
-    subject_map = {
-        "607018ee404ae53194e73d92": "Physics",
-        "607018ee404ae53194e73d90": "Chemistry",
-        "607018ee404ae53194e73d91": "Maths"
-    }
+    import pandas as pd
     rows = []
     for sub in data.get("subjects", []):
         rows.append({
-            "Subject": subject_map.get(sub["subjectId"]["$oid"], "Unknown"),
+            "Subject": SUBJECT_MAP.get(sub["subjectId"]["$oid"], "Unknown"),
             "Marks Scored": sub.get("totalMarkScored", 0),
             "Attempted": sub.get("totalAttempted", 0),
             "Correct": sub.get("totalCorrect", 0),
@@ -47,46 +109,52 @@ def extract_subject_metrics(data):
     return pd.DataFrame(rows)
 
 def extract_chapter_stats(data):
+    import pandas as pd
+    if MEMORY_MODE == "compact":
+        from columnar import compact_chapter_frame
+        return compact_chapter_frame(data)
     section_data = []
     for section in data.get("sections", []):
         for q in section.get("questions", []):
             qid = q.get("questionId", {})
-            chapters = [c["title"] for c in qid.get("chapters", [])]
+            chapters = [c["title"] for c in qid.get("chapters", [])] or ["Unknown"]
             topics = [t["title"] for t in qid.get("topics", [])]
             concepts = [c["title"] for c in qid.get("concepts", [])]
             level = qid.get("level", "unknown")
-            correct = any(opt.get("isCorrect", False) for opt in q.get("markedOptions", []))
-            section_data.append({
-                "Chapter": chapters[0] if chapters else "Unknown",
-                "Topic": topics[0] if topics else "Unknown",
-                "Concept": concepts[0] if concepts else "Unknown",
-                "Difficulty": level,
-                "Correct": correct,
-                "Time Taken (sec)": q.get("timeTaken", 0),
-                "Status": q.get("status", "unknown")
-            })
+            correct = question_correct(q)
+            # One row per tagged chapter, so a question counts towards every chapter it belongs to.
+            # Topic and Concept stay the primary label; label_stats credits every tagged one.
+            for chapter in chapters:
+                section_data.append({
+                    "Chapter": chapter,
+                    "Topic": topics[0] if topics else "Unknown",
+                    "Concept": concepts[0] if concepts else "Unknown",
+                    "Difficulty": level,
+                    "Correct": correct,
+                    "Time Taken (sec)": q.get("timeTaken", 0),
+                    "Status": q.get("status", "unknown")
+                })
     return pd.DataFrame(section_data)
 
 def identify_weak_chapters(df_chap):
-    df = df_chap.copy()
-    df_grouped = df.groupby("Chapter").agg({
+    import pandas as pd
+    # groupby leaves df_chap untouched, so it is aggregated in place rather than copied first
+    df_grouped = df_chap.groupby("Chapter", observed=True).agg({
         "Correct": ["sum", "count"],
         "Time Taken (sec)": "sum"
     }).reset_index()
     df_grouped.columns = ["Chapter", "Correct", "Total", "Total Time (sec)"]
+    if isinstance(df_grouped["Chapter"].dtype, pd.CategoricalDtype):
+        # Compact frames group in vocabulary order; restore alphabetical order so ties rank as before
+        df_grouped = df_grouped.astype({"Chapter": str}).sort_values("Chapter", ignore_index=True)
     df_grouped["Accuracy (%)"] = round(df_grouped["Correct"] / df_grouped["Total"] * 100, 2)
     df_grouped["Avg Time per Question (s)"] = round(df_grouped["Total Time (sec)"] / df_grouped["Total"], 2)
     return df_grouped.sort_values("Accuracy (%)")
 
 def plot_time_vs_accuracy(df_subject, student_id):
     try:
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(data=df_subject, x="Time Taken (min)", y="Accuracy (%)", hue="Subject", s=100)
-        plt.title(f"Time vs Accuracy for Student {student_id}")
-        plt.grid(True)
-        chart_path = os.path.join(OUTPUT_DIR, f"chart_{student_id}.png")
-        plt.savefig(chart_path)
-        plt.close()
+        chart_path = output_path(f"chart_{student_id}.png")
+        get_chart_renderer().render(df_subject, student_id, chart_path)
         print(f"Saved chart to {chart_path}")
         return chart_path
     except Exception as e:
@@ -97,46 +165,111 @@ def analyze_single_student(file_path):
     student_id = os.path.basename(file_path).split('_')[-1].split('.')[0]
     print(f"📂 Analyzing File: {os.path.basename(file_path)}")
     try:
-        data = load_json(file_path)
-        overall = extract_overall_metrics(data)
-        df_subject = extract_subject_metrics(data)
-        df_chapters = extract_chapter_stats(data)
-        df_weak = identify_weak_chapters(df_chapters)
-
-        # Save outputs
-        overall_path = os.path.join(OUTPUT_DIR, f"overall_{student_id}.json")
-        with open(overall_path, 'w') as f:
-            json.dump(overall, f)
-        print(f"Saved overall metrics to {overall_path}")
-
-        subject_path = os.path.join(OUTPUT_DIR, f"subject_{student_id}.csv")
-        df_subject.to_csv(subject_path, index=False)
-        print(f"Saved subject-wise performance to {subject_path}")
-
-        chapter_path = os.path.join(OUTPUT_DIR, f"chapter_{student_id}.csv")
-        df_chapters.to_csv(chapter_path, index=False)
-        print(f"Saved chapter-wise performance to {chapter_path}")
+        with metrics.stage("parse", student_id):
+            data = load_json(file_path)
+        metrics.record_bytes("parse", read=os.path.getsize(file_path))
+    except SubmissionError as e:
+        report_invalid(f"student {student_id}", e)
+        return {}
+    except Exception as e:
+        print(f"Error in data processing for student {student_id}: {e}")
+        return {}
+    return analyze_submission(data, student_id)
 
-        weak_path = os.path.join(OUTPUT_DIR, f"weak_{student_id}.csv")
-        df_weak.to_csv(weak_path, index=False)
-        print(f"Saved weak chapters to {weak_path}")
+def analyze_submission(data, student_id):
+    try:
+        with metrics.stage("pandas", student_id):
+            overall = extract_overall_metrics(data)
+            df_subject = extract_subject_metrics(data)
+            df_chapters = extract_chapter_stats(data)
+            df_weak = identify_weak_chapters(df_chapters)
+
+        # Fold this test into the student's running history and compare with what was known before it
+        df_progress = None
+        if HISTORY_ENABLED:
+            with metrics.stage("history", student_id):
+                values = submission_metrics(overall, df_subject, df_weak)
+                changes = get_history_store(OUTPUT_DIR).record(student_id, submission_key(data), values)
+                df_progress = progress_frame(changes, values)
+            if df_progress.empty:
+                df_progress = None  # first test on record: nothing to compare with
+
+        df_missed = None
+        if ITEM_INDEX_DIR:
+            with metrics.stage("item_index", student_id):
+                df_missed = missed_frame(get_item_index(ITEM_INDEX_DIR).commonly_missed(data))
 
-        chart_path = plot_time_vs_accuracy(df_subject, student_id)
+        # Save outputs
+        with metrics.stage("write_outputs", student_id):
+            overall_path = output_path(f"overall_{student_id}.json")
+            with open(overall_path, 'w') as f:
+                json.dump(overall, f)
+            print(f"Saved overall metrics to {overall_path}")
+
+            subject_path = output_path(f"subject_{student_id}.csv")
+            df_subject.to_csv(subject_path, index=False)
+            print(f"Saved subject-wise performance to {subject_path}")
+
+            chapter_path = output_path(f"chapter_{student_id}.csv")
+            df_chapters.to_csv(chapter_path, index=False)
+            print(f"Saved chapter-wise performance to {chapter_path}")
+
+            weak_path = output_path(f"weak_{student_id}.csv")
+            df_weak.to_csv(weak_path, index=False)
+            print(f"Saved weak chapters to {weak_path}")
+
+            written = [overall_path, subject_path, chapter_path, weak_path]
+            if df_progress is not None:
+                progress_path = output_path(f"progress_{student_id}.csv")
+                df_progress.to_csv(progress_path, index=False)
+                written.append(progress_path)
+                print(f"Saved progress since the last test to {progress_path}")
+            if df_missed is not None:
+                missed_path = output_path(f"missed_{student_id}.csv")
+                df_missed.to_csv(missed_path, index=False)
+                written.append(missed_path)
+                print(f"Saved commonly missed questions to {missed_path}")
+        metrics.record_bytes("write_outputs", written=sum(os.path.getsize(p) for p in written))
+
+        chart_path = None
+        if CHART_MODE == "png":
+            with metrics.stage("chart", student_id):
+                chart_path = plot_time_vs_accuracy(df_subject, student_id)
+            if chart_path:
+                metrics.record_bytes("chart", written=os.path.getsize(chart_path))
 
         return {
             "overall": overall,
             "subject_df": df_subject,
             "chapter_df": df_chapters,
             "weak_df": df_weak,
-            "chart_path": chart_path
+            "chart_path": chart_path,
+            "progress_df": df_progress,
+            "missed_df": df_missed
         }
     except Exception as e:
         print(f"Error in data processing for student {student_id}: {e}")
         return {}
 
 # Task 2: Feedback Generation Functions
-def build_prompt(overall, subject_df, weak_df):
+def build_prompt(overall, subject_df, weak_df, cohort_df=None, progress_df=None, missed_df=None):
     top_subject = subject_df.loc[subject_df['Accuracy (%)'].idxmax()]
+    cohort_section = ""
+    if cohort_df is not None and not cohort_df.empty:
+        cohort_section = f"""
+
+**Compared with the cohort (percentile rank, 100 = top of the class):**
+{cohort_df.to_markdown(index=False)}"""
+    progress_section = ""
+    if progress_df is not None and not progress_df.empty:
+        progress_section = "\n\n**Progress since the last test (mention these changes):**\n" + \
+            "\n".join(f"- {line}" for line in progress_lines(progress_df))
+    missed_section = ""
+    if missed_df is not None and not missed_df.empty:
+        missed_section = f"""
+
+**Questions most students also get wrong (say these are common mistakes, not personal weaknesses):**
+{missed_df.to_markdown(index=False)}"""
     return f"""**Generate student performance feedback with:**
 
 1. **Personalized Introduction**
@@ -149,7 +282,7 @@ def build_prompt(overall, subject_df, weak_df):
 {subject_df.to_markdown()}
 
 **Weakest Chapters:**
-{weak_df[['Chapter', 'Accuracy (%)']].to_markdown()}
+{weak_df[['Chapter', 'Accuracy (%)']].to_markdown()}{cohort_section}{progress_section}{missed_section}
 
 3. **Time Management Insights**
 - Average time per question: {overall['Total Time (min)']/overall['Total Questions Attempted']:.1f} mins
@@ -163,155 +296,244 @@ def build_prompt(overall, subject_df, weak_df):
 
 **Tone:** Encouraging, specific, and growth-focused"""
 
-def generate_feedback(student_id, overall, subject_df, weak_df):
+def generate_feedback(student_id, overall, subject_df, weak_df, cohort_df=None, progress_df=None, missed_df=None):
     try:
-        prompt = build_prompt(overall, subject_df, weak_df)
-        print(f"Prompt for Student {student_id} ready - length: {len(prompt)} chars")
-
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        if not client.api_key:
-            raise ValueError("GROQ_API_KEY environment variable not set")
-
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are an expert math tutor generating student feedback."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=800
-        )
-        feedback = response.choices[0].message.content
-
-        feedback_path = os.path.join(OUTPUT_DIR, f"feedback_{student_id}.txt")
-        with open(feedback_path, "w", encoding="utf-8") as f:
-            f.write(feedback)
-        print(f"Saved feedback to {feedback_path}")
-
+        if FEEDBACK_MODE == "local":
+            with metrics.stage("local_feedback", student_id):
+                feedback = local_feedback(overall, subject_df, weak_df, cohort_df, progress_df)
+        else:
+            feedback = llm_feedback(student_id, overall, subject_df, weak_df, cohort_df, progress_df, missed_df)
+        save_feedback(student_id, feedback)
         return feedback
     except Exception as e:
         print(f"Error generating feedback for student {student_id}: {e}")
         return None
 
+def save_feedback(student_id, feedback):
+    feedback_path = output_path(f"feedback_{student_id}.txt")
+    with open(feedback_path, "w", encoding="utf-8") as f:
+        written = f.write(feedback)
+    metrics.record_bytes("feedback", written=written)
+    print(f"Saved feedback to {feedback_path}")
+    return feedback_path
+
+def llm_feedback(student_id, overall, subject_df, weak_df, cohort_df=None, progress_df=None, missed_df=None):
+    prompt, cache_key, feedback = prepare_feedback(student_id, overall, subject_df, weak_df, cohort_df, progress_df,
+                                                   missed_df)
+    if feedback is not None:
+        return feedback
+    return complete_feedback(student_id, prompt, cache_key,
+                             lambda: local_feedback(overall, subject_df, weak_df, cohort_df, progress_df))
+
+# Prompt, cache key and cached reply (None on a miss) for a student, without calling the LLM
+def prepare_feedback(student_id, overall, subject_df, weak_df, cohort_df=None, progress_df=None, missed_df=None):
+    prompt = build_prompt(overall, subject_df, weak_df, cohort_df, progress_df, missed_df)
+    print(f"Prompt for Student {student_id} ready - length: {len(prompt)} chars")
+
+    cache_key = feedback_key(LLM_MODEL, LLM_TEMPERATURE, SYSTEM_MESSAGE, prompt)
+    feedback = get_feedback_cache(OUTPUT_DIR).get(cache_key)
+    if feedback is not None:
+        print(f"Feedback cache hit for student {student_id}")
+    return prompt, cache_key, feedback
+
+# Send a prepared prompt; in llm-fallback mode `fallback()` builds local feedback when the call fails.
+# With `on_token` the completion is streamed and each piece of text is passed on as it arrives;
+# `on_attempt()` runs before each (re)try of the call.
+def complete_feedback(student_id, prompt, cache_key, fallback, on_token=None, on_attempt=None):
+    use_fallback = FEEDBACK_MODE == "llm-fallback"
+    try:
+        with metrics.stage("llm", student_id):
+            feedback = get_llm_client().complete(prompt, SYSTEM_MESSAGE, LLM_MAX_TOKENS,
+                                                 timeout=LLM_TIMEOUT if use_fallback else None,
+                                                 deadline=deadline_after(LLM_TIMEOUT) if use_fallback else None,
+                                                 stream=on_token is not None, on_token=on_token,
+                                                 on_attempt=on_attempt)
+    except Exception as e:
+        if not use_fallback:
+            raise
+        # Local feedback is not cached, so the next run asks the LLM again
+        print(f"⚠️ LLM unavailable for student {student_id} ({e}), using local feedback")
+        metrics.count("llm_fallbacks")
+        with metrics.stage("local_feedback", student_id):
+            return fallback()
+    get_feedback_cache(OUTPUT_DIR).put(cache_key, feedback)
+    return feedback
+
 # Task 3: PDF Generation Functions
-def add_table(pdf, df, title, col_widths):
-    pdf.set_font("Helvetica", 'B', 12)
-    pdf.set_fill_color(200, 220, 255)
-    pdf.cell(0, 10, title, border=1, ln=True, fill=True)
-    pdf.set_font("Helvetica", size=10)
-    for col in df.columns:
-        pdf.cell(col_widths[df.columns.get_loc(col)], 8, col, border=1)
-    pdf.ln()
-    for _, row in df.iterrows():
-        for col in df.columns:
-            pdf.cell(col_widths[df.columns.get_loc(col)], 8, str(row[col]), border=1)
-        pdf.ln()
-    pdf.ln(5)
-
-def text_to_pdf(student_id, text, subject_df, weak_df, chart_path):
+def text_to_pdf(student_id, text, subject_df, weak_df, chart_path, cohort_df=None, progress_df=None):
     try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_title(f"Student {student_id} Performance Report")
-        pdf.set_author("MathonGo AI System")
-        pdf.set_margins(left=15, top=15, right=15)
-        pdf.set_auto_page_break(auto=True, margin=15)
-
-        logo_width = 30
-        logo_path = os.path.join(BASE_PATH, "mathongo_logo.jpeg")
-        try:
-            pdf.image(logo_path, x=pdf.w - logo_width - 15, y=10, w=logo_width)
-        except:
-            pdf.set_font("Helvetica", 'I', 10)
-            pdf.cell(0, 10, "MathonGo Logo Placeholder", ln=True, align="R")
-        pdf.ln(25)
-
-        pdf.set_font("Helvetica", 'B', 16)
-        pdf.cell(0, 10, f"Performance Report - Student {student_id}", ln=True, align="C")
-        pdf.ln(10)
-
-        col_widths_subject = [40, 30, 30, 30, 30, 40]
-        add_table(pdf, subject_df, "Subject-Wise Performance", col_widths_subject)
-
-        col_widths_weak = [50, 30, 30, 30, 30, 40]
-        add_table(pdf, weak_df, "Chapter-Wise Performance (Weak Areas)", col_widths_weak)
-
-        try:
-            pdf.set_font("Helvetica", 'B', 12)
-            pdf.cell(0, 10, "Time vs. Accuracy by Subject", ln=True)
-            pdf.image(chart_path, x=15, y=pdf.get_y() + 5, w=100)
-            pdf.ln(110)
-        except:
-            pdf.set_font("Helvetica", 'I', 10)
-            pdf.cell(0, 10, "Chart not available", ln=True)
-
-        lines = text.split('\n')
-        if lines and lines[0].strip() == "Here is the student performance feedback:":
-            lines = lines[1:]
-
-        pdf.set_font("Helvetica", size=11)
-        for line in lines:
-            line = line.strip()
-            if not line:
-                pdf.ln(6)
-                continue
-            if line.startswith('**') and line.endswith('**'):
-                pdf.set_font("Helvetica", 'B', 13)
-                pdf.cell(0, 8, line.strip('**'), new_x="LMARGIN", new_y="NEXT")
-                pdf.set_font("Helvetica", size=11)
-                pdf.ln(3)
-            elif line.startswith('* '):
-                pdf.cell(10)
-                pdf.multi_cell(0, 6, line[2:].strip())
-                pdf.ln(1)
-            elif line[:2].isdigit() and line[2] in '. )':
-                pdf.cell(10)
-                pdf.multi_cell(0, 6, line)
-                pdf.ln(1)
-            else:
-                pdf.multi_cell(0, 6, line)
-                pdf.ln(3)
-
-        pdf.set_font("Helvetica", size=8)
-        pdf.set_y(-15)
-        pdf.cell(0, 10, f"Page {pdf.page_no()} - MathonGo IIT JEE Prep", align="C")
-
-        pdf_path = os.path.join(OUTPUT_DIR, f"feedback_{student_id}.pdf")
-        pdf.output(pdf_path)
-        print(f"Saved PDF to {pdf_path}")
+        # Static layout (logo, header, table geometry, footer) is compiled once per process
+        with metrics.stage("pdf_layout", student_id):
+            template = get_report_template(BASE_PATH)
+            pdf = template.render(student_id, text, subject_df, weak_df, chart_path, cohort_df,
+                                  vector_chart=CHART_MODE == "vector", progress_df=progress_df)
 
-        return pdf_path
+        return _write_pdf(student_id, pdf)
     except Exception as e:
         print(f"Error generating PDF for student {student_id}: {e}")
         return None
 
-# Main Pipeline
-json_files = glob.glob(os.path.join(DATA_DIR, "sample_submission_analysis_*.json"))
-for json_file in json_files:
-    student_id = os.path.basename(json_file).split('_')[-1].split('.')[0]
-    print(f"\nProcessing student {student_id}...")
+def _write_pdf(student_id, pdf):
+    pdf_path = output_path(f"feedback_{student_id}.pdf")
+    with metrics.stage("pdf_write", student_id):
+        pdf.output(pdf_path)
+    metrics.record_bytes("pdf_write", written=os.path.getsize(pdf_path))
+    print(f"Saved PDF to {pdf_path}")
+    return pdf_path
+
+# Task 2 and Task 3 together for interactive use: the completion is streamed, the PDF is laid out block by
+# block while it arrives, and `on_block(kind, text)` sees each feedback block as soon as its line is complete.
+# When a retry or the local fallback replaces text already passed on, on_block("reset", "") comes first and the
+# blocks of the final feedback follow. Returns (feedback, pdf_path); either is None on failure.
+def stream_report(student_id, overall, subject_df, weak_df, chart_path, cohort_df=None, progress_df=None,
+                  on_block=None, missed_df=None):
+    on_block = on_block or (lambda kind, text: None)
     try:
-        # Task 1: Data processing
-        result = analyze_single_student(json_file)
-        if not result.get("overall"):
-            print(f"❌ Skipping student {student_id} due to data processing failure")
-            continue
-        print(f"✅ Task 1 completed for student {student_id}")
-
-        # Task 2: Feedback generation
-        feedback = generate_feedback(student_id, result["overall"], result["subject_df"], result["weak_df"])
-        if not feedback:
-            print(f"❌ Skipping student {student_id} due to feedback generation failure")
-            continue
-        print(f"✅ Task 2 completed for student {student_id}")
-        time.sleep(5)  # Rate limit for Groq API
-
-        # Task 3: PDF generation
-        pdf_path = text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"])
-        if pdf_path:
-            print(f"✅ Task 3 completed for student {student_id}: PDF saved to {pdf_path}")
+        feedback = None
+        if FEEDBACK_MODE == "local":
+            with metrics.stage("local_feedback", student_id):
+                feedback = local_feedback(overall, subject_df, weak_df, cohort_df, progress_df)
         else:
-            print(f"❌ Skipping student {student_id} due to PDF generation failure")
-
+            prompt, cache_key, feedback = prepare_feedback(student_id, overall, subject_df, weak_df, cohort_df,
+                                                           progress_df, missed_df)
+        if feedback is None:
+            def new_report():
+                with metrics.stage("pdf_layout", student_id):
+                    return ProgressiveReport(get_report_template(BASE_PATH), student_id, subject_df, weak_df,
+                                             chart_path, cohort_df, CHART_MODE == "vector", progress_df)
+
+            report = new_report()
+            attempts = 0
+            shown = False
+
+            def on_attempt():
+                nonlocal report, attempts, shown
+                attempts += 1
+                if attempts == 1:
+                    return
+                # The previous attempt failed part-way: drop what it streamed
+                if shown:
+                    on_block("reset", "")
+                    shown = False
+                report = new_report()
+
+            def on_token(token):
+                nonlocal shown
+                for kind, text in report.feed(token):
+                    shown = True
+                    on_block(kind, text)
+
+            feedback = complete_feedback(student_id, prompt, cache_key,
+                                         lambda: local_feedback(overall, subject_df, weak_df, cohort_df, progress_df),
+                                         on_token=on_token, on_attempt=on_attempt)
+            save_feedback(student_id, feedback)
+            if report.text == feedback:
+                for kind, text in report.finish()[0]:
+                    on_block(kind, text)
+                return feedback, _write_pdf(student_id, report.pdf)
+            # The local fallback replaced a failed stream; lay the final feedback out afresh
+            if shown:
+                on_block("reset", "")
+        else:
+            save_feedback(student_id, feedback)
+        for kind, text in feedback_blocks(feedback):
+            on_block(kind, text)
+        return feedback, text_to_pdf(student_id, feedback, subject_df, weak_df, chart_path, cohort_df, progress_df)
     except Exception as e:
-        print(f"❌ Failed for student {student_id}: {str(e)}")
\ No newline at end of file
+        print(f"Error streaming the report for student {student_id}: {e}")
+        return None, None
+
+# Build the cohort index over a run's submission files and save it into OUTPUT_DIR
+def build_cohort(json_files):
+    from cohort import build_cohort_index, save_cohort_index
+
+    def submissions():
+        for json_file in json_files:
+            try:
+                yield os.path.basename(json_file).split('_')[-1].split('.')[0], load_json(json_file)
+            except SubmissionError as e:
+                report_invalid(os.path.basename(json_file), e)
+
+    index = build_cohort_index(submissions())
+    save_cohort_index(index, OUTPUT_DIR)
+    print(f"Built cohort index for {len(index.tests)} test(s) in {OUTPUT_DIR}")
+    return index
+
+# Percentile ranks against the student's test in the cohort index saved in OUTPUT_DIR; None without one
+def cohort_ranks(result):
+    from cohort import get_cohort_index
+    index = get_cohort_index(OUTPUT_DIR)
+    if index is None:
+        return None
+    return index.student_ranks(result["overall"], result["subject_df"], result["weak_df"])
+
+# Main Pipeline
+def run_pipeline():
+    from manifest import Manifest, hash_file, load_analysis, load_feedback
+
+    json_files = glob.glob(os.path.join(DATA_DIR, "sample_submission_analysis_*.json"))
+    if COHORT_ENABLED:
+        build_cohort(json_files)
+    # Feedback is regenerated when the cohort it was ranked against changes
+    from cohort import get_cohort_index
+    cohort = get_cohort_index(OUTPUT_DIR)
+    cohort_hash = cohort.fingerprint() if cohort is not None else ""
+    if PIPELINE_MODE == "pipelined":
+        from pipeline import run_pipelined
+        run_pipelined(json_files, cohort_hash=cohort_hash)
+        print(f"📊 Stage metrics saved to {metrics.write_summary(output_path('metrics_summary.json'))}")
+        return
+
+    manifest = Manifest(OUTPUT_DIR)
+    for json_file in json_files:
+        student_id = os.path.basename(json_file).split('_')[-1].split('.')[0]
+        print(f"\nProcessing student {student_id}...")
+        with metrics.student_span(student_id):
+            try:
+                # Skip stages whose inputs and code are unchanged since the last run
+                fingerprints = manifest.fingerprints(hash_file(json_file), cohort_hash)
+                stage = manifest.first_stale_stage(student_id, fingerprints)
+                if stage is None:
+                    print(f"⏭️ Student {student_id} is up to date")
+                    continue
+
+                # Task 1: Data processing
+                if stage == "analyze":
+                    result = analyze_single_student(json_file)
+                    if not result.get("overall"):
+                        print(f"❌ Skipping student {student_id} due to data processing failure")
+                        continue
+                    manifest.record(student_id, "analyze", fingerprints["analyze"])
+                    print(f"✅ Task 1 completed for student {student_id}")
+                else:
+                    result = load_analysis(student_id, OUTPUT_DIR)
+                cohort_df = cohort_ranks(result)
+
+                # Task 2: Feedback generation
+                if stage in ("analyze", "feedback"):
+                    feedback = generate_feedback(student_id, result["overall"], result["subject_df"], result["weak_df"],
+                                                 cohort_df, result.get("progress_df"), result.get("missed_df"))
+                    if not feedback:
+                        print(f"❌ Skipping student {student_id} due to feedback generation failure")
+                        continue
+                    manifest.record(student_id, "feedback", fingerprints["feedback"])
+                    print(f"✅ Task 2 completed for student {student_id}")
+                else:
+                    feedback = load_feedback(student_id, OUTPUT_DIR)
+
+                # Task 3: PDF generation
+                pdf_path = text_to_pdf(student_id, feedback, result["subject_df"], result["weak_df"], result["chart_path"],
+                                       cohort_df, result.get("progress_df"))
+                if pdf_path:
+                    manifest.record(student_id, "pdf", fingerprints["pdf"])
+                    print(f"✅ Task 3 completed for student {student_id}: PDF saved to {pdf_path}")
+                else:
+                    print(f"❌ Skipping student {student_id} due to PDF generation failure")
+
+            except Exception as e:
+                print(f"❌ Failed for student {student_id}: {str(e)}")
+    manifest.close()
+    print(f"📊 Stage metrics saved to {metrics.write_summary(os.path.join(OUTPUT_DIR, 'metrics_summary.json'))}")
+
+if __name__ == "__main__":
+    run_pipeline()
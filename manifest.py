@@ -0,0 +1,150 @@
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import main
+
+STAGES = ("analyze", "feedback", "pdf")
+
+# Functions whose source makes up each stage's code version
+STAGE_CODE = {
+    "analyze": ("load_json", "extract_overall_metrics", "extract_subject_metrics", "extract_chapter_stats",
+                "identify_weak_chapters", "plot_time_vs_accuracy", "analyze_submission"),
+    "feedback": ("build_prompt", "generate_feedback", "save_feedback", "llm_feedback", "prepare_feedback",
+                 "complete_feedback"),
+    "pdf": ("text_to_pdf",),
+}
+# Helper modules whose whole source is part of a stage's code version
+STAGE_MODULES = {
+    "analyze": ("chart_renderer", "submission_stream", "submission_schema", "history_store", "item_index"),
+    "feedback": ("local_feedback",),
+    "pdf": ("report_engine", "chart_renderer"),
+}
+
+_code_versions = None
+
+
+def _sha256(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_submission(data):
+    return _sha256(json.dumps(data, sort_keys=True, separators=(",", ":")))
+
+
+# Hash of the source of every function a stage runs, plus settings that change its output
+def code_versions():
+    global _code_versions
+    if _code_versions is None:
+        logo_path = os.path.join(main.BASE_PATH, "mathongo_logo.jpeg")
+        index_counts = os.path.join(main.ITEM_INDEX_DIR or "", "counts.npy")
+        settings = {
+            "analyze": (main.CHART_MODE, hash_file(index_counts) if main.ITEM_INDEX_DIR else ""),
+            "feedback": (main.LLM_MODEL, main.LLM_TEMPERATURE, main.LLM_MAX_TOKENS, main.SYSTEM_MESSAGE,
+                         main.FEEDBACK_MODE),
+            "pdf": (main.CHART_MODE, hash_file(logo_path) if os.path.exists(logo_path) else ""),
+        }
+        _code_versions = {
+            stage: _sha256(*(inspect.getsource(getattr(main, name)) for name in names),
+                           *(inspect.getsource(importlib.import_module(module)) for module in STAGE_MODULES[stage]),
+                           *settings[stage])
+            for stage, names in STAGE_CODE.items()
+        }
+    return _code_versions
+
+
+# Output files each stage writes for a student
+def stage_outputs(student_id, output_dir):
+    return {
+        "analyze": [os.path.join(output_dir, f"{prefix}_{student_id}.{ext}") for prefix, ext in
+                    (("overall", "json"), ("subject", "csv"), ("chapter", "csv"), ("weak", "csv"),
+                     ("chart", "png"), ("progress", "csv"), ("missed", "csv"))],
+        "feedback": [os.path.join(output_dir, f"feedback_{student_id}.txt")],
+        "pdf": [os.path.join(output_dir, f"feedback_{student_id}.pdf")],
+    }
+
+
+# Re-read a previous run's Task 1 outputs so later stages can run without re-analysis
+def load_analysis(student_id, output_dir):
+    paths = stage_outputs(student_id, output_dir)["analyze"]
+    with open(paths[0]) as f:
+        overall = json.load(f)
+    return {
+        "overall": overall,
+        "subject_df": pd.read_csv(paths[1]),
+        "chapter_df": pd.read_csv(paths[2]),
+        "weak_df": pd.read_csv(paths[3]),
+        "chart_path": paths[4] if os.path.exists(paths[4]) else None,
+        "progress_df": pd.read_csv(paths[5]) if os.path.exists(paths[5]) else None,
+        "missed_df": pd.read_csv(paths[6]) if os.path.exists(paths[6]) else None,
+    }
+
+
+def load_feedback(student_id, output_dir):
+    with open(stage_outputs(student_id, output_dir)["feedback"][0], encoding="utf-8") as f:
+        return f.read()
+
+
+# SQLite record of what each stage last produced for each student
+class Manifest:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        # Callers that share one manifest between threads serialise access themselves (see pipeline.py)
+        self.conn = sqlite3.connect(os.path.join(output_dir, "manifest.sqlite"), timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS stages ("
+            "student_id TEXT NOT NULL, stage TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "outputs TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (student_id, stage))"
+        )
+        self.conn.commit()
+
+    # Each stage's fingerprint chains its inputs' fingerprint with its own code version
+    def fingerprints(self, input_hash, extra=""):
+        versions = code_versions()
+        analyze = _sha256(input_hash, versions["analyze"])
+        feedback = _sha256(analyze, extra, versions["feedback"])
+        pdf = _sha256(feedback, versions["pdf"])
+        return {"analyze": analyze, "feedback": feedback, "pdf": pdf}
+
+    # First stage whose fingerprint changed or whose outputs are missing; None if all are current
+    def first_stale_stage(self, student_id, fingerprints):
+        rows = dict(
+            (stage, (fp, outputs)) for stage, fp, outputs in self.conn.execute(
+                "SELECT stage, fingerprint, outputs FROM stages WHERE student_id = ?", (student_id,))
+        )
+        for stage in STAGES:
+            fp, outputs = rows.get(stage, (None, "[]"))
+            if fp != fingerprints[stage] or not all(os.path.exists(p) for p in json.loads(outputs)):
+                return stage
+        return None
+
+    def record(self, student_id, stage, fingerprint, outputs=None):
+        if outputs is None:
+            outputs = [p for p in stage_outputs(student_id, self.output_dir)[stage] if os.path.exists(p)]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO stages (student_id, stage, fingerprint, outputs, updated) VALUES (?, ?, ?, ?, ?)",
+            (student_id, stage, fingerprint, json.dumps(outputs), time.time()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
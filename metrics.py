@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # tracing is optional
+    _otel_trace = None
+
+PREFIX = "mathongo_"
+HELP = {
+    "stage_calls": "Pipeline stage calls by outcome",
+    "stage_wall_seconds": "Wall-clock seconds spent in each pipeline stage",
+    "stage_cpu_seconds": "CPU seconds (calling thread) spent in each pipeline stage",
+    "bytes_read": "Bytes read from disk by stage",
+    "bytes_written": "Bytes written to disk by stage",
+    "llm_tokens": "LLM tokens reported by the API",
+    "feedback_cache_requests": "Feedback cache lookups by result",
+    "queue_items": "Items handed between pipeline stages, by queue",
+    "queue_depth_sum": "Sum of queue depths seen by each put (divide by queue_items for the mean depth)",
+    "queue_wait_seconds": "Seconds items spent waiting in a queue before a stage took them",
+    "queue_blocked_seconds": "Seconds producers were held back by a full queue or missing rate-limit headroom",
+    "queue_idle_seconds": "Seconds consumers waited on an empty queue",
+    "pipeline_busy_seconds": "Seconds pipeline stage workers spent working",
+}
+
+
+# Process-wide counters keyed by (name, labels); every metric is a monotonically increasing sum
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    # Fold in counters recorded elsewhere (e.g. a worker process's delta)
+    def merge(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.values[key] = self.values.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+registry = Registry()
+
+
+def count(name, value=1, **labels):
+    registry.add(name, value, **labels)
+
+
+def record_bytes(stage, read=0, written=0):
+    if read:
+        registry.add("bytes_read", read, stage=stage)
+    if written:
+        registry.add("bytes_written", written, stage=stage)
+
+
+def record_llm_usage(usage):
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens is None and isinstance(usage, dict):
+            tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            registry.add("llm_tokens", tokens, kind=kind)
+
+
+def _span(name, attributes):
+    if _otel_trace is None:
+        return nullcontext()
+    return _otel_trace.get_tracer("mathongo.pipeline").start_as_current_span(name, attributes=attributes)
+
+
+# Time a stage (wall and CPU) and open an OpenTelemetry span for it when opentelemetry is installed
+@contextmanager
+def stage(name, student_id=None):
+    attributes = {"stage": name}
+    if student_id is not None:
+        attributes["student.id"] = str(student_id)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    status = "error"
+    with _span(f"pipeline.{name}", attributes):
+        try:
+            yield
+            status = "ok"
+        finally:
+            registry.add("stage_wall_seconds", time.perf_counter() - wall, stage=name)
+            registry.add("stage_cpu_seconds", time.thread_time() - cpu, stage=name)
+            registry.add("stage_calls", stage=name, status=status)
+
+
+# Parent span grouping one student's stages
+def student_span(student_id):
+    return _span("pipeline.student", {"student.id": str(student_id)})
+
+
+# Run `fn` and return (value, counters it recorded); used in pool workers so the parent can merge them
+def collect(fn, *args):
+    before = registry.snapshot()
+    value = fn(*args)
+    after = registry.snapshot()
+    return value, {key: v - before.get(key, 0) for key, v in after.items() if v != before.get(key, 0)}
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+
+# Prometheus text exposition format
+def prometheus_text():
+    values = registry.snapshot()
+    lines = []
+    for name in sorted({key[0] for key in values}):
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {metric} counter")
+        for (key_name, labels), value in sorted(values.items()):
+            if key_name == name:
+                lines.append(f"{metric}{_labels(labels)} {value if isinstance(value, int) else round(value, 6)}")
+    return "\n".join(lines) + "\n"
+
+
+# Nested dict summary: per-stage calls, wall/CPU seconds and means, plus bytes, tokens and cache counts
+def summary():
+    values = registry.snapshot()
+    stages, other = {}, {}
+    for (name, labels), value in values.items():
+        labels = dict(labels)
+        if name.startswith("stage_"):
+            entry = stages.setdefault(labels["stage"], {"calls": 0, "errors": 0, "wall_seconds": 0.0,
+                                                        "cpu_seconds": 0.0})
+            if name == "stage_calls":
+                entry["calls"] += value
+                if labels.get("status") == "error":
+                    entry["errors"] += value
+            else:
+                entry[name[len("stage_"):]] += value
+        else:
+            label = ",".join(str(v) for v in labels.values()) or "total"
+            other.setdefault(name, {})[label] = value
+    for entry in stages.values():
+        entry["mean_wall_ms"] = round(entry["wall_seconds"] / entry["calls"] * 1000, 3) if entry["calls"] else 0.0
+        entry["wall_seconds"] = round(entry["wall_seconds"], 4)
+        entry["cpu_seconds"] = round(entry["cpu_seconds"], 4)
+    return {"stages": stages, **other}
+
+
+def write_summary(path):
+    with open(path, "w") as f:
+        json.dump(summary(), f, indent=2)
+    return path
@@ -0,0 +1,173 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECTIONS = ("Personalized Introduction", "Performance Breakdown", "Time Management Insights",
+            "Actionable Recommendations")
+COMPLETION_PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions", "/chat/completions")
+
+
+def _feedback_text(label):
+    return "\n\n".join(f"**{section}**\n* Placeholder feedback for {label}." for section in SECTIONS)
+
+
+# Canned reply for a request: a JSON batch when JSON mode is on, otherwise markdown feedback
+def reply_text(body):
+    prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        ids = re.findall(r'"student_id":\s*"([^"]+)"', prompt)
+        return json.dumps({"feedback": [{"student_id": i, "feedback": _feedback_text(f"student {i}")} for i in ids]})
+    return _feedback_text("this student")
+
+
+# Request counters, shared by the handler threads
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+
+    def leave(self, error=False):
+        with self.lock:
+            self.concurrent -= 1
+            self.errors += error
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "errors": self.errors, "max_concurrent": self.max_concurrent}
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path not in COMPLETION_PATHS:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        server = self.server
+        server.stats.enter()
+        failed = False
+        try:
+            time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+            roll = random.random()
+            if roll < server.rate_limit_rate:
+                failed = True
+                self._send_json(429, {"error": {"message": "rate limit exceeded (mock)", "type": "rate_limit"}},
+                                {"retry-after": "1"})
+                return
+            if roll < server.rate_limit_rate + server.error_rate:
+                failed = True
+                self._send_json(500, {"error": {"message": "internal error (mock)", "type": "server_error"}})
+                return
+            text = reply_text(body)
+            if body.get("stream"):
+                self._stream(body, text)
+            else:
+                # The whole reply is generated before it is sent, at the same per-word pace as a stream
+                time.sleep(server.token_delay * len(re.findall(r"\S+\s*", text)))
+                self._send_json(200, self._completion(body, text))
+        finally:
+            server.stats.leave(failed)
+
+    def _usage(self, body, text):
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        completion_tokens = len(text) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _completion(self, body, text):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": self._usage(body, text),
+        }
+
+    # Server-sent events, one chunk per word, then usage in the final chunk
+    def _stream(self, body, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "mock")}
+        for word in re.findall(r"\S+\s*", text):
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(self.server.token_delay)
+        final = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     x_groq={"usage": self._usage(body, text)})
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.close_connection = True
+
+
+# OpenAI/Groq-compatible chat completions stub with injected latency and errors
+def make_server(host="127.0.0.1", port=8000, latency=0.5, jitter=0.1, error_rate=0.0, rate_limit_rate=0.0,
+                token_delay=0.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.rate_limit_rate = rate_limit_rate
+    server.token_delay = token_delay
+    server.verbose = verbose
+    server.stats = ServerStats()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI/Groq-compatible LLM stub for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds per generated word (streamed or not)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate,
+                         args.token_delay, args.verbose)
+    print(f"Mock LLM server on http://{args.host}:{args.port} (set LLM_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,240 @@
+import os
+import queue
+import threading
+import time
+
+import main
+import metrics
+from llm_client import LLM_MAX_TOKENS
+from local_feedback import local_feedback
+from manifest import Manifest, hash_file, load_analysis, load_feedback
+from rate_limiter import get_rate_limiter
+
+# parse -> analyze -> prompt -> llm -> render, each stage on its own worker thread(s)
+STAGES = ("parse", "analyze", "prompt", "llm", "render")
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", "4"))
+HEADROOM_POLL = 0.05
+
+_DONE = object()
+
+
+# Bounded hand-off between two stages. Records queue depth at every put, how long items wait in it,
+# how long producers are held back (backpressure) and how long consumers sit idle.
+class StageQueue:
+    def __init__(self, name, maxsize=QUEUE_SIZE):
+        self.name = name
+        self.queue = queue.Queue(maxsize)
+
+    # `limit()` optionally lowers the capacity below maxsize, e.g. to the rate limiter's current headroom
+    def put(self, item, limit=None):
+        start = time.perf_counter()
+        if limit is not None:
+            while self.queue.qsize() >= max(1, limit()):
+                time.sleep(HEADROOM_POLL)
+        depth = self.queue.qsize()
+        self.queue.put((time.perf_counter(), item))
+        if item is not _DONE:
+            metrics.count("queue_items", queue=self.name)
+            metrics.count("queue_depth_sum", depth, queue=self.name)
+            metrics.count("queue_blocked_seconds", time.perf_counter() - start, queue=self.name)
+
+    def get(self):
+        start = time.perf_counter()
+        enqueued, item = self.queue.get()
+        now = time.perf_counter()
+        if item is not _DONE:
+            metrics.count("queue_idle_seconds", now - start, queue=self.name)
+            metrics.count("queue_wait_seconds", now - enqueued, queue=self.name)
+        return item
+
+    def qsize(self):
+        return self.queue.qsize()
+
+
+# Overlaps the CPU stages of some students with the LLM calls of others. Each stage takes jobs (one dict
+# per student) from its inbox and hands them on; a full queue blocks the stage before it, so throughput
+# settles at the rate of the slowest stage and memory stays bounded by the queue sizes.
+class Pipeline:
+    def __init__(self, manifest, llm_workers=LLM_WORKERS, queue_size=QUEUE_SIZE, cohort_hash=""):
+        self.manifest = manifest
+        self.cohort_hash = cohort_hash
+        self.manifest_lock = threading.Lock()
+        self.workers = {"parse": 1, "analyze": 1, "prompt": 1, "llm": llm_workers if main.FEEDBACK_MODE != "local"
+                        else 1, "render": 1}
+        self.queues = {name: StageQueue(name, queue_size) for name in STAGES}
+        self.busy = {name: 0.0 for name in STAGES}
+        self.busy_lock = threading.Lock()
+        self.remaining = dict(self.workers)
+        self.pdf_paths = {}
+        self.started = None
+        self.elapsed = 0.0
+
+    def _record(self, job, stage):
+        with self.manifest_lock:
+            self.manifest.record(job["student_id"], stage, job["fingerprints"][stage])
+
+    # Read the submission, or the outputs of the stages that are still current
+    def parse(self, job):
+        student_id = job["student_id"]
+        if job["start"] != "analyze":
+            try:
+                job.update(load_analysis(student_id, main.OUTPUT_DIR))
+                if job["start"] == "pdf":
+                    job["feedback"] = load_feedback(student_id, main.OUTPUT_DIR)
+                return job
+            except (OSError, ValueError) as e:
+                print(f"Previous outputs for student {student_id} unreadable ({e}), re-running all stages")
+                job["start"] = "analyze"
+                job.pop("feedback", None)
+        if job["start"] == "analyze":
+            with metrics.stage("parse", student_id):
+                job["data"] = main.load_json(job["path"])
+            metrics.record_bytes("parse", read=os.path.getsize(job["path"]))
+        return job
+
+    # Fresh analysis, or outputs read back by parse; either way ranked against the saved cohort index
+    def analyze(self, job):
+        data = job.pop("data", None)
+        if data is not None:
+            result = main.analyze_submission(data, job["student_id"])
+            if not result.get("overall"):
+                print(f"❌ Skipping student {job['student_id']} due to data processing failure")
+                return None
+            job.update(result)
+            self._record(job, "analyze")
+            print(f"✅ Task 1 completed for student {job['student_id']}")
+        job["cohort_df"] = main.cohort_ranks(job)
+        return job
+
+    # Build the prompt as soon as the analysis is ready; cache hits and local feedback skip the LLM stage
+    def prompt(self, job):
+        if "feedback" in job:
+            return job
+        student_id = job["student_id"]
+        args = (job["overall"], job["subject_df"], job["weak_df"], job.get("cohort_df"), job.get("progress_df"))
+        if main.FEEDBACK_MODE == "local":
+            with metrics.stage("local_feedback", student_id):
+                return self._feedback_ready(job, local_feedback(*args))
+        job["prompt"], job["cache_key"], feedback = main.prepare_feedback(student_id, *args, job.get("missed_df"))
+        if feedback is not None:
+            return self._feedback_ready(job, feedback)
+        return job
+
+    def llm(self, job):
+        if "prompt" not in job:
+            return job
+        overall, subject_df, weak_df = job["overall"], job["subject_df"], job["weak_df"]
+        feedback = main.complete_feedback(job["student_id"], job.pop("prompt"), job.pop("cache_key"),
+                                          lambda: local_feedback(overall, subject_df, weak_df, job.get("cohort_df"),
+                                                                 job.get("progress_df")))
+        return self._feedback_ready(job, feedback)
+
+    def _feedback_ready(self, job, feedback):
+        main.save_feedback(job["student_id"], feedback)
+        job["feedback"] = feedback
+        self._record(job, "feedback")
+        print(f"✅ Task 2 completed for student {job['student_id']}")
+        return job
+
+    def render(self, job):
+        student_id = job["student_id"]
+        pdf_path = main.text_to_pdf(student_id, job["feedback"], job["subject_df"], job["weak_df"], job["chart_path"],
+                                    job.get("cohort_df"), job.get("progress_df"))
+        if not pdf_path:
+            print(f"❌ Skipping student {student_id} due to PDF generation failure")
+            return None
+        self._record(job, "pdf")
+        self.pdf_paths[student_id] = pdf_path
+        print(f"✅ Task 3 completed for student {student_id}: PDF saved to {pdf_path}")
+        return None
+
+    # Prompts wait for rate-limit headroom before queueing, so the LLM stage never holds more
+    # requests than the limiter could start now and the stages upstream slow down instead
+    def _llm_limit(self, job):
+        if "prompt" not in job:
+            return None
+        limiter = get_rate_limiter()
+        tokens = limiter.estimate(job["prompt"], LLM_MAX_TOKENS)
+        return lambda: min(self.queues["llm"].queue.maxsize, limiter.headroom(tokens))
+
+    def _worker(self, name):
+        fn = getattr(self, name)
+        inbox = self.queues[name]
+        following = STAGES[STAGES.index(name) + 1] if name != STAGES[-1] else None
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                job = fn(job)
+            except Exception as e:
+                print(f"❌ {name} failed for student {job['student_id']}: {e}")
+                job = None
+            finally:
+                busy = time.perf_counter() - start
+                metrics.count("pipeline_busy_seconds", busy, stage=name)
+                with self.busy_lock:
+                    self.busy[name] += busy
+            if job is not None and following is not None:
+                self.queues[following].put(job, self._llm_limit(job) if following == "llm" else None)
+        # The last worker of a stage to finish tells every worker of the next stage to stop
+        with self.busy_lock:
+            self.remaining[name] -= 1
+            last = self.remaining[name] == 0
+        if last and following is not None:
+            for _ in range(self.workers[following]):
+                self.queues[following].put(_DONE)
+
+    # Feed (student_id, json_file) pairs through the stages; returns {student_id: pdf_path}
+    def run(self, students):
+        self.started = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(name,), name=f"pipeline-{name}-{i}", daemon=True)
+                   for name in STAGES for i in range(self.workers[name])]
+        for thread in threads:
+            thread.start()
+        for student_id, json_file in students:
+            with self.manifest_lock:
+                fingerprints = self.manifest.fingerprints(hash_file(json_file), self.cohort_hash)
+                start = self.manifest.first_stale_stage(student_id, fingerprints)
+            if start is None:
+                print(f"⏭️ Student {student_id} is up to date")
+                continue
+            print(f"\nQueued student {student_id} from stage {start}")
+            self.queues["parse"].put({"student_id": student_id, "path": json_file, "start": start,
+                                      "fingerprints": fingerprints})
+        self.queues["parse"].put(_DONE)
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self.pdf_paths
+
+    # Share of the run each stage's workers were busy; the busiest stage is the bottleneck
+    def utilization(self):
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        return {name: self.busy[name] / (self.workers[name] * elapsed) if elapsed else 0.0 for name in STAGES}
+
+    def report(self):
+        values = metrics.registry.snapshot()
+        utilization = self.utilization()
+        parts = []
+        for name in STAGES:
+            items = values.get(("queue_items", (("queue", name),)), 0)
+            depth = values.get(("queue_depth_sum", (("queue", name),)), 0) / items if items else 0.0
+            parts.append(f"{name} {utilization[name]:.0%} busy, queue {depth:.1f}")
+        print("📊 " + " | ".join(parts))
+        bottleneck = max(utilization, key=utilization.get)
+        if utilization[bottleneck]:
+            print(f"📊 Bottleneck: {bottleneck} ({len(self.pdf_paths)} reports in {self.elapsed:.1f}s)")
+
+
+def run_pipelined(json_files, llm_workers=LLM_WORKERS, queue_size=QUEUE_SIZE, cohort_hash=""):
+    manifest = Manifest(main.OUTPUT_DIR)
+    pipeline = Pipeline(manifest, llm_workers, queue_size, cohort_hash)
+    try:
+        pipeline.run((os.path.basename(f).split('_')[-1].split('.')[0], f) for f in json_files)
+    finally:
+        manifest.close()
+    pipeline.report()
+    return pipeline.pdf_paths
@@ -0,0 +1,194 @@
+import os
+import random
+import threading
+import time
+
+# Groq quota defaults (llama3-70b-8192 free tier); override with environment variables
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 6000
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_RETRIES = 5
+
+# Requests reserve their prompt plus the completion recent responses actually used (as a share of
+# max_tokens, with this much headroom) rather than the whole max_tokens budget
+COMPLETION_MARGIN = 1.25
+COMPLETION_SMOOTHING = 0.2
+
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+# Token bucket refilled continuously at `per_minute` units per minute
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Take `amount` units and return how long the caller must wait before using them
+    def reserve(self, amount):
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    # Give back units that were reserved but not used (e.g. estimate > actual usage)
+    def refund(self, amount):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def available(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+def estimate_tokens(prompt, max_tokens, completion_share=1.0):
+    # ~4 characters per token for English text, plus the expected part of the completion budget
+    return len(prompt) // 4 + min(max_tokens, int(max_tokens * completion_share) + 1)
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_retryable(error):
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+# Shared limiter: RPM/TPM budgets, a cap on in-flight requests, retries with full-jitter backoff
+class RateLimiter:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_retries=DEFAULT_MAX_RETRIES, base_delay=1.0, max_delay=60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.usage_lock = threading.Lock()
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.completion_share = None  # moving average of completion_tokens / max_tokens
+
+    # Wait for budget; with a `deadline` (time.monotonic()) give the budget back and raise if it would be missed
+    def acquire(self, estimated_tokens=0, deadline=None):
+        wait = self.requests.reserve(1)
+        if self.tokens is not None and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self.requests.refund(1)
+            if self.tokens is not None and estimated_tokens:
+                self.tokens.refund(estimated_tokens)
+            raise TimeoutError(f"rate limit wait of {wait:.1f}s exceeds the deadline")
+        if wait > 0:
+            time.sleep(wait)
+
+    # Requests that could start now without waiting for budget (used to hold back queued prompts)
+    def headroom(self, estimated_tokens=0):
+        room = self.requests.available()
+        if self.tokens is not None and estimated_tokens:
+            room = min(room, self.tokens.available() / estimated_tokens)
+        return max(0, int(room))
+
+    def backoff(self, attempt, retry_after=0.0):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after)
+
+    # Tokens to reserve for a request; the full max_tokens until a response has reported its usage
+    def estimate(self, prompt, max_tokens):
+        with self.usage_lock:
+            share = self.completion_share
+        if share is None:
+            return estimate_tokens(prompt, max_tokens)
+        return estimate_tokens(prompt, max_tokens, share * COMPLETION_MARGIN)
+
+    def _settle(self, estimated_tokens, response, max_tokens=None):
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        with self.usage_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self.usage["completion_tokens"] += completion or 0
+            if completion is not None and max_tokens:
+                share = min(completion / max_tokens, 1.0)
+                previous = self.completion_share
+                self.completion_share = share if previous is None else \
+                    previous + COMPLETION_SMOOTHING * (share - previous)
+        if self.tokens is not None and used is not None:
+            if used < estimated_tokens:
+                self.tokens.refund(estimated_tokens - used)
+            elif used > estimated_tokens:
+                self.tokens.reserve(used - estimated_tokens)  # a longer reply than estimated delays later calls
+
+    # Completed requests and the tokens they reported, for throughput measurements
+    def usage_snapshot(self):
+        with self.usage_lock:
+            return dict(self.usage)
+
+    # Call `fn` under the limiter, retrying 429 and 5xx responses until `deadline` (if given)
+    def call(self, fn, *args, estimated_tokens=0, deadline=None, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens, deadline)
+            with self.in_flight:
+                try:
+                    response = fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    error = e
+                else:
+                    self._settle(estimated_tokens, response, kwargs.get("max_tokens"))
+                    return response
+            # A rejected attempt produced no completion: give its token reservation back before the retry re-reserves
+            if self.tokens is not None and estimated_tokens:
+                self.tokens.refund(estimated_tokens)
+            delay = self.backoff(attempt, _retry_after(error))
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise error
+            print(f"⏳ LLM call failed ({_status_code(error) or type(error).__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+# Process-wide limiter configured from GROQ_RPM, GROQ_TPM, GROQ_MAX_IN_FLIGHT and GROQ_MAX_RETRIES
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=int(os.getenv("GROQ_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=int(os.getenv("GROQ_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+                max_in_flight=int(os.getenv("GROQ_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+                max_retries=int(os.getenv("GROQ_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            )
+        return _limiter
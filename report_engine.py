@@ -0,0 +1,297 @@
+import os
+import threading
+from collections import OrderedDict
+
+from chart_renderer import draw_chart_vector
+
+LOGO_WIDTH = 30
+CHART_WIDTH = 100
+CHART_HEIGHT = 60
+CHART_GAP = 5
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", 64))
+ROW_HEIGHT = 8
+SKIP_FIRST_LINE = "Here is the student performance feedback:"
+FOOTER_TEXT = "MathonGo IIT JEE Prep"
+
+
+# Column geometry for one report table, fixed once per template
+class TableLayout:
+    def __init__(self, title, widths):
+        self.title = title
+        self.widths = widths
+        self.offsets = [sum(widths[:i]) for i in range(len(widths))]
+
+
+TABLES = {
+    "subject": TableLayout("Subject-Wise Performance", [40, 30, 30, 30, 30, 40]),
+    "weak": TableLayout("Chapter-Wise Performance (Weak Areas)", [50, 30, 30, 30, 30, 40]),
+    "cohort": TableLayout("Compared with the Cohort", [70, 40, 40, 30]),
+    "progress": TableLayout("Progress Since the Last Test", [50, 28, 28, 28, 28, 18]),
+}
+
+
+# Split feedback markdown into (kind, text) blocks: heading, bullet, numbered, paragraph or blank
+def classify_line(line):
+    line = line.strip()
+    if not line:
+        return "blank", ""
+    if line.startswith('**') and line.endswith('**'):
+        return "heading", line.strip('**')
+    if line.startswith('* '):
+        return "bullet", line[2:].strip()
+    if line[:2].isdigit() and line[2:3] and line[2] in '. )':
+        return "numbered", line
+    return "paragraph", line
+
+
+def feedback_blocks(text):
+    lines = text.split('\n')
+    if lines and lines[0].strip() == SKIP_FIRST_LINE:
+        lines = lines[1:]
+    return [classify_line(line) for line in lines]
+
+
+# feedback_blocks for text that arrives in pieces: feed() returns the blocks whose line is complete,
+# close() the rest. Fed the whole text, it yields exactly what feedback_blocks(text) does.
+class FeedbackStream:
+    def __init__(self):
+        self.buffer = ""
+        self.first = True
+        self.text = []
+
+    def feed(self, chunk):
+        self.text.append(chunk)
+        self.buffer += chunk
+        if "\n" not in self.buffer:
+            return []
+        *lines, self.buffer = self.buffer.split("\n")
+        return self._blocks(lines)
+
+    def close(self):
+        lines, self.buffer = [self.buffer], ""
+        return self._blocks(lines)
+
+    def _blocks(self, lines):
+        if self.first and lines:
+            self.first = False
+            if lines[0].strip() == SKIP_FIRST_LINE:
+                lines = lines[1:]
+        return [classify_line(line) for line in lines]
+
+
+def write_block(pdf, kind, text):
+    if kind == "blank":
+        pdf.ln(6)
+    elif kind == "heading":
+        pdf.set_font("Helvetica", 'B', 13)
+        pdf.cell(0, 8, text, new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", size=11)
+        pdf.ln(3)
+    elif kind in ("bullet", "numbered"):
+        pdf.cell(10)
+        pdf.multi_cell(0, 6, text)
+        pdf.ln(1)
+    else:
+        pdf.multi_cell(0, 6, text)
+        pdf.ln(3)
+
+
+# Static report layout compiled once per process; each student only fills in rows and text
+class ReportTemplate:
+    def __init__(self, base_path, tables=TABLES):
+        self.logo_path = os.path.join(base_path, "mathongo_logo.jpeg")
+        self.tables = tables
+        self.images = OrderedDict()
+        self.images_lock = threading.Lock()
+        self.logo = self._parse_image(self.logo_path)
+
+    # Decode an image file once and keep fpdf2's parsed result (compressed stream, size, palette),
+    # keyed by path and modification so a rewritten file is parsed again. Returns None if unreadable.
+    def _parse_image(self, path):
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.images_lock:
+            if key in self.images:
+                self.images.move_to_end(key)
+                return self.images[key]
+        from fpdf.image_datastructures import ImageCache
+        from fpdf.image_parsing import preload_image
+        cache = ImageCache()
+        try:
+            _, _, info = preload_image(cache, path)
+        except Exception:
+            return None
+        iccp = next((profile for profile, i in cache.icc_profiles.items() if i == info.get("iccp_i")), None)
+        parsed = (f"{path}:{stat.st_mtime_ns}", info, iccp)
+        with self.images_lock:
+            self.images[key] = parsed
+            while len(self.images) > IMAGE_CACHE_SIZE:
+                self.images.popitem(last=False)
+        return parsed
+
+    # Place a parsed image, registering a copy of its info with the document the first time it is used there
+    def _place_image(self, pdf, parsed, **kwargs):
+        name, info, iccp = parsed
+        images = pdf.image_cache.images
+        if name not in images:
+            info = type(info)(info)
+            info["i"] = len(images) + 1
+            info["usages"] = 0
+            if iccp is not None:
+                info["iccp_i"] = pdf.image_cache.icc_profiles.setdefault(iccp, len(pdf.image_cache.icc_profiles))
+            images[name] = info
+        return pdf.image(name, **kwargs)
+
+    def _add_logo(self, pdf):
+        try:
+            if self.logo is None:
+                raise FileNotFoundError(self.logo_path)
+            self._place_image(pdf, self.logo, x=pdf.w - LOGO_WIDTH - 15, y=10, w=LOGO_WIDTH)
+        except Exception:
+            pdf.set_font("Helvetica", 'I', 10)
+            pdf.cell(0, 10, "MathonGo Logo Placeholder", ln=True, align="R")
+        pdf.ln(25)
+
+    def start_report(self, student_id, pdf=None):
+        if pdf is None:
+            from fpdf import FPDF
+            pdf = FPDF()
+            pdf.set_title(f"Student {student_id} Performance Report")
+            pdf.set_author("MathonGo AI System")
+        pdf.add_page()
+        pdf.set_margins(left=15, top=15, right=15)
+        pdf.set_auto_page_break(auto=True, margin=15)
+        self._add_logo(pdf)
+        pdf.set_font("Helvetica", 'B', 16)
+        pdf.cell(0, 10, f"Performance Report - Student {student_id}", ln=True, align="C")
+        pdf.ln(10)
+        return pdf
+
+    # Render a table from column arrays (header list + one list per column)
+    def table(self, pdf, name, headers, columns):
+        layout = self.tables[name]
+        widths = layout.widths
+        pdf.set_font("Helvetica", 'B', 12)
+        pdf.set_fill_color(200, 220, 255)
+        pdf.cell(0, 10, layout.title, border=1, ln=True, fill=True)
+        pdf.set_font("Helvetica", size=10)
+        for width, header in zip(widths, headers):
+            pdf.cell(width, ROW_HEIGHT, header, border=1)
+        pdf.ln()
+        # Body rows are drawn as rectangles + text, skipping cell()'s per-call line layout machinery
+        x0 = pdf.l_margin
+        offsets = [x0 + offset for offset in layout.offsets]
+        for row in zip(*columns):
+            if pdf.get_y() + ROW_HEIGHT > pdf.page_break_trigger:
+                pdf.add_page()
+            y = pdf.get_y()
+            baseline = y + ROW_HEIGHT / 2 + 0.3 * pdf.font_size
+            for x, width, value in zip(offsets, widths, row):
+                pdf.rect(x, y, width, ROW_HEIGHT)
+                pdf.text(x + pdf.c_margin, baseline, str(value))
+            pdf.set_xy(x0, y + ROW_HEIGHT)
+        pdf.ln(5)
+
+    def frame_table(self, pdf, name, df):
+        self.table(pdf, name, list(df.columns), [df[col].tolist() for col in df.columns])
+
+    def chart(self, pdf, subject_df, chart_path, vector=False):
+        try:
+            if vector:
+                height = CHART_HEIGHT
+            else:
+                parsed = self._parse_image(chart_path)
+                if parsed is None:
+                    raise FileNotFoundError(chart_path)
+                height = parsed[1].size_in_document_units(CHART_WIDTH, 0, scale=pdf.k)[1]
+            # Keep the title and chart together, then advance past what was actually drawn:
+            # the gap above the chart, its height and the same gap below
+            if pdf.get_y() + 10 + height + 2 * CHART_GAP > pdf.page_break_trigger:
+                pdf.add_page()
+            pdf.set_font("Helvetica", 'B', 12)
+            pdf.cell(0, 10, "Time vs. Accuracy by Subject", ln=True)
+            if vector:
+                draw_chart_vector(pdf, subject_df, x=15, y=pdf.get_y() + CHART_GAP, w=CHART_WIDTH, h=height)
+            else:
+                self._place_image(pdf, parsed, x=15, y=pdf.get_y() + CHART_GAP, w=CHART_WIDTH)
+            pdf.ln(height + 2 * CHART_GAP)
+        except Exception:
+            pdf.set_font("Helvetica", 'I', 10)
+            pdf.cell(0, 10, "Chart not available", ln=True)
+
+    def feedback(self, pdf, text):
+        pdf.set_font("Helvetica", size=11)
+        for kind, block in feedback_blocks(text):
+            write_block(pdf, kind, block)
+
+    def footer(self, pdf):
+        pdf.set_font("Helvetica", size=8)
+        pdf.set_y(-15)
+        pdf.cell(0, 10, f"Page {pdf.page_no()} - {FOOTER_TEXT}", align="C")
+
+    # Everything above the feedback text: header, tables and chart
+    def start_body(self, student_id, subject_df, weak_df, chart_path, cohort_df=None, vector_chart=False,
+                   pdf=None, progress_df=None):
+        pdf = self.start_report(student_id, pdf)
+        self.frame_table(pdf, "subject", subject_df)
+        self.frame_table(pdf, "weak", weak_df)
+        if cohort_df is not None and not cohort_df.empty:
+            self.frame_table(pdf, "cohort", cohort_df)
+        if progress_df is not None and not progress_df.empty:
+            self.frame_table(pdf, "progress", progress_df)
+        self.chart(pdf, subject_df, chart_path, vector_chart)
+        return pdf
+
+    # Lay out a full report; pass `pdf` to append it to an existing document
+    def render(self, student_id, text, subject_df, weak_df, chart_path, cohort_df=None, vector_chart=False,
+               pdf=None, progress_df=None):
+        pdf = self.start_body(student_id, subject_df, weak_df, chart_path, cohort_df, vector_chart, pdf, progress_df)
+        self.feedback(pdf, text)
+        self.footer(pdf)
+        return pdf
+
+
+# A report laid out while its feedback is still being generated: header, tables and chart go in first,
+# then each feedback block as soon as its line is complete
+class ProgressiveReport:
+    def __init__(self, template, student_id, subject_df, weak_df, chart_path, cohort_df=None, vector_chart=False,
+                 progress_df=None):
+        self.template = template
+        self.parser = FeedbackStream()
+        self.pdf = template.start_body(student_id, subject_df, weak_df, chart_path, cohort_df, vector_chart,
+                                       progress_df=progress_df)
+        self.pdf.set_font("Helvetica", size=11)
+
+    # Lay out the blocks completed by `chunk` and return them
+    def feed(self, chunk):
+        blocks = self.parser.feed(chunk)
+        for kind, text in blocks:
+            write_block(self.pdf, kind, text)
+        return blocks
+
+    @property
+    def text(self):
+        return "".join(self.parser.text)
+
+    # Lay out the last block and the footer; returns (remaining blocks, pdf)
+    def finish(self):
+        blocks = self.parser.close()
+        for kind, text in blocks:
+            write_block(self.pdf, kind, text)
+        self.template.footer(self.pdf)
+        return blocks, self.pdf
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+# One compiled template per base path and process
+def get_report_template(base_path):
+    with _templates_lock:
+        if base_path not in _templates:
+            _templates[base_path] = ReportTemplate(base_path)
+        return _templates[base_path]
@@ -0,0 +1,104 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+# Tables stored per student in a batch file; columns are prefixed with the table name
+TABLES = ("subject", "chapter", "weak")
+STUDENT_COLUMNS = ("chart_path", "feedback")
+
+
+# Everything Task 1 produces for one student, handed in memory to Task 2 and Task 3
+@dataclass
+class StudentResult:
+    student_id: str
+    overall: dict
+    subject_df: pd.DataFrame
+    chapter_df: pd.DataFrame
+    weak_df: pd.DataFrame
+    chart_path: Optional[str] = None
+    feedback: Optional[str] = None
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("Batch result files need pyarrow: pip install pyarrow") from None
+
+
+# Flatten a batch into one long table: a "student" row per student plus one row per table row
+def results_frame(results):
+    frames = []
+    for result in results:
+        student = {f"overall.{k}": v for k, v in result.overall.items()}
+        student.update({col: getattr(result, col) for col in STUDENT_COLUMNS})
+        frames.append(_nullable(pd.DataFrame([student])).assign(**{"Student ID": result.student_id, "Table": "student"}))
+        for table in TABLES:
+            df = getattr(result, f"{table}_df")
+            frames.append(_nullable(df).add_prefix(f"{table}.").assign(**{"Student ID": result.student_id, "Table": table}))
+    if not frames:
+        return pd.DataFrame(columns=["Student ID", "Table"])
+    df = pd.concat(frames, ignore_index=True)
+    df["Table"] = df["Table"].astype("category")
+    return df
+
+
+# Nullable integer/bool columns survive the long table without turning into floats or objects
+def _nullable(df):
+    return df.convert_dtypes(convert_string=False, convert_floating=False)
+
+
+def _table(group, prefix):
+    cols = [c for c in group.columns if c.startswith(prefix)]
+    df = group[cols].rename(columns=lambda c: c[len(prefix):]).reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype in ("Int64", "boolean") and not df[col].isna().any():
+            df[col] = df[col].astype(df[col].dtype.numpy_dtype)
+    return df
+
+
+# Rebuild StudentResults from the long table, splitting it once per table rather than per student
+def frame_results(df):
+    by_table = {table: dict(tuple(group.groupby("Student ID", sort=False)))
+                for table, group in df.groupby("Table", observed=True)}
+    results = []
+    for student_id, row in by_table.get("student", {}).items():
+        record = {c: row[c].iloc[0] for c in row.columns}
+        overall = {c[len("overall."):]: v.item() if hasattr(v, "item") else v
+                   for c, v in record.items() if c.startswith("overall.") and pd.notna(v)}
+        tables = {}
+        for table in TABLES:
+            group = by_table.get(table, {}).get(student_id)
+            tables[table] = _table(group, f"{table}.") if group is not None else pd.DataFrame()
+        results.append(StudentResult(
+            student_id=str(student_id),
+            overall=overall,
+            subject_df=tables["subject"],
+            chapter_df=tables["chapter"],
+            weak_df=tables["weak"],
+            chart_path=record["chart_path"] if pd.notna(record["chart_path"]) else None,
+            feedback=record["feedback"] if pd.notna(record["feedback"]) else None,
+        ))
+    return results
+
+
+# Write a whole batch as one columnar file: Parquet for .parquet, Arrow IPC (Feather) otherwise
+def save_results(results, path):
+    _require_pyarrow()
+    df = results_frame(results)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_feather(path, compression="zstd")
+    print(f"Saved {len(results)} student results to {path}")
+    return path
+
+
+# One bulk read for a whole cohort
+def load_results(path):
+    _require_pyarrow()
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_feather(path)
+    return frame_results(df)
@@ -0,0 +1,285 @@
+import gzip
+import importlib.util
+import json
+import os
+import types
+import typing
+
+from submission_stream import GZIP_MAGIC, iter_records, prune_submission
+
+# msgspec and orjson are optional and only imported on first use, so importing main stays cheap
+HAS_MSGSPEC = importlib.util.find_spec("msgspec") is not None
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+# "msgspec" parses per-student files straight into the typed models in C, skipping every other field;
+# "orjson" and "python" parse the whole file (with orjson or json) and copy the modelled fields out with
+# the validator below, which also lists every mismatch when a file does not match
+SUBMISSION_DECODER = os.getenv("SUBMISSION_DECODER",
+                               "msgspec" if HAS_MSGSPEC else "orjson" if HAS_ORJSON else "python")
+MAX_ERRORS = 20
+NUMBER = (int, float)
+
+
+# A field of a submission model. Optional fields may be missing; nullable ones may also be null.
+class Field:
+    def __init__(self, kind, required=False, nullable=False):
+        self.kind = kind
+        self.required = required
+        self.nullable = nullable
+
+
+# A JSON object with the fields the analytics read; every other key is skipped while decoding
+class Model:
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+
+class ListOf:
+    def __init__(self, item):
+        self.item = item
+
+
+# Only the fields some stage reads: overall/subject metrics, chapter stats, label stats, the item index,
+# history keys, the test a submission belongs to. Question bodies are dropped while reading, or replaced by
+# their fingerprint when an item index needs them (prune_submission).
+OBJECT_ID = Model("ObjectId", **{"$oid": Field(str, required=True)})
+LABEL = Model("Label", title=Field(str, required=True))
+QUESTION_REF = Model("QuestionRef", chapters=Field(ListOf(LABEL)), topics=Field(ListOf(LABEL)),
+                     concepts=Field(ListOf(LABEL)), level=Field(str), fingerprint=Field(int))
+MARKED_OPTION = Model("MarkedOption", optionId=Field(str, nullable=True), isCorrect=Field(bool))
+INPUT_VALUE = Model("InputValue", value=Field((str, int, float), nullable=True), isCorrect=Field(bool, nullable=True))
+QUESTION = Model("Question", questionId=Field(QUESTION_REF), status=Field(str),
+                 timeTaken=Field(NUMBER, nullable=True), timeLeftWhenAttempted=Field(NUMBER, nullable=True),
+                 markedOptions=Field(ListOf(MARKED_OPTION), nullable=True),
+                 inputValue=Field(INPUT_VALUE, nullable=True))
+SECTION = Model("Section", questions=Field(ListOf(QUESTION)))
+SUBJECT = Model("Subject", subjectId=Field(OBJECT_ID, required=True), totalMarkScored=Field(NUMBER),
+                totalAttempted=Field(int), totalCorrect=Field(int), accuracy=Field(NUMBER),
+                totalTimeTaken=Field(NUMBER))
+TEST = Model("Test", _id=Field(OBJECT_ID), totalTime=Field(NUMBER, nullable=True),
+             totalQuestions=Field(int, nullable=True), totalMarks=Field(NUMBER, nullable=True))
+SUBMISSION = Model("Submission", _id=Field(OBJECT_ID), test=Field(TEST), subjects=Field(ListOf(SUBJECT)),
+                   sections=Field(ListOf(SECTION)), totalTimeTaken=Field(NUMBER, required=True),
+                   totalMarkScored=Field(NUMBER, required=True), totalAttempted=Field(int, required=True),
+                   totalCorrect=Field(int, required=True), accuracy=Field(NUMBER, required=True))
+
+# The same models keeping question text, for decoding straight from a file when an item index needs
+# question fingerprints
+QUESTION_BODY = Model("QuestionBody", text=Field(str, nullable=True))
+QUESTION_REF_WITH_BODY = Model("QuestionRefWithBody", question=Field(QUESTION_BODY, nullable=True),
+                               **QUESTION_REF.fields)
+QUESTION_WITH_BODY = Model("QuestionWithBody", **dict(QUESTION.fields, questionId=Field(QUESTION_REF_WITH_BODY)))
+SECTION_WITH_BODY = Model("SectionWithBody", questions=Field(ListOf(QUESTION_WITH_BODY)))
+SUBMISSION_WITH_BODY = Model("SubmissionWithBody",
+                             **dict(SUBMISSION.fields, sections=Field(ListOf(SECTION_WITH_BODY))))
+
+
+# A submission file that does not match the models; `errors` lists every (path, message) found
+class SubmissionError(ValueError):
+    def __init__(self, source, errors):
+        self.source = source
+        self.errors = errors
+        shown = "; ".join(f"{path}: {message}" for path, message in errors[:3])
+        more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ""
+        super().__init__(f"{source}: {len(errors)} invalid field(s): {shown}{more}")
+
+
+def _type_name(value):
+    return "null" if value is None else {dict: "object", list: "array", str: "str", bool: "bool", int: "int",
+                                         float: "float"}.get(type(value), type(value).__name__)
+
+
+def _kind_name(kind):
+    if isinstance(kind, Model):
+        return "object"
+    if isinstance(kind, ListOf):
+        return "array"
+    return " or ".join(k.__name__ for k in (kind if isinstance(kind, tuple) else (kind,)))
+
+
+# JSON path of a (parent, key) chain, only built when there is an error to report
+def _path(at):
+    parts = []
+    while isinstance(at, tuple):
+        at, key = at
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return at + "".join(reversed(parts))
+
+
+# Turn a model into a function (value, at, errors) -> copy of its modelled fields, appending
+# (path, message) to `errors` for each mismatch. Compiled once, so validating does no schema dispatch.
+def _compile(kind):
+    if isinstance(kind, Model):
+        fields = [(name, field.required, field.nullable, _compile(field.kind)) for name, field in kind.fields.items()]
+
+        def check_model(value, at, errors):
+            if type(value) is not dict:
+                errors.append((_path(at), f"expected object, got {_type_name(value)}"))
+                return None
+            out = {}
+            for name, required, nullable, check in fields:
+                if name in value:
+                    item = value[name]
+                    out[name] = None if item is None and nullable else check(item, (at, name), errors)
+                elif required:
+                    errors.append((_path((at, name)), "missing required field"))
+            return out
+        return check_model
+    if isinstance(kind, ListOf):
+        check_item = _compile(kind.item)
+
+        def check_list(value, at, errors):
+            if type(value) is not list:
+                errors.append((_path(at), f"expected array, got {_type_name(value)}"))
+                return None
+            return [check_item(item, (at, i), errors) for i, item in enumerate(value)]
+        return check_list
+    # Exact type checks: bool is an int subclass, but true/false is never a valid count or time
+    types = kind if isinstance(kind, tuple) else (kind,)
+    expected = _kind_name(kind)
+
+    def check_value(value, at, errors):
+        if type(value) not in types:
+            errors.append((_path(at), f"expected {expected}, got {_type_name(value)}"))
+        return value
+    return check_value
+
+
+_check_submission = _compile(SUBMISSION)
+_check_submission_with_body = _compile(SUBMISSION_WITH_BODY)
+
+
+# Check an already-parsed submission (e.g. one value of a stream) against the models;
+# returns a copy holding only the modelled fields
+def validate_submission(value, source="submission", path="$", decoder=None):
+    if (decoder or SUBMISSION_DECODER) == "msgspec":
+        import msgspec
+        try:
+            return msgspec.convert(value, _msgspec_type_cached())
+        except msgspec.ValidationError:
+            pass  # msgspec stops at the first mismatch; the walk below reports all of them
+    errors = []
+    data = _check_submission(value, path, errors)
+    if errors:
+        raise SubmissionError(source, errors[:MAX_ERRORS])
+    return data
+
+
+# Required fields go in a total TypedDict and the rest in a total=False subclass, which works on every
+# Python version msgspec supports (typing.Required is 3.11+)
+def _msgspec_type(kind):
+    if isinstance(kind, Model):
+        required, optional = {}, {}
+        for name, field in kind.fields.items():
+            annotation = _msgspec_type(field.kind)
+            if field.nullable:
+                annotation = typing.Optional[annotation]
+            (required if field.required else optional)[name] = annotation
+        base = typing.TypedDict(f"{kind.name}Required", required)
+        return types.new_class(kind.name, (base,), {"total": False},
+                               lambda ns: ns.update(__annotations__=optional))
+    if isinstance(kind, ListOf):
+        return typing.List[_msgspec_type(kind.item)]
+    if isinstance(kind, tuple):
+        return typing.Union[kind]
+    return kind
+
+
+_msgspec_types = {}
+
+
+# TypedDicts convert to plain dicts, so the extractors read msgspec and fallback output the same way
+def _msgspec_type_cached(model=SUBMISSION):
+    if model.name not in _msgspec_types:
+        _msgspec_types[model.name] = _msgspec_type(model)
+    return _msgspec_types[model.name]
+
+
+_file_decoders = {}
+
+
+# A per-student file holds one submission, usually wrapped in a list
+def _file_decoder(fingerprint):
+    if fingerprint not in _file_decoders:
+        import msgspec
+        submission = _msgspec_type_cached(SUBMISSION_WITH_BODY if fingerprint else SUBMISSION)
+        _file_decoders[fingerprint] = msgspec.json.Decoder(typing.Union[typing.List[submission], submission])
+    return _file_decoders[fingerprint]
+
+
+# Validated submissions from a path or stream, read one at a time by submission_stream.iter_records
+# (a JSON array, a single object or JSON Lines, optionally gzipped). Error paths start at the record,
+# e.g. `$[2].sections[0]...`. With skip_invalid, bad records (malformed JSON included) are reported
+# and skipped instead of raising.
+def iter_valid_submissions(source, skip_invalid=False, decoder=None, fingerprint=False):
+    name = os.path.basename(source) if isinstance(source, (str, os.PathLike)) else "stream"
+
+    def malformed(i, error):
+        invalid = SubmissionError(name, [(f"$[{i}]", f"invalid JSON: {error}")])
+        if not skip_invalid:
+            raise invalid from error
+        report_invalid(f"record {i} of {name}", invalid)
+
+    for i, value in iter_records(source, fingerprint=fingerprint, on_error=malformed):
+        try:
+            yield validate_submission(value, name, ("$", i), decoder)
+        except SubmissionError as e:
+            if not skip_invalid:
+                raise
+            report_invalid(f"record {i} of {name}", e)
+
+
+def report_invalid(what, error):
+    print(f"Invalid submission ({what}):")
+    for path, message in error.errors:
+        print(f"   {path}: {message}")
+
+
+def _read_bytes(file_path):
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    return gzip.decompress(raw) if raw[:2] == GZIP_MAGIC else raw
+
+
+# Decode a whole per-student file at once, keeping only the modelled fields; None when the file is
+# not a single valid submission (JSON Lines, malformed JSON, schema errors)
+def _decode_file(raw, decoder, fingerprint):
+    if decoder == "msgspec":
+        import msgspec
+        try:
+            value = _file_decoder(fingerprint).decode(raw)
+        except msgspec.DecodeError:
+            return None
+    else:
+        try:
+            if decoder == "orjson":
+                import orjson
+                value = orjson.loads(raw)
+            else:
+                value = json.loads(raw)
+        except ValueError:
+            return None
+        if isinstance(value, list) and value:
+            value = value[0]
+        errors = []
+        value = (_check_submission_with_body if fingerprint else _check_submission)(value, "$", errors)
+        if errors:
+            return None
+    if isinstance(value, list):
+        if not value:
+            return None
+        value = value[0]
+    return prune_submission(value, fingerprint=fingerprint) if fingerprint else value
+
+
+# The first submission of a per-student file. The bytes are decoded in one go with only the modelled
+# fields kept; anything else (JSON Lines, malformed JSON, schema errors) goes through the stream reader
+# and the validator for its error report.
+def load_submission(file_path, decoder=None, fingerprint=False):
+    decoder = decoder or SUBMISSION_DECODER
+    data = _decode_file(_read_bytes(file_path), decoder, fingerprint)
+    if data is not None:
+        return data
+    for data in iter_valid_submissions(file_path, decoder=decoder, fingerprint=fingerprint):
+        return data
+    raise SubmissionError(os.path.basename(file_path), [("$", "no submission in file")])
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+
+CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+# A value still incomplete after this many characters is reported as invalid rather than buffered further
+MAX_RECORD_SIZE = int(os.getenv("MAX_RECORD_SIZE", 32 * 1024 * 1024))
+# A parse error this close to the end of the buffer may just be a value cut off by the chunk boundary
+CUT_MARGIN = 64
+
+_STRUCTURE = re.compile(r'[{}\[\]",]')
+_STRING_END = re.compile(r'["\\\n]')
+
+_decoder = json.JSONDecoder()
+
+
+# Open a path or binary/text stream as text, transparently un-gzipping it
+def open_text(source):
+    if isinstance(source, (str, os.PathLike)):
+        source = open(source, "rb")
+    if isinstance(source, io.TextIOBase):
+        return source
+    if not hasattr(source, "peek"):
+        source = io.BufferedReader(source)
+    if source.peek(2)[:2] == GZIP_MAGIC:
+        source = gzip.GzipFile(fileobj=source)
+    return io.TextIOWrapper(source, encoding="utf-8")
+
+
+# Stable 64-bit id for a question across submissions: a hash of its whitespace-normalised text,
+# or of its tags when the text is missing
+def question_fingerprint(qid):
+    if "fingerprint" in qid:
+        return qid["fingerprint"]
+    text = (qid.get("question") or {}).get("text")
+    if text:
+        key = re.sub(r"\s+", " ", text).strip()
+    else:
+        key = json.dumps([qid.get("chapters"), qid.get("topics"), qid.get("concepts"), qid.get("level")],
+                         sort_keys=True)
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# A question counts as correct when a marked option is correct or, for numeric-answer questions,
+# when inputValue.isCorrect is set
+def question_correct(q):
+    if any(opt.get("isCorrect", False) for opt in q.get("markedOptions") or []):
+        return True
+    return bool((q.get("inputValue") or {}).get("isCorrect"))
+
+
+# Drop subtrees the analytics never read (question HTML bodies, syllabus markup).
+# With `fingerprint`, a question's body is replaced by its fingerprint so it can still be matched
+# against the item index; hashing every body is only worth it when an index is in use.
+def prune_submission(data, keep_question=False, fingerprint=False):
+    if not isinstance(data, dict):
+        return data  # left for the schema check to report
+    data.get("test", {}).pop("syllabus", None)
+    if not keep_question:
+        for section in data.get("sections", []):
+            for q in section.get("questions", []):
+                qid = q.get("questionId", {})
+                if "question" in qid:
+                    if fingerprint:
+                        qid["fingerprint"] = question_fingerprint(qid)
+                    del qid["question"]
+    return data
+
+
+def _first_char(stream):
+    while True:
+        c = stream.read(1)
+        if not c or not c.isspace():
+            return c
+
+
+def _read(stream, buf, pos, size):
+    chunk = stream.read(size)
+    return buf[pos:] + chunk, 0, not chunk
+
+
+def _error(msg, buf, start, at):
+    # Positions are reported relative to the start of the record, not of the read buffer
+    return json.JSONDecodeError(msg, buf[start:at], at - start)
+
+
+# Skip the rest of a JSON Lines record: resume at the next line that starts a new object
+def _skip_line(stream, buf, pos):
+    while True:
+        found = buf.find("\n{", pos)
+        if found >= 0:
+            return buf, found + 1, False
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return "", 0, True
+        buf, pos = buf[-1:] + chunk, 0
+
+
+# Skip the rest of an array element by matching brackets outside strings; text already scanned is
+# dropped, so a huge or unterminated element is skipped in constant memory. JSON strings never span
+# lines, so a line break inside one means the element was cut short: a line starting with "{" is then
+# taken as the next element.
+def _skip_element(stream, buf, pos):
+    depth, in_string = 0, False
+    while True:
+        if pos >= len(buf):
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                return "", 0, True
+            buf, pos = chunk, pos - len(buf)
+            continue
+        if in_string:
+            match = _STRING_END.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                continue
+            c, pos = match.group(), match.end()
+            if c == "\n":
+                in_string = False
+                if buf[pos:pos + 1] == "{":
+                    return buf, pos, False
+            elif c == "\\":
+                pos += 1
+            else:
+                in_string = False
+            continue
+        match = _STRUCTURE.search(buf, pos)
+        if match is None:
+            pos = len(buf)
+            continue
+        c, pos = match.group(), match.end()
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth < 0:
+                return buf, pos - 1, False  # the closing bracket of the array itself
+            if depth == 0:
+                return buf, pos, False
+        elif depth == 0:
+            return buf, pos, False
+
+
+# Values of a JSON array, a single value or JSON Lines, decoded straight from the read buffer.
+# A value that fails to parse is passed to on_error(index, error), or raised without it; reading
+# then resumes at the next array element, or at the next line starting with "{".
+def _iter_values(stream, on_error=None):
+    first = _first_char(stream)
+    in_array = first == "["
+    buf, pos, eof = ("" if in_array else first), 0, not first
+    index = 0
+    while True:
+        # Skip whitespace and array punctuation between values
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos, eof = _read(stream, buf, pos, CHUNK_SIZE)
+        if pos >= len(buf) or (in_array and buf[pos] == "]"):
+            return
+        try:
+            value, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            size = len(buf) - pos
+            cut = e.msg.startswith("Unterminated string") or e.pos >= len(buf) - CUT_MARGIN
+            if cut and not eof and size < MAX_RECORD_SIZE:
+                # Most likely cut off by the end of the buffer: read as much again and retry
+                buf, pos, eof = _read(stream, buf, pos, max(CHUNK_SIZE, size))
+                continue
+            if cut and not eof:
+                error = _error(f"Value larger than {MAX_RECORD_SIZE} characters", buf, pos, pos)
+            else:
+                error = _error(e.msg, buf, pos, e.pos)
+            if on_error is None:
+                raise error
+            on_error(index, error)
+            index += 1
+            buf, pos, eof = _skip_element(stream, buf, pos) if in_array else _skip_line(stream, buf, pos + 1)
+            continue
+        yield index, value
+        index += 1
+        pos = end
+
+
+# Drop the wrappers open_text put around a caller's stream, leaving the stream itself open
+def _release(stream, source):
+    layer = stream.detach()
+    if isinstance(layer, gzip.GzipFile):
+        inner = layer.fileobj
+        layer.close()  # does not close a fileobj it was handed
+        layer = inner
+    if layer is not source and isinstance(layer, io.BufferedReader):
+        layer.detach()
+
+
+# (position, submission) pairs from a JSON array, a single object or JSON Lines (optionally gzipped).
+# Positions count malformed records too, which go to on_error(position, JSONDecodeError) when given.
+def iter_records(source, keep_question=False, fingerprint=False, on_error=None):
+    owned = isinstance(source, (str, os.PathLike))
+    stream = open_text(source)
+    try:
+        for index, value in _iter_values(stream, on_error):
+            yield index, prune_submission(value, keep_question, fingerprint)
+    finally:
+        if owned:
+            stream.close()
+        elif stream is not source:
+            _release(stream, source)
+
+
+# Yield submissions one at a time from a JSON array, a single object or JSON Lines (optionally gzipped)
+def iter_submissions(source, keep_question=False, fingerprint=False):
+    for _, data in iter_records(source, keep_question, fingerprint):
+        yield data
+
+
+# Stable identifier for a submission taken from an export rather than a per-student file
+def submission_id(data, fallback):
+    return data.get("_id", {}).get("$oid") or fallback
@@ -1,19 +1,20 @@
-import json
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 
+from chart_renderer import get_chart_renderer
+from results import StudentResult, save_results
+from submission_schema import load_submission
+from submission_stream import question_correct
+
 # Configurable base path (replace with your own directory)
 BASE_PATH = "PATH_TO_YOUR_DATA_DIRECTORY"  # e.g., "/home/user/mathango_data" or "C:\\Users\\user\\Documents\\mathango_data"
 DATA_DIR = os.path.join(BASE_PATH, "data")
 OUTPUT_DIR = os.path.join(BASE_PATH, "output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # Utility: Load a JSON file from path
 def load_json(file_path):
-    with open(file_path, 'r') as f:
-        return json.load(f)[0]  # Each file has a single JSON object inside a list
+    # Each file has a single JSON object inside a list; decode and validate only the fields we use
+    return load_submission(file_path)
 
 # Extract top-level performance
 def extract_overall_metrics(data):
@@ -51,27 +52,29 @@ def extract_chapter_stats(data):
     for section in data.get("sections", []):
         for q in section.get("questions", []):
             qid = q.get("questionId", {})
-            chapters = [c["title"] for c in qid.get("chapters", [])]
+            chapters = [c["title"] for c in qid.get("chapters", [])] or ["Unknown"]
             topics = [t["title"] for t in qid.get("topics", [])]
             concepts = [c["title"] for c in qid.get("concepts", [])]
             level = qid.get("level", "unknown")
-            correct = any(opt.get("isCorrect", False) for opt in q.get("markedOptions", []))
-
-            section_data.append({
-                "Chapter": chapters[0] if chapters else "Unknown",
-                "Topic": topics[0] if topics else "Unknown",
-                "Concept": concepts[0] if concepts else "Unknown",
-                "Difficulty": level,
-                "Correct": correct,
-                "Time Taken (sec)": q.get("timeTaken", 0),
-                "Status": q.get("status", "unknown")
-            })
+            # Marked option or, for numeric-answer questions, inputValue.isCorrect
+            correct = question_correct(q)
+
+            # One row per tagged chapter; Topic and Concept are the primary label
+            for chapter in chapters:
+                section_data.append({
+                    "Chapter": chapter,
+                    "Topic": topics[0] if topics else "Unknown",
+                    "Concept": concepts[0] if concepts else "Unknown",
+                    "Difficulty": level,
+                    "Correct": correct,
+                    "Time Taken (sec)": q.get("timeTaken", 0),
+                    "Status": q.get("status", "unknown")
+                })
     return pd.DataFrame(section_data)
 
 # Identify weak chapters
 def identify_weak_chapters(df_chap):
-    df = df_chap.copy()
-    df_grouped = df.groupby("Chapter").agg({
+    df_grouped = df_chap.groupby("Chapter").agg({
         "Correct": ["sum", "count"],
         "Time Taken (sec)": "sum"
     }).reset_index()
@@ -83,20 +86,16 @@ def identify_weak_chapters(df_chap):
 # Plot and save Time vs Accuracy
 def plot_time_vs_accuracy(df_subject, student_id):
     try:
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(data=df_subject, x="Time Taken (min)", y="Accuracy (%)", hue="Subject", s=100)
-        plt.title(f"Time vs Accuracy for Student {student_id}")
-        plt.grid(True)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
         chart_path = os.path.join(OUTPUT_DIR, f"chart_{student_id}.png")
-        plt.savefig(chart_path)
-        plt.close()
+        get_chart_renderer().render(df_subject, student_id, chart_path)
         print(f"Saved chart to {chart_path}")
         return chart_path
     except Exception as e:
         print(f"Error generating chart for student {student_id}: {e}")
         return None
 
-# Analyze a single student and save outputs
+# Analyze a single student; the result is handed to Task 2 and Task 3 in memory
 def analyze_single_student(file_path):
     student_id = os.path.basename(file_path).split('_')[-1].split('.')[0]
     print(f"📂 Analyzing File: {os.path.basename(file_path)}\n")
@@ -105,40 +104,27 @@ def analyze_single_student(file_path):
     overall = extract_overall_metrics(data)
     df_subject = extract_subject_metrics(data)
     df_chapters = extract_chapter_stats(data)
-    df_weak = identify_weak_chapters(df_chapters)
-
-    # Save outputs
-    try:
-        # Save overall metrics
-        overall_path = os.path.join(OUTPUT_DIR, f"overall_{student_id}.json")
-        with open(overall_path, 'w') as f:
-            json.dump(overall, f)
-        print(f"Saved overall metrics to {overall_path}")
-
-        # Save subject-wise performance
-        subject_path = os.path.join(OUTPUT_DIR, f"subject_{student_id}.csv")
-        df_subject.to_csv(subject_path, index=False)
-        print(f"Saved subject-wise performance to {subject_path}")
-
-        # Save chapter-wise performance
-        chapter_path = os.path.join(OUTPUT_DIR, f"chapter_{student_id}.csv")
-        df_chapters.to_csv(chapter_path, index=False)
-        print(f"Saved chapter-wise performance to {chapter_path}")
-
-        # Save weak chapters
-        weak_path = os.path.join(OUTPUT_DIR, f"weak_{student_id}.csv")
-        df_weak.to_csv(weak_path, index=False)
-        print(f"Saved weak chapters to {weak_path}")
-
-        # Generate and save
-        chart_path = plot_time_vs_accuracy(df_subject, student_id)
-
-    except Exception as e:
-        print(f"Error saving files for student {student_id}: {e}")
-
-    return {
-        "overall": overall,
-        "subjects_df": df_subject,
-        "chapter_df": df_chapters,
-        "weak_df": df_weak
-    }
+    # Renumber rows as a CSV/batch-file round trip does, so Task 2 prompts match either way
+    df_weak = identify_weak_chapters(df_chapters).reset_index(drop=True)
+    chart_path = plot_time_vs_accuracy(df_subject, student_id)
+
+    return StudentResult(
+        student_id=student_id,
+        overall=overall,
+        subject_df=df_subject,
+        chapter_df=df_chapters,
+        weak_df=df_weak,
+        chart_path=chart_path,
+    )
+
+# Analyze many students; pass `results_path` (.parquet or .arrow) to persist the batch as one file
+def analyze_batch(file_paths, results_path=None):
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append(analyze_single_student(file_path))
+        except Exception as e:
+            print(f"❌ Error analyzing {file_path}: {e}")
+    if results_path:
+        save_results(results, results_path)
+    return results
@@ -1,14 +1,21 @@
-import pandas as pd
-import json
 import os
-from groq import Groq
-import time
+
+from feedback_cache import feedback_key, get_feedback_cache
+from llm_client import LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, deadline_after, get_llm_client
+from local_feedback import local_feedback
+from results import load_results, save_results
 
 # Configurable base path (replace with your own directory)
 BASE_PATH = "PATH_TO_YOUR_DATA_DIRECTORY"  # e.g., "/home/user/mathango_data" or "C:\\Users\\user\\Documents\\mathango_data"
 DATA_DIR = os.path.join(BASE_PATH, "data")
 OUTPUT_DIR = os.path.join(BASE_PATH, "output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# LLM provider, model and request settings live in llm_client (LLM_PROVIDER, LLM_MODEL, ...)
+SYSTEM_MESSAGE = "You are an expert math tutor generating student feedback."
+
+# "llm", "local" (offline templates) or "llm-fallback" (templates when Groq fails or exceeds LLM_TIMEOUT)
+FEEDBACK_MODE = os.getenv("FEEDBACK_MODE", "llm")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
 
 def build_prompt(overall, subject_df, weak_df):
     # Find top subject programmatically
@@ -40,39 +47,16 @@ def build_prompt(overall, subject_df, weak_df):
 
 **Tone:** Encouraging, specific, and growth-focused"""
 
-def generate_feedback(student_id):
+# Generate feedback for a Task 1 StudentResult and store it on the result
+def generate_feedback(result):
+    student_id = result.student_id
     try:
-        # Load data
-        with open(os.path.join(OUTPUT_DIR, f"overall_{student_id}.json")) as f:
-            overall = json.load(f)
-        subject_df = pd.read_csv(os.path.join(OUTPUT_DIR, f"subject_{student_id}.csv"))
-        weak_df = pd.read_csv(os.path.join(OUTPUT_DIR, f"weak_{student_id}.csv"))
-
-        # Generate prompt
-        prompt = build_prompt(overall, subject_df, weak_df)
-        print(f"\nPrompt for Student {student_id} ready - length: {len(prompt)} chars")
-
-        # Initialize Groq client
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        if not client.api_key:
-            raise ValueError("GROQ_API_KEY environment variable not set")
-
-        # Generate feedback
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[
-                {"role": "system", "content": "You are an expert math tutor generating student feedback."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=800
-        )
-        feedback = response.choices[0].message.content
-
-        # Save feedback
-        feedback_path = os.path.join(OUTPUT_DIR, f"feedback_{student_id}.txt")
-        with open(feedback_path, "w", encoding="utf-8") as f:
-            f.write(feedback)
+        if FEEDBACK_MODE == "local":
+            feedback = local_feedback(result.overall, result.subject_df, result.weak_df)
+        else:
+            feedback = llm_feedback(result)
+
+        result.feedback = feedback
         print(f"✅ Student {student_id} feedback generated")
 
         return feedback
@@ -80,3 +64,39 @@ def generate_feedback(student_id):
     except Exception as e:
         print(f"Student {student_id} failed: {str(e)}")
         return None
+
+def llm_feedback(result):
+    student_id = result.student_id
+    # Generate prompt
+    prompt = build_prompt(result.overall, result.subject_df, result.weak_df)
+    print(f"\nPrompt for Student {student_id} ready - length: {len(prompt)} chars")
+
+    # Reuse cached feedback for an identical prompt, otherwise call Groq
+    cache = get_feedback_cache(OUTPUT_DIR)
+    cache_key = feedback_key(LLM_MODEL, LLM_TEMPERATURE, SYSTEM_MESSAGE, prompt)
+    feedback = cache.get(cache_key)
+    if feedback is not None:
+        print(f"Feedback cache hit for student {student_id}")
+        return feedback
+
+    fallback = FEEDBACK_MODE == "llm-fallback"
+    try:
+        feedback = get_llm_client().complete(prompt, SYSTEM_MESSAGE, LLM_MAX_TOKENS,
+                                             timeout=LLM_TIMEOUT if fallback else None,
+                                             deadline=deadline_after(LLM_TIMEOUT) if fallback else None)
+    except Exception as e:
+        if not fallback:
+            raise
+        print(f"⚠️ LLM unavailable for student {student_id} ({e}), using local feedback")
+        return local_feedback(result.overall, result.subject_df, result.weak_df)
+    cache.put(cache_key, feedback)
+    return feedback
+
+# Standalone Task 2 over a saved batch: one bulk read, feedback for every student, one write back
+def generate_batch_feedback(results_path):
+    results = load_results(results_path)
+    for result in results:
+        if result.feedback is None:
+            generate_feedback(result)
+    save_results(results, results_path)
+    return results
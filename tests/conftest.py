@@ -0,0 +1,23 @@
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from synthetic import iter_synthetic, make_submission  # noqa: E402
+
+
+# A small valid submission in the sample schema
+@pytest.fixture
+def submission():
+    return make_submission(random.Random(0), questions_per_section=2, numerical_per_section=1)
+
+
+# Several distinct small submissions
+@pytest.fixture
+def submissions():
+    return list(iter_synthetic(5, seed=1, questions_per_section=2, numerical_per_section=1))
@@ -0,0 +1,128 @@
+import threading
+import time
+import types
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue, WorkerPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def _wait_for(predicate, timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_claims_are_fifo(queue, clock):
+    ids = []
+    for student in ("a", "b", "c"):
+        ids.append(queue.enqueue(student, f"{student}.json"))
+        clock.now += 1
+    assert [queue.claim()["id"] for _ in ids] == ids
+    assert queue.claim() is None
+    assert queue.get(ids[0])["status"] == "running"
+
+
+def test_update_stores_the_result(queue):
+    job_id = queue.enqueue("s1", "s1.json")
+    queue.update(job_id, status="done", stage="done", result={"pdf": "s1.pdf"})
+    job = queue.get(job_id)
+    assert (job["status"], job["stage"], job["result"]) == ("done", "done", {"pdf": "s1.pdf"})
+    assert queue.get("missing") is None
+
+
+def test_requeue_stale_only_touches_stale_running_jobs(queue, clock):
+    stale, fresh, finished = (queue.enqueue(s, f"{s}.json") for s in ("stale", "fresh", "finished"))
+    for _ in range(3):
+        queue.claim()
+    queue.update(finished, status="done", stage="done", result={})
+    queued = queue.enqueue("queued", "queued.json")
+    clock.now += 100
+    queue.heartbeat([fresh])
+    clock.now += 50
+    assert queue.requeue_stale(stale_after=120) == 1
+    assert {job_id: queue.get(job_id)["status"] for job_id in (queued, stale, fresh, finished)} == {
+        queued: "queued", stale: "queued", fresh: "running", finished: "done"}
+
+
+def test_heartbeat_ignores_finished_jobs(queue, clock):
+    job_id = queue.enqueue("s1", "s1.json")
+    queue.claim()
+    queue.update(job_id, status="failed", stage="failed", message="boom")
+    updated = queue.get(job_id)["updated"]
+    clock.now += 10
+    queue.heartbeat([job_id])
+    queue.heartbeat([])
+    assert queue.get(job_id)["updated"] == updated
+
+
+def test_pool_requeues_jobs_of_a_crashed_worker(queue, clock):
+    job_id = queue.enqueue("s1", "s1.json")
+    queue.claim()  # a worker took it and died
+    clock.now += 300
+    pool = WorkerPool(queue, lambda job, progress: {"student": job["student_id"]}, workers=1, poll_interval=0.01)
+    pool.start()
+    try:
+        assert _wait_for(lambda: queue.get(job_id)["status"] == "done")
+    finally:
+        pool.stop(timeout=5)
+    assert queue.get(job_id)["result"] == {"student": "s1"}
+
+
+def test_heartbeat_keeps_long_jobs_from_being_requeued(queue):
+    release = threading.Event()
+    started = threading.Event()
+    runs = []
+
+    def handler(job, progress):
+        runs.append(job["id"])
+        started.set()
+        release.wait(10)
+        return {}
+
+    job_id = queue.enqueue("slow", "slow.json")
+    pool = WorkerPool(queue, handler, workers=1, poll_interval=0.01, stale_after=0.3)
+    pool.start()
+    try:
+        assert started.wait(5)
+        time.sleep(1.0)  # several stale periods; only the heartbeat keeps the job fresh
+        assert queue.requeue_stale(stale_after=0.3) == 0
+        assert queue.get(job_id)["status"] == "running"
+        release.set()
+        assert _wait_for(lambda: queue.get(job_id)["status"] == "done")
+    finally:
+        release.set()
+        pool.stop(timeout=5)
+    assert runs == [job_id]
+
+
+def test_failed_jobs_record_the_error(queue):
+    def handler(job, progress):
+        progress("analysis")
+        raise ValueError("bad submission")
+
+    job_id = queue.enqueue("s1", "s1.json")
+    pool = WorkerPool(queue, handler, workers=1, poll_interval=0.01)
+    pool.start()
+    try:
+        assert _wait_for(lambda: queue.get(job_id)["status"] == "failed")
+    finally:
+        pool.stop(timeout=5)
+    assert queue.get(job_id)["message"] == "bad submission"
@@ -0,0 +1,169 @@
+import types
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket
+
+
+# Stands in for the `time` module inside rate_limiter: sleeping advances the clock instead of blocking
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def _response(prompt_tokens, completion_tokens):
+    usage = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens)
+    return types.SimpleNamespace(usage=usage)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def test_bucket_reserves_and_refills(clock):
+    bucket = TokenBucket(60)  # one unit per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(3) == pytest.approx(3.0)
+    clock.now += 2
+    assert bucket.available() == pytest.approx(-1.0)
+    clock.now += 1000
+    assert bucket.available() == 60  # never refills past capacity
+
+
+def test_bucket_reservation_is_capped_at_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    assert bucket.reserve(500) == 0.0
+    assert bucket.available() == 0
+
+
+def test_bucket_refund_is_capped_at_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.reserve(10)
+    bucket.refund(25)
+    assert bucket.available() == 60
+
+
+def test_call_settles_the_estimate_against_reported_usage(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    limiter.call(lambda: _response(100, 50), estimated_tokens=400)
+    assert limiter.tokens.available() == pytest.approx(850)
+    limiter.call(lambda: _response(300, 300), estimated_tokens=400)
+    assert limiter.tokens.available() == pytest.approx(250)
+    assert limiter.usage_snapshot() == {"requests": 2, "prompt_tokens": 400, "completion_tokens": 350}
+
+
+def test_retries_refund_each_rejected_attempt(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000, base_delay=1.0)
+    attempts = []
+
+    def flaky():
+        attempts.append(limiter.tokens.available())
+        if len(attempts) < 3:
+            raise APIError(429)
+        return types.SimpleNamespace(usage=None)
+
+    limiter.call(flaky, estimated_tokens=300)
+    # Every attempt saw the same budget, so two 429s did not leak their reservations
+    assert attempts == pytest.approx([700, 700, 700], abs=1)
+    assert limiter.tokens.available() == pytest.approx(700, abs=1)
+    assert clock.sleeps == [1.0, 2.0]
+    assert limiter.usage_snapshot()["requests"] == 1
+
+
+def test_retry_waits_at_least_retry_after(clock):
+    limiter = RateLimiter(base_delay=0.5)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise APIError(503, retry_after=7)
+        return None
+
+    limiter.call(fn)
+    assert clock.sleeps == [7.0]
+
+
+def test_non_retryable_errors_raise_at_once(clock):
+    limiter = RateLimiter(tokens_per_minute=1000)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise APIError(400)
+
+    with pytest.raises(APIError):
+        limiter.call(bad_request, estimated_tokens=100)
+    assert len(calls) == 1 and clock.sleeps == []
+
+
+def test_retries_stop_after_max_retries(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=100000, max_retries=2)
+    calls = []
+
+    def overloaded():
+        calls.append(1)
+        raise APIError(500)
+
+    with pytest.raises(APIError):
+        limiter.call(overloaded, estimated_tokens=100)
+    assert len(calls) == 3
+
+
+def test_retry_backoff_past_the_deadline_raises_the_error(clock):
+    limiter = RateLimiter(base_delay=10.0)
+
+    def fn():
+        raise APIError(429)
+
+    with pytest.raises(APIError):
+        limiter.call(fn, deadline=clock.now + 5)
+    assert clock.sleeps == []
+
+
+def test_acquire_past_the_deadline_gives_the_budget_back(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    limiter.acquire(600)
+    requests, tokens = limiter.requests.available(), limiter.tokens.available()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(300, deadline=clock.now + 1)
+    assert limiter.requests.available() == pytest.approx(requests)
+    assert limiter.tokens.available() == pytest.approx(tokens)
+    assert clock.sleeps == []
+
+
+def test_estimate_tracks_the_completion_share(clock):
+    limiter = RateLimiter()
+    prompt = "x" * 400
+    assert limiter.estimate(prompt, 800) == 100 + 800
+    limiter.call(lambda max_tokens: _response(100, 200), estimated_tokens=900, max_tokens=800)
+    # A quarter of max_tokens used, reserved with COMPLETION_MARGIN headroom
+    assert limiter.estimate(prompt, 800) == 100 + int(800 * 0.25 * rate_limiter.COMPLETION_MARGIN) + 1
+
+
+def test_headroom_counts_both_budgets(clock):
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    assert limiter.headroom() == 10
+    assert limiter.headroom(300) == 3
@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import submission_schema
+from submission_schema import SubmissionError, iter_valid_submissions, load_submission, validate_submission
+
+DECODERS = ["python"] + [name for name, available in (("orjson", submission_schema.HAS_ORJSON),
+                                                       ("msgspec", submission_schema.HAS_MSGSPEC)) if available]
+
+
+def _write(tmp_path, value, name="sample_submission_analysis_1.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(value))
+    return str(path)
+
+
+@pytest.mark.parametrize("decoder", DECODERS)
+def test_decoders_agree(tmp_path, submission, decoder):
+    path = _write(tmp_path, [submission])
+    expected = load_submission(path, decoder="python")
+    assert load_submission(path, decoder=decoder) == expected
+    assert "syllabus" not in expected["test"]
+    assert "question" not in expected["sections"][0]["questions"][0]["questionId"]
+    assert expected["totalCorrect"] == submission["totalCorrect"]
+
+
+@pytest.mark.parametrize("decoder", DECODERS)
+def test_fingerprints_match_the_stream_reader(tmp_path, submission, decoder):
+    path = _write(tmp_path, [submission])
+    streamed = next(iter_valid_submissions(path, decoder="python", fingerprint=True))
+    assert load_submission(path, decoder=decoder, fingerprint=True) == streamed
+
+
+@pytest.mark.parametrize("decoder", DECODERS)
+def test_every_error_is_reported(tmp_path, submission, decoder):
+    del submission["totalCorrect"]
+    submission["accuracy"] = "high"
+    submission["sections"][0]["questions"][1]["timeTaken"] = True  # bool is not a valid time
+    with pytest.raises(SubmissionError) as info:
+        load_submission(_write(tmp_path, [submission]), decoder=decoder)
+    assert sorted(info.value.errors) == [
+        ("$[0].accuracy", "expected int or float, got str"),
+        ("$[0].sections[0].questions[1].timeTaken", "expected int or float, got bool"),
+        ("$[0].totalCorrect", "missing required field"),
+    ]
+    assert info.value.source == "sample_submission_analysis_1.json"
+
+
+def test_error_list_is_capped(submission):
+    questions = submission["sections"][0]["questions"]
+    questions[:] = [dict(questions[0], status=1) for _ in range(submission_schema.MAX_ERRORS + 5)]
+    with pytest.raises(SubmissionError) as info:
+        validate_submission(submission)
+    assert len(info.value.errors) == submission_schema.MAX_ERRORS
+    assert "(+%d more)" % (submission_schema.MAX_ERRORS - 3) in str(info.value)
+
+
+def test_malformed_json_is_a_submission_error(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('[{"totalTimeTaken": 1,')
+    with pytest.raises(SubmissionError) as info:
+        load_submission(str(path))
+    (where, message), = info.value.errors
+    assert where == "$[0]" and message.startswith("invalid JSON")
+
+
+def test_empty_file_has_no_submission(tmp_path):
+    with pytest.raises(SubmissionError, match="no submission in file"):
+        load_submission(_write(tmp_path, []))
+
+
+def test_gzip_and_jsonl_files(tmp_path, submissions):
+    expected = load_submission(_write(tmp_path, [submissions[0]]))
+    gz = tmp_path / "one.json.gz"
+    gz.write_bytes(gzip.compress(json.dumps([submissions[0]]).encode()))
+    assert load_submission(str(gz)) == expected
+    jsonl = tmp_path / "many.jsonl"
+    jsonl.write_text("\n".join(json.dumps(s) for s in submissions))
+    assert load_submission(str(jsonl)) == expected
+
+
+def test_skip_invalid_reports_and_continues(submissions, capsys):
+    submissions[1]["subjects"] = {"not": "a list"}
+    lines = [json.dumps(s) for s in submissions]
+    lines[3] = lines[3][:50]
+    got = list(iter_valid_submissions(io.StringIO("\n".join(lines)), skip_invalid=True))
+    assert [s["_id"] for s in got] == [submissions[i]["_id"] for i in (0, 2, 4)]
+    out = capsys.readouterr().out
+    assert "record 1 of stream" in out and "$[1].subjects: expected array, got object" in out
+    assert "record 3 of stream" in out and "invalid JSON" in out
+
+
+def test_invalid_record_raises_without_skip(submissions):
+    submissions[2]["totalAttempted"] = None
+    with pytest.raises(SubmissionError, match=r"\$\[2\]\.totalAttempted: expected int, got null"):
+        list(iter_valid_submissions(io.StringIO(json.dumps(submissions))))
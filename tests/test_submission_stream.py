@@ -0,0 +1,124 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import submission_stream
+from submission_stream import iter_records, iter_submissions
+
+
+def _ids(records):
+    return [(i, data["_id"]["$oid"]) for i, data in records]
+
+
+def _errors(source):
+    errors = []
+    records = list(iter_records(source, on_error=lambda i, e: errors.append((i, e))))
+    return records, errors
+
+
+@pytest.mark.parametrize("layout", ["array", "pretty", "jsonl", "single"])
+def test_layouts(tmp_path, submissions, layout):
+    path = tmp_path / "export.json"
+    if layout == "array":
+        path.write_text(json.dumps(submissions))
+    elif layout == "pretty":
+        path.write_text(json.dumps(submissions, indent=2))
+    elif layout == "jsonl":
+        path.write_text("\n".join(json.dumps(s) for s in submissions) + "\n")
+    else:
+        submissions = submissions[:1]
+        path.write_text(json.dumps(submissions[0]))
+    got = list(iter_submissions(str(path)))
+    assert [s["_id"] for s in got] == [s["_id"] for s in submissions]
+    assert all("syllabus" not in s["test"] for s in got)
+
+
+def test_gzip_and_caller_stream_left_open(submissions):
+    raw = io.BytesIO(gzip.compress(json.dumps(submissions).encode()))
+    assert len(list(iter_submissions(raw))) == len(submissions)
+    assert not raw.closed
+
+
+def test_empty_inputs():
+    assert list(iter_records(io.StringIO(""))) == []
+    assert list(iter_records(io.StringIO("[]"))) == []
+    assert list(iter_records(io.StringIO("  [ ]  "))) == []
+
+
+# Values larger than a read chunk are reassembled across chunk boundaries
+def test_values_span_chunks(monkeypatch, submissions):
+    monkeypatch.setattr(submission_stream, "CHUNK_SIZE", 7)
+    text = json.dumps(submissions)
+    assert [s["_id"] for s in iter_submissions(io.StringIO(text))] == [s["_id"] for s in submissions]
+
+
+def test_malformed_jsonl_line_is_reported_and_skipped(submissions):
+    lines = [json.dumps(s) for s in submissions]
+    lines[1] = lines[1][:40] + "}"
+    records, errors = _errors(io.StringIO("\n".join(lines)))
+    assert [i for i, _ in errors] == [1]
+    assert _ids(records) == [(i, s["_id"]["$oid"]) for i, s in enumerate(submissions) if i != 1]
+
+
+def test_truncated_jsonl_line_resumes_at_next_record(monkeypatch, submissions):
+    monkeypatch.setattr(submission_stream, "CHUNK_SIZE", 16)
+    lines = [json.dumps(s) for s in submissions]
+    lines[2] = lines[2][:len(lines[2]) // 2]  # cut inside the record, possibly inside a string
+    records, errors = _errors(io.StringIO("\n".join(lines)))
+    assert [i for i, _ in errors] == [2]
+    assert [i for i, _ in records] == [0, 1, 3, 4]
+
+
+def test_malformed_array_element_is_skipped(submissions):
+    parts = [json.dumps(s) for s in submissions]
+    parts[1] = parts[1].replace('"status"', '"status" "oops"', 1)
+    records, errors = _errors(io.StringIO("[" + ",".join(parts) + "]"))
+    assert [i for i, _ in errors] == [1]
+    assert [i for i, _ in records] == [0, 2, 3, 4]
+
+
+def test_truncated_string_in_pretty_array_recovers_at_next_element(submissions):
+    parts = [json.dumps(s) for s in submissions]
+    parts[1] = parts[1][:parts[1].index('"status"') + 5]  # unterminated string, then a line break
+    records, errors = _errors(io.StringIO("[\n" + ",\n".join(parts) + "\n]"))
+    assert [i for i, _ in errors] == [1]
+    assert [i for i, _ in records] == [0, 2, 3, 4]
+
+
+def test_error_position_is_relative_to_the_record(submissions):
+    lines = [json.dumps(s) for s in submissions[:2]]
+    lines[1] = '{"_id": nope}'
+    _, errors = _errors(io.StringIO("\n".join(lines)))
+    (index, error), = errors
+    assert index == 1 and error.pos == len('{"_id": ')
+
+
+def test_raises_without_on_error(submissions):
+    text = json.dumps(submissions[0]) + "\n{broken\n"
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_records(io.StringIO(text)))
+
+
+# A record that never completes is reported once it passes MAX_RECORD_SIZE, not buffered to the end
+def test_oversize_record_is_reported(monkeypatch, submissions):
+    lines = [json.dumps(s) for s in submissions[:2]]
+    limit = 2 * max(map(len, lines))
+    monkeypatch.setattr(submission_stream, "CHUNK_SIZE", 64)
+    monkeypatch.setattr(submission_stream, "MAX_RECORD_SIZE", limit)
+    huge = '{"_id": {"$oid": "' + "x" * (4 * limit) + '"}}'
+    records, errors = _errors(io.StringIO("\n".join([lines[0], huge, lines[1]])))
+    assert [i for i, _ in errors] == [1]
+    assert f"larger than {limit}" in errors[0][1].msg
+    assert [i for i, _ in records] == [0, 2]
+
+
+def test_prune_keeps_fingerprint_only_when_asked(submission):
+    text = json.dumps(submission)
+    plain = next(iter_submissions(io.StringIO(text)))
+    qid = plain["sections"][0]["questions"][0]["questionId"]
+    assert "question" not in qid and "fingerprint" not in qid
+    fingerprinted = next(iter_submissions(io.StringIO(text), fingerprint=True))
+    qid = fingerprinted["sections"][0]["questions"][0]["questionId"]
+    assert "question" not in qid and isinstance(qid["fingerprint"], int)